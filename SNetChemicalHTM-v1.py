@@ -6,15 +6,13 @@ This script is suitable for the latest version of chemical data
 This script starts from version 2.0
 '''
 
-import matplotlib.pyplot as plt
-import csv
-from itertools import islice
 import json
-import time
-from datetime import datetime
-from nupic.data.file_record_stream import FileRecordStream
 from nupic.engine import Network
 from nupic.encoders import MultiEncoder, ScalarEncoder, DateEncoder
+from result_renderer import ResultRenderer
+from episode_tracker import EpisodeTracker
+from record_loader import loadRecords
+from binary_record_stream import BinaryRecordStream
 
 
 def createTemporalAnomaly_chemical(recordParams, spatialParams, temporalParams, verbosity):
@@ -79,7 +77,7 @@ def createTemporalAnomaly_chemical(recordParams, spatialParams, temporalParams,
 
     sensor = network.regions["sensor"].getSelf()
     sensor.encoder = encoder
-    sensor.dataSource = FileRecordStream(streamID=inputFilePath)
+    sensor.dataSource = BinaryRecordStream(inputFilePath)
 
     # Create the spatial pooler region
     spatialParams["inputWidth"] = sensor.encoder.getWidth()
@@ -147,191 +145,33 @@ def reverse(in_list):
     return out_list
 
 
-def seconds_difference(date_str1, date_str2):
-    date1 = datetime.strptime(date_str1, '%Y-%m-%d %H:%M:%S')
-    date2 = datetime.strptime(date_str2, '%Y-%m-%d %H:%M:%S')
-    return float((date2 - date1).total_seconds())
-
-
 def getDate(recordParams, total):
-    inputFilePath = recordParams["inputFilePath"]
-    date = []
-    with open(inputFilePath) as fin:
-        reader = csv.reader(fin)
-        headers = reader.next()  # skip the header
-        reader.next()
-        reader.next()
-        for record in islice(reader, total):
-            Record_in_Dict = dict(zip(headers, record))
-            date.append(Record_in_Dict["Time"])
-    return date
-
-
-def plot_chemical_data(matte_cu, 
-                       matte_fe, 
-                       matte_pb, 
-                       matte_zn, 
-                       slag_cu, 
-                       slag_fe, 
-                       slag_pb, 
-                       slag_zn, 
-                       fe_sio2,
-                       slag_cao,
-                       bath_t,
-                       freeboard_t,
-                       date,
-                       buffer_size=800):
-    # sliding
-    if len(matte_cu) > buffer_size:
-        new_matte_cu = matte_cu[-buffer_size:]        
-        new_matte_fe = matte_fe[-buffer_size:]
-        new_matte_pb = matte_pb[-buffer_size:]
-        new_matte_zn = matte_zn[-buffer_size:]
-        new_slag_cu = slag_cu[-buffer_size:]
-        new_slag_fe = slag_fe[-buffer_size:]
-        new_slag_pb = slag_pb[-buffer_size:]
-        new_slag_zn = slag_zn[-buffer_size:]
-        new_fe_sio2 = fe_sio2[-buffer_size:]
-        new_slag_cao = slag_cao[-buffer_size:]
-        new_bath_t = bath_t[-buffer_size:]
-        new_freeboard_t = freeboard_t[-buffer_size:]
-        new_date = date[-buffer_size:]        
-        return new_matte_cu, new_matte_fe, new_matte_pb, new_matte_zn, \
-               new_slag_cu, new_slag_fe, new_slag_pb, new_slag_zn, \
-               new_fe_sio2, new_slag_cao, new_bath_t, \
-               new_freeboard_t, new_date
-    # or buffering
-    else:
-        return matte_cu, matte_fe, matte_pb, matte_zn, slag_cu, slag_fe, slag_pb, \
-               slag_zn, fe_sio2, slag_cao, bath_t, \
-               freeboard_t, date
+    return loadRecords(recordParams["inputFilePath"]).datetimes("Time", total)
 
-    
-def plot_input_data(lance_air, 
-                    lance_oxy, 
-                    actual_moisture1, 
-                    actual_moisture2, 
-                    actual_conc, 
-                    actual_feed,
-                    use_anomalies1,
-                    use_anomalies2,
-                    use_anomalies3,
-                    use_anomalies4,
-                    date, 
-                    buffer_size=800):
-    
-    if len(lance_air) > buffer_size:
-        new_lance_air = lance_air[-buffer_size:]
-        new_lance_oxy = lance_oxy[-buffer_size:]
-        new_actual_moisture1 = actual_moisture1[-buffer_size:]
-        new_actual_moisture2 = actual_moisture2[-buffer_size:]
-        new_actual_conc = actual_conc[-buffer_size:]
-        new_actual_feed = actual_feed[-buffer_size:]
-        new_use_anomalies1 = use_anomalies1[-buffer_size:]
-        new_use_anomalies2 = use_anomalies2[-buffer_size:]
-        new_use_anomalies3 = use_anomalies3[-buffer_size:]
-        new_use_anomalies4 = use_anomalies4[-buffer_size:]
-        new_date = date[-buffer_size:]
-        return new_lance_air, new_lance_oxy, new_actual_moisture1, \
-               new_actual_moisture2, new_actual_conc, new_actual_feed, \
-               new_use_anomalies1, new_use_anomalies2, new_use_anomalies3, \
-               new_use_anomalies4, new_date
-    else:        
-        return lance_air, lance_oxy, actual_moisture1, actual_moisture2, \
-               actual_conc, actual_feed, use_anomalies1, use_anomalies2, use_anomalies3, \
-               use_anomalies4, date
-
-
-def plot_anomaly_data(anomalies_history, 
-                      date, 
-                      buffer_size=800):
-    
-    if len(anomalies_history) > buffer_size:
-        new_anomalies_history = anomalies_history[-buffer_size:]
-        new_date = date[-buffer_size:]
-        return new_anomalies_history, new_date
-    else:        
-        return anomalies_history, date
-    
-    
-def runNetwork(network, date1, input_data_file):
+
+def runNetwork(network, date1, input_data_file, renderer=None):
     sensorRegion = network.regions["sensor"]
     anomalyLikelihoodRegion = network.regions["anomalyLikelihoodRegion"]
 
-    # output data
-    date = []
-    matte_cu = []
-    matte_fe = []
-    matte_pb = []
-    matte_zn = []
-    slag_cu = []
-    slag_fe = []
-    slag_pb = []
-    slag_zn = []
-    fe_sio2 = []
-    slag_cao = []
-    bath_t = []
-    freeboard_t = []
-    
-    # input data
-    lance_air = []
-    lance_oxy = []
-    actual_moisture1 = []
-    actual_moisture2 = []
-    actual_conc = []
-    actual_feed = []
-    use_anomalies1 = []
-    use_anomalies2 = []
-    use_anomalies3 = []
-    use_anomalies4 = []
-    
-    plt_lance_air = []
-    plt_lance_oxy = []
-    plt_actual_moisture1 = []
-    plt_actual_moisture2 = []
-    plt_actual_conc =[]
-    plt_actual_feed = []
-    plt_use_anomalies1 = []
-    plt_use_anomalies2 = []
-    plt_use_anomalies3 = []
-    plt_use_anomalies4 = []
-    
-#    # data used for evaluation
-#    status_records = []
-    
-    # data used to plot anomalies
-    plt_bad_records = []
-    
-    # initial input data to display
-    with open(input_data_file) as fin:
-        reader = csv.reader(fin)
-        headers = reader.next()
-        reader.next()
-        reader.next()
-        for record in reader:
-            record_dict = dict(zip(headers, record))
-            lance_air.append(float(record_dict["Lance Air"]))
-            lance_oxy.append(float(record_dict["Lance Oxygen"]))
-            actual_moisture1.append(float(record_dict["Actual Moisture 1"]))
-            actual_moisture2.append(float(record_dict["Actual Moisture 2"]))
-            actual_conc.append(float(record_dict["Actual Conc 1 %"]))
-            actual_feed.append(float(record_dict["Actual Feed"]))
-            use_anomalies1.append(int(record_dict["Moisture 1 AF"]))
-            use_anomalies2.append(int(record_dict["Moisture 2 AF"]))
-            use_anomalies3.append(int(record_dict["Blend AF"]))
-            use_anomalies4.append(int(record_dict["Feed AF"]))
+    # input data to display, parsed once and cached next to the CSV
+    inputs = loadRecords(input_data_file)
+    lance_air = inputs["Lance Air"]
+    lance_oxy = inputs["Lance Oxygen"]
+    actual_moisture1 = inputs["Actual Moisture 1"]
+    actual_moisture2 = inputs["Actual Moisture 2"]
+    actual_conc = inputs["Actual Conc 1 %"]
+    actual_feed = inputs["Actual Feed"]
+    use_anomalies1 = inputs["Moisture 1 AF"]
+    use_anomalies2 = inputs["Moisture 2 AF"]
+    use_anomalies3 = inputs["Blend AF"]
+    use_anomalies4 = inputs["Feed AF"]
     
     # intial table and other parameters below        
-    table_content = [[' ', ' ', ' '],[' ', ' ', ' '],[' ', ' ', ' '],[' ', ' ', ' ']]
+    episodes = EpisodeTracker(max_episodes=4, label='B')
     status_table_content = [[' ', ' ', ' ']]
     status_table_color = [["w", "", ""]]
     previous_result = 'G'
-    contineous_flag = False
 
-    plot = plt.figure("Outotec Motion Anomaly Detection", figsize=(32, 16))
-    plot.subplots_adjust(wspace =1, hspace =0.5)
-    plot.subplots(ncols=2, nrows=3)
-    
     for i in xrange(_NUM_RECORDS):
         network.run(1)
         anomalyLikelihood = anomalyLikelihoodRegion.getOutputData("anomalyLikelihood")[0]
@@ -348,33 +188,6 @@ def runNetwork(network, date1, input_data_file):
         pre11_1 = sensorRegion.getOutputData("sourceOut")[10]
         pre12_1 = sensorRegion.getOutputData("sourceOut")[11]
         
-        matte_cu.append(pre1_1)
-        matte_fe.append(pre2_1)
-        matte_pb.append(pre3_1)
-        matte_zn.append(pre4_1)
-        slag_cu.append(pre5_1)
-        slag_fe.append(pre6_1)
-        slag_pb.append(pre7_1)
-        slag_zn.append(pre8_1)
-        fe_sio2.append(pre9_1)
-        slag_cao.append(pre10_1)
-        bath_t.append(pre11_1)
-        freeboard_t.append(pre12_1)
-        
-        # append the input data
-        plt_lance_air.append(lance_air[i])
-        plt_lance_oxy.append(lance_oxy[i])
-        plt_actual_moisture1.append(actual_moisture1[i])
-        plt_actual_moisture2.append(actual_moisture2[i])
-        plt_actual_conc.append(actual_conc[i])
-        plt_actual_feed.append(actual_feed[i])
-        plt_use_anomalies1.append(use_anomalies1[i])
-        plt_use_anomalies2.append(use_anomalies2[i])
-        plt_use_anomalies3.append(use_anomalies3[i])
-        plt_use_anomalies4.append(use_anomalies4[i])
-                
-        date.append(date1[i])
-
 #        print "Date: ", date1[i], "  Chemical Anomaly Score:", anomalyScore
 #        print "    --> Bath_T:   \t", pre1_1
 #        print "        CaO:      \t", pre2_1
@@ -388,7 +201,7 @@ def runNetwork(network, date1, input_data_file):
 #            print "        \033[1;42m GOOD CONDITION \033[0m"
             previous_result = 'G'
 #            status_records.append('G')
-            plt_bad_records.append(0)
+            bad_record = 0
             status_table_content[0][0] = date1[i]
             status_table_content[0][1] = 'GOOD CONDITION'
             status_table_color[0][1] = '#31de5f'
@@ -398,70 +211,17 @@ def runNetwork(network, date1, input_data_file):
 #            print "        \033[1;43m WARNING CAUTION \033[0m"
             previous_result = 'W'
 #            status_records.append('W')
-            plt_bad_records.append(0)
+            bad_record = 0
             status_table_content[0][0] = date1[i]
             status_table_content[0][1] = 'WARNING CAUTION'
             status_table_color[0][1] = '#ff9e36'
             status_table_content[0][2] = anomalyLikelihood
             status_table_color[0][2] = 'w'
         else:
-            if previous_result == 'D':
-                contineous_flag = True
-            else:
-                contineous_flag = False
-
-            if table_content[0][0] == ' ' and contineous_flag == False:
-                table_content[0][0] = date1[i]
-                table_content[0][1] = str(anomalyLikelihood) + ' (B)'
-                table_content[0][2] = float(0)
-            elif table_content[1][0] == ' ' and contineous_flag == False:
-                table_content[1][0] = date1[i]
-                table_content[1][1] = str(anomalyLikelihood) + ' (B)'
-                table_content[1][2] = float(0)
-            elif table_content[2][0] == ' ' and contineous_flag == False:
-                table_content[2][0] = date1[i]
-                table_content[2][1] = str(anomalyLikelihood) + ' (B)'
-                table_content[2][2] = float(0)
-            elif table_content[3][0] == ' ' and contineous_flag == False:
-                table_content[3][0] = date1[i]
-                table_content[3][1] = str(anomalyLikelihood) + ' (B)'
-                table_content[3][2] = float(0)         
-            elif table_content[1][0] == ' ' and contineous_flag == True:
-                table_content[0][0] = date1[i]
-                table_content[0][1] = str(anomalyLikelihood) + ' (B)'
-                table_content[0][2] += seconds_difference(date1[i-1], date1[i])
-            elif table_content[2][0] == ' ' and contineous_flag == True:
-                table_content[1][0] = date1[i]
-                table_content[1][1] = str(anomalyLikelihood) + ' (B)'
-                table_content[1][2] += seconds_difference(date1[i-1], date1[i])
-            elif table_content[3][0] == ' ' and contineous_flag == True:
-                table_content[2][0] = date1[i]
-                table_content[2][1] = str(anomalyLikelihood) + ' (B)'
-                table_content[2][2] += seconds_difference(date1[i-1], date1[i])
-            elif table_content[0][0] != ' ' and table_content[1][0] != ' ' and table_content[2][0] != ' ' and table_content[3][0] != ' ' and contineous_flag == False:
-                table_content[0][0] = table_content[1][0]
-                table_content[0][1] = table_content[1][1]
-                table_content[0][2] = table_content[1][2]
-                
-                table_content[1][0] = table_content[2][0]
-                table_content[1][1] = table_content[2][1]
-                table_content[1][2] = table_content[2][2]
-                
-                table_content[2][0] = table_content[3][0]
-                table_content[2][1] = table_content[3][1]
-                table_content[2][2] = table_content[3][2]
-                
-                table_content[3][0] = date1[i]
-                table_content[3][1] = str(anomalyLikelihood) + ' (B)'
-                table_content[3][2] = 0
-            elif table_content[0][0] != ' ' and table_content[1][0] != ' ' and table_content[2][0] != ' ' and table_content[3][0] != ' ' and contineous_flag == True:                
-                table_content[3][0] = date1[i]
-                table_content[3][1] = str(anomalyLikelihood) + ' (B)'
-                table_content[3][2] += seconds_difference(date1[i-1], date1[i])   
 #            print "        \033[1;41m DANGEROUS CONDITION \033[0m"
             previous_result = 'D'
 #            status_records.append('D')
-            plt_bad_records.append(1)
+            bad_record = 1
             status_table_content[0][0] = date1[i]
             status_table_content[0][1] = 'BAD CONDITION'
             status_table_color[0][1] = '#db4439'
@@ -469,184 +229,36 @@ def runNetwork(network, date1, input_data_file):
             status_table_color[0][2] = 'w'
 #        print "\n"        
 
-        plt_matte_cu, plt_matte_fe, plt_matte_pb, plt_matte_zn, plt_slag_cu, \
-        plt_slag_fe, plt_slag_pb, plt_slag_zn, \
-        plt_fe_sio2, plt_slag_cao, plt_bath_t, plt_freeboard_t, \
-        plt_date = plot_chemical_data(matte_cu, 
-                                      matte_fe, 
-                                      matte_pb, 
-                                      matte_zn, 
-                                      slag_cu, 
-                                      slag_fe, 
-                                      slag_pb,
-                                      slag_zn,
-                                      fe_sio2,
-                                      slag_cao,
-                                      bath_t,
-                                      freeboard_t,
-                                      date)
-        
-        plt2_lance_air, plt2_lance_oxy, plt2_actual_moisture1, plt2_actual_moisture2, \
-        plt2_actual_conc, plt2_actual_feed, plt2_use_anomalies1, plt2_use_anomalies2, \
-        plt2_use_anomalies3, plt2_use_anomalies4, plt2_date \
-        = plot_input_data(plt_lance_air, 
-                          plt_lance_oxy, 
-                          plt_actual_moisture1, 
-                          plt_actual_moisture2, 
-                          plt_actual_conc, 
-                          plt_actual_feed,
-                          plt_use_anomalies1,
-                          plt_use_anomalies2,
-                          plt_use_anomalies3,
-                          plt_use_anomalies4,
-                          date)
-        
-        plt2_bad_records, plt2_bad_date = plot_anomaly_data(plt_bad_records, date)
-
-        # display the input data
-        ax1 = plot.add_subplot(6,5,1)
-        ax1.set_xticks([])
-        ax1.plot(plt2_date, plt2_lance_air, "y--", linewidth=1)
-        ax1.set_title('Lance Air\n')
-        
-        ax2 = plot.add_subplot(6,5,2)
-        ax2.set_xticks([])
-        ax2.plot(plt2_date, plt2_actual_moisture1, "y--", linewidth=1)
-        ax2.set_title('Actual Moisture 1\n')
-        
-        ax3 = plot.add_subplot(6,5,3)
-        ax3.set_xticks([])
-        ax3.plot(plt2_date, plt2_actual_moisture2, "y--", linewidth=1)
-        ax3.set_title('Actual Moisture 2\n')
-        
-        ax4 = plot.add_subplot(6,5,4)
-        ax4.set_xticks([])
-        ax4.plot(plt2_date, plt2_lance_oxy, "y--", linewidth=1)
-        ax4.set_title('Lance Oxygen\n')
-        
-        ax5 = plot.add_subplot(6,5,5)
-        ax5.set_xticks([])
-        ax5.plot(plt2_date, plt2_actual_conc, "y--", linewidth=1)
-        ax5.set_title('Actual Conc\n')
-        
-        ax6 = plot.add_subplot(6,5,6)
-        ax6.set_xticks([])
-        ax6.plot(plt2_date, plt2_actual_feed, "y--", linewidth=1)
-        ax6.set_title('Actual Feed\n')
-        
-        ax7 = plot.add_subplot(6,5,7)
-        ax7.set_xticks([])
-        ax7.plot(plt2_date, plt2_use_anomalies1, "g-", linewidth=2)
-        ax7.plot(plt2_bad_date, plt2_bad_records, "r-", linewidth=1)
-        ax7.set_title('(EVA) Moisture 1 AF\n')
-        
-        ax8 = plot.add_subplot(6,5,8)
-        ax8.set_xticks([])
-        ax8.plot(plt2_date, plt2_use_anomalies2, "g-", linewidth=2)
-        ax8.plot(plt2_bad_date, plt2_bad_records, "r-", linewidth=1)
-        ax8.set_title('(EVA) Moisture 2 AF\n')
-        
-        ax9 = plot.add_subplot(6,5,9)
-        ax9.set_xticks([])
-        ax9.plot(plt2_date, plt2_use_anomalies3, "g-", linewidth=2)
-        ax9.plot(plt2_bad_date, plt2_bad_records, "r-", linewidth=1)
-        ax9.set_title('(EVA) Blend AF\n')
-        
-        ax10 = plot.add_subplot(6,5,10)
-        ax10.set_xticks([])
-        ax10.plot(plt2_date, plt2_use_anomalies4, "g-", linewidth=2)
-        ax10.plot(plt2_bad_date, plt2_bad_records, "r-", linewidth=1)
-        ax10.set_title('(EVA) Feed AF\n')
-        
-        # Chemical plot
-        ax11 = plot.add_subplot(6,5,11)
-        ax11.set_xticks([])
-        ax11.plot(plt_date, plt_matte_cu, "b--", linewidth=1)
-        ax11.set_title('Matte Cu\n')
-        
-        ax12 = plot.add_subplot(6,5,12)
-        ax12.set_xticks([])
-        ax12.plot(plt_date, plt_matte_fe, "b--", linewidth=1)
-        ax12.set_title('Matte Fe\n')
-        
-        ax13 = plot.add_subplot(6,5,13)
-        ax13.set_xticks([])
-        ax13.plot(plt_date, plt_matte_pb, "b--", linewidth=1)
-        ax13.set_title('Matte Pb\n')
-    
-        ax14 = plot.add_subplot(6,5,14)
-        ax14.set_xticks([])
-        ax14.plot(plt_date, plt_matte_zn, "b--", linewidth=1)
-        ax14.set_title('Matte Zn\n')
-        
-        ax15 = plot.add_subplot(6,5,15)
-        ax15.set_xticks([])
-        ax15.plot(plt_date, plt_slag_cu, "b--", linewidth=1)
-        ax15.set_title('Slag Cu\n')
-        
-        ax16 = plot.add_subplot(6,5,16)
-        ax16.set_xticks([])
-        ax16.plot(plt_date, plt_slag_fe, "b--", linewidth=1)
-        ax16.set_title('Slag Fe\n')
-    
-        ax17 = plot.add_subplot(6,5,17)
-        ax17.set_xticks([])
-        ax17.plot(plt_date, plt_slag_pb, "b--", linewidth=1)
-        ax17.set_title('Slag Pb\n')
-
-        ax18 = plot.add_subplot(6,5,18)
-        ax18.set_xticks([])
-        ax18.plot(plt_date, plt_slag_zn, "b--", linewidth=1)
-        ax18.set_title('Slag Zn\n')
-        
-        ax19 = plot.add_subplot(6,5,19)
-        ax19.set_xticks([])
-        ax19.plot(plt_date, plt_fe_sio2, "b--", linewidth=1)
-        ax19.set_title('Fe/SiO2\n')
-
-        ax20 = plot.add_subplot(6,5,20)
-        ax20.set_xticks([])
-        ax20.plot(plt_date, plt_slag_cao, "b--", linewidth=1)
-        ax20.set_title('Slag CaO\n')
-        
-        ax21 = plot.add_subplot(6,5,21)
-        ax21.set_xticks([])
-        ax21.plot(plt_date, plt_bath_t, "b--", linewidth=1)
-        ax21.set_title('Bath Temperature\n')
-
-        ax22 = plot.add_subplot(6,5,22)
-        ax22.set_xticks([])
-        ax22.plot(plt_date, plt_freeboard_t, "b--", linewidth=1)
-        ax22.set_title('Freeboard Temperature\n')
-        
-        # table has been defined here
-        ax26 = plot.add_subplot(6,5,26)
-        table = ax26.table(
-                cellText = table_content,
-                cellLoc = 'center',
-                colLabels = ['Log date', 'Anomaly Likelihood', 'Duration (seconds)'],
-                bbox=[0, -0.5, 5, 1.6]
-                )
-        table.scale(6, 6)
-        ax26.axis("off")
-        
-        for key, cell in table.get_celld().items():
-            cell.set_linewidth(0.5)
-            
-        # status showing table has been defined here
-        ax27 = plot.add_subplot(6,5,29)
-        table = ax27.table(
-                cellText = status_table_content,
-                cellColours = status_table_color,
-                cellLoc = 'center',
-                colLabels = ['Current date', 'Predicted Status', 'Anomaly Likelihood'],
-                bbox=[0, -0.3, 3.5, 1.4]
-                )
-        table.scale(5.5, 5.5)
-        ax27.axis("off")
-        
-        for key, cell in table.get_celld().items():
-            cell.set_linewidth(0.5)
+        episodes.update(date1[i], anomalyLikelihood, previous_result == 'D')
+        table_content = episodes.table()
+
+        if renderer is not None:
+            renderer.publish(i,
+                             {"lance_air": lance_air[i],
+                              "lance_oxy": lance_oxy[i],
+                              "actual_moisture1": actual_moisture1[i],
+                              "actual_moisture2": actual_moisture2[i],
+                              "actual_conc": actual_conc[i],
+                              "actual_feed": actual_feed[i],
+                              "use_anomalies1": use_anomalies1[i],
+                              "use_anomalies2": use_anomalies2[i],
+                              "use_anomalies3": use_anomalies3[i],
+                              "use_anomalies4": use_anomalies4[i],
+                              "bad_records": bad_record,
+                              "matte_cu": pre1_1,
+                              "matte_fe": pre2_1,
+                              "matte_pb": pre3_1,
+                              "matte_zn": pre4_1,
+                              "slag_cu": pre5_1,
+                              "slag_fe": pre6_1,
+                              "slag_pb": pre7_1,
+                              "slag_zn": pre8_1,
+                              "fe_sio2": pre9_1,
+                              "slag_cao": pre10_1,
+                              "bath_t": pre11_1,
+                              "freeboard_t": pre12_1},
+                             {"anomalies": (table_content, None),
+                              "status": (status_table_content, status_table_color)})
             
         # print real-time evaluation results
 #        u1_top_1, u1_top_2, u0_top_1, u0_top_2 = evaluation(plt_use_anomalies, status_records)
@@ -654,12 +266,8 @@ def runNetwork(network, date1, input_data_file):
 #        print "When < Use nominals = 1 >, top-1: ", u1_top_1, " ; top-2: ", u1_top_2
 #        print "When < Use nominals = 0 >, top-1: ", u0_top_1, " ; top-2: ", u0_top_2
 #        print "\n"
-        
-        plot.show()
-        plt.pause(1e-17)
-        
-        time.sleep(0.1)
-        plot.clf()
+
+    return episodes
 
 
 if __name__ == "__main__":
@@ -671,6 +279,8 @@ if __name__ == "__main__":
     # Global parameters
     _VERBOSITY = 0
     _NUM_RECORDS = 6002 - 3
+    _HEADLESS = False  # True: only score, no live figure
+    _EPISODE_LOG = None  # CSV file every anomaly episode of the run is written to
     
     # -------------------------------------------------------------------------
     #
@@ -916,6 +526,48 @@ if __name__ == "__main__":
       "dateEncoderArgs": dateEncoderArgs,
     }
     
+    #--------------------------------------------------------------------------
+    #
+    #
+    # Live figure drawn by the renderer process
+    _PLOT_LAYOUT = {
+        "name": "Outotec Motion Anomaly Detection",
+        "figsize": (32, 16),
+        "grid": (6, 5),
+        "panels": [
+            {"position": 1, "title": "Lance Air\n", "lines": [("lance_air", "y--", 1)]},
+            {"position": 2, "title": "Actual Moisture 1\n", "lines": [("actual_moisture1", "y--", 1)]},
+            {"position": 3, "title": "Actual Moisture 2\n", "lines": [("actual_moisture2", "y--", 1)]},
+            {"position": 4, "title": "Lance Oxygen\n", "lines": [("lance_oxy", "y--", 1)]},
+            {"position": 5, "title": "Actual Conc\n", "lines": [("actual_conc", "y--", 1)]},
+            {"position": 6, "title": "Actual Feed\n", "lines": [("actual_feed", "y--", 1)]},
+            {"position": 7, "title": "(EVA) Moisture 1 AF\n", "lines": [("use_anomalies1", "g-", 2), ("bad_records", "r-", 1)]},
+            {"position": 8, "title": "(EVA) Moisture 2 AF\n", "lines": [("use_anomalies2", "g-", 2), ("bad_records", "r-", 1)]},
+            {"position": 9, "title": "(EVA) Blend AF\n", "lines": [("use_anomalies3", "g-", 2), ("bad_records", "r-", 1)]},
+            {"position": 10, "title": "(EVA) Feed AF\n", "lines": [("use_anomalies4", "g-", 2), ("bad_records", "r-", 1)]},
+            {"position": 11, "title": "Matte Cu\n", "lines": [("matte_cu", "b--", 1)]},
+            {"position": 12, "title": "Matte Fe\n", "lines": [("matte_fe", "b--", 1)]},
+            {"position": 13, "title": "Matte Pb\n", "lines": [("matte_pb", "b--", 1)]},
+            {"position": 14, "title": "Matte Zn\n", "lines": [("matte_zn", "b--", 1)]},
+            {"position": 15, "title": "Slag Cu\n", "lines": [("slag_cu", "b--", 1)]},
+            {"position": 16, "title": "Slag Fe\n", "lines": [("slag_fe", "b--", 1)]},
+            {"position": 17, "title": "Slag Pb\n", "lines": [("slag_pb", "b--", 1)]},
+            {"position": 18, "title": "Slag Zn\n", "lines": [("slag_zn", "b--", 1)]},
+            {"position": 19, "title": "Fe/SiO2\n", "lines": [("fe_sio2", "b--", 1)]},
+            {"position": 20, "title": "Slag CaO\n", "lines": [("slag_cao", "b--", 1)]},
+            {"position": 21, "title": "Bath Temperature\n", "lines": [("bath_t", "b--", 1)]},
+            {"position": 22, "title": "Freeboard Temperature\n", "lines": [("freeboard_t", "b--", 1)]},
+        ],
+        "tables": [
+            {"name": "anomalies", "position": 26, "rows": 4,
+             "colLabels": ['Log date', 'Anomaly Likelihood', 'Duration (seconds)'],
+             "bbox": [0, -0.5, 5, 1.6], "scale": 6},
+            {"name": "status", "position": 29, "rows": 1,
+             "colLabels": ['Current date', 'Predicted Status', 'Anomaly Likelihood'],
+             "bbox": [0, -0.3, 3.5, 1.4], "scale": 5.5},
+        ],
+    }
+    
     #--------------------------------------------------------------------------
     #
     #
@@ -927,4 +579,13 @@ if __name__ == "__main__":
     
     chemical_date = getDate(chemical_recordParams, _NUM_RECORDS)
     
-    runNetwork(chemical_network, chemical_date, input_data_feed_rate)
+    renderer = None if _HEADLESS else ResultRenderer(_PLOT_LAYOUT).start()
+    
+    try:
+        episodes = runNetwork(chemical_network, chemical_date, input_data_feed_rate, renderer)
+        if _EPISODE_LOG is not None:
+            episodes.export(_EPISODE_LOG)
+    finally:
+        if renderer is not None:
+            renderer.close()
+
@@ -0,0 +1,557 @@
+# -*- coding: utf-8 -*-
+'''
+Temporal memory in NumPy arrays, with compact segment storage.
+
+ArrayTemporalMemory runs the algorithm of NuPIC's TemporalMemory (predicted
+columns activate their predicted cells, the others burst, the best matching
+or a new segment of the winner cell learns) behind the interface TMRegion
+drives, the one of NuPIC's TM shims. That is the algorithm of temporalImp
+"tm_py", not the backtracking TM of "cpp" and "py": there is no
+backtracking (pamLength) and no global decay (globalDecay, maxAge), so a
+network switched from "cpp" to it learns differently and reports other
+anomaly scores. Those parameters are refused unless they keep the defaults
+TMRegion fills in or switch the feature off. The random choices come from
+NumPy, not from NuPIC's generator, so even TemporalMemory's scores are not
+matched record by record.
+
+Instead of one object per segment and synapse, every segment is a row of
+preallocated arrays: its cell, its synapse count, and maxSynapsesPerSegment
+slots of presynaptic cell (uint16 while there are at most 65536 cells) and
+permanence (float16, steps below 0.0003 near 1.0 are rounded away). An
+index from presynaptic cell to the (segment, slot) pairs it feeds, sorted
+once and extended with a tail as synapses are added, gives the synapses of
+the active cells in one gather; segment activation is then a bincount over
+them. Learning is done for all the learning segments of a record at once.
+
+Run this file (NuPIC installed) to feed one noisy repeating sequence to it,
+to TemporalMemory (TMShim, temporalImp "tm_py") and to the backtracking TM
+(BacktrackingTMCPP, "cpp"): it prints their anomaly scores compared record
+by record with the TemporalMemory ones, their time per record and their
+memory.
+
+-- ArrayTemporalMemory: the temporal memory
+'''
+
+import numpy as np
+
+
+# same constant as NuPIC's TemporalMemory
+_EPSILON = 0.00001
+
+# globalDecay and maxAge TMRegion fills in when they are not set, those of
+# NuPIC's TMShim, which ignores them too
+_SHIM_DECAY = (0.10, 100000)
+
+# first sizes of the growing arrays
+_SEGMENTS = 1024
+_TAIL = 4096
+
+
+def _grown(array, size):
+    # a copy of `array` with room for `size` rows, the new rows zeroed
+    grown = np.zeros((size,) + array.shape[1:], dtype=array.dtype)
+    grown[:len(array)] = array
+    return grown
+
+
+def _unique(values):
+    # np.unique, without its overhead on the short arrays of one record
+    values = np.sort(values)
+    if len(values) > 1:
+        values = values[np.concatenate([[True], values[1:] != values[:-1]])]
+    return values
+
+
+class ArrayTemporalMemory(object):
+    '''
+    -- numberOfCols, cellsPerColumn: the columns and cells
+    -- initialPerm, connectedPerm: permanence of new and of connected synapses
+    -- minThreshold: active synapses of a matching segment
+    -- activationThreshold: active connected synapses of an active segment
+    -- newSynapseCount: synapses grown on a learning segment, at most
+    -- permanenceInc, permanenceDec: learning of the synapses
+    -- predictedSegmentDecrement: punishment of wrong predictions
+    -- maxSegmentsPerCell, maxSynapsesPerSegment: capacity, at most 255
+                                                  synapses per segment
+    -- seed: seed of the random choices
+    -- globalDecay, maxAge, pamLength: parameters of the backtracking TM,
+       pamLength must be 1 and globalDecay or maxAge 0 (or both at their
+       defaults), ValueError otherwise
+    -- permanenceMax, outputType, verbosity: taken for TMRegion, not used by
+                                             this algorithm
+
+    -- compute: run one record, learning if enableLearn. Returns the active
+                and predictive cells as 0 / 1
+    -- topDownCompute: the columns predicted for the next record
+    -- anomalyScore: share of the active columns of the last record that
+                     were not predicted
+    -- reset: forget the sequence
+    -- nbytes: memory of the arrays
+    '''
+
+    def __init__(self,
+                 numberOfCols=500,
+                 cellsPerColumn=10,
+                 initialPerm=0.11,
+                 connectedPerm=0.50,
+                 minThreshold=8,
+                 newSynapseCount=15,
+                 permanenceInc=0.10,
+                 permanenceDec=0.10,
+                 permanenceMax=1.0,
+                 activationThreshold=12,
+                 predictedSegmentDecrement=0.0,
+                 maxSegmentsPerCell=255,
+                 maxSynapsesPerSegment=255,
+                 globalDecay=0.10,
+                 maxAge=100000,
+                 pamLength=1,
+                 verbosity=0,
+                 outputType="normal",
+                 seed=42):
+        if maxSynapsesPerSegment > 255:
+            raise ValueError("ArrayTemporalMemory keeps at most 255 synapses per segment")
+        if pamLength != 1:
+            raise ValueError("ArrayTemporalMemory does not backtrack, pamLength must be 1 "
+                             "(the backtracking TM is temporalImp \"cpp\")")
+        if globalDecay and maxAge and (globalDecay, maxAge) != _SHIM_DECAY:
+            raise ValueError("ArrayTemporalMemory has no global decay, globalDecay or maxAge "
+                             "must be 0 (the backtracking TM is temporalImp \"cpp\")")
+        self._numColumns = numberOfCols
+        self._cellsPerColumn = cellsPerColumn
+        self._numCells = numberOfCols * cellsPerColumn
+        self._initialPerm = initialPerm
+        self._connectedPerm = connectedPerm
+        self._minThreshold = minThreshold
+        self._newSynapseCount = newSynapseCount
+        self._permanenceInc = permanenceInc
+        self._permanenceDec = permanenceDec
+        self._activationThreshold = activationThreshold
+        self._predictedSegmentDecrement = predictedSegmentDecrement
+        self._maxSegmentsPerCell = maxSegmentsPerCell
+        self._maxSynapses = maxSynapsesPerSegment
+        self._random = np.random.RandomState(seed)
+        self._cellType = np.uint16 if self._numCells <= 1 << 16 else np.uint32
+
+        # the segments, row by row; a free row has cell -1
+        self._segmentCell = np.full(_SEGMENTS, -1, dtype=np.int32)
+        self._segmentCount = np.zeros(_SEGMENTS, dtype=np.uint8)
+        self._segmentLastUsed = np.zeros(_SEGMENTS, dtype=np.uint32)
+        self._segmentOrdinal = np.zeros(_SEGMENTS, dtype=np.uint32)
+        self._presynaptic = np.zeros((_SEGMENTS, self._maxSynapses), dtype=self._cellType)
+        self._permanences = np.zeros((_SEGMENTS, self._maxSynapses), dtype=np.float16)
+        self._numSegmentRows = 0
+        self._freeSegments = []
+        self._cellSegments = np.zeros(self._numCells, dtype=np.int32)
+        self._numSynapses = 0
+        self._nextOrdinal = 0
+        self._iteration = 0
+
+        # presynaptic cell -> (segment, slot): sorted part and tail. Entries
+        # of synapses gone or moved stay until the next rebuild and are
+        # recognised by the slot no longer holding their cell.
+        self._indexStart = np.zeros(self._numCells + 1, dtype=np.int64)
+        self._indexSegment = np.zeros(0, dtype=np.int32)
+        self._indexSlot = np.zeros(0, dtype=np.uint8)
+        self._tailCell = np.zeros(_TAIL, dtype=self._cellType)
+        self._tailSegment = np.zeros(_TAIL, dtype=np.int32)
+        self._tailSlot = np.zeros(_TAIL, dtype=np.uint8)
+        self._tailCount = 0
+
+        self.reset()
+        self.infActiveState = {"t": None}
+        self.anomalyScore = 0.0
+
+    def reset(self):
+        self._activeCells = np.zeros(0, dtype=np.int64)
+        self._winnerCells = np.zeros(0, dtype=np.int64)
+        self._predictiveCells = np.zeros(0, dtype=np.int64)
+        self._activeSegments = np.zeros(0, dtype=np.int64)
+        self._matchingSegments = np.zeros(0, dtype=np.int64)
+        self._numActivePotential = np.zeros(0, dtype=np.int64)
+
+    # segments
+
+    def _createSegment(self, cell):
+        if self._cellSegments[cell] >= self._maxSegmentsPerCell:
+            # the least recently used segment of the cell makes room
+            segments = np.flatnonzero(self._segmentCell[:self._numSegmentRows] == cell)
+            self._destroySegments(segments[np.argmin(self._segmentLastUsed[segments])][None])
+        if self._freeSegments:
+            segment = self._freeSegments.pop()
+        else:
+            segment = self._numSegmentRows
+            self._numSegmentRows += 1
+            if segment >= len(self._segmentCell):
+                self._growSegmentRows()
+        self._segmentCell[segment] = cell
+        self._segmentCount[segment] = 0
+        self._segmentLastUsed[segment] = self._iteration
+        self._segmentOrdinal[segment] = self._nextOrdinal
+        self._nextOrdinal += 1
+        self._cellSegments[cell] += 1
+        return segment
+
+    def _growSegmentRows(self):
+        size = 2 * len(self._segmentCell)
+        self._segmentCell = _grown(self._segmentCell, size)
+        self._segmentCell[self._numSegmentRows:] = -1
+        self._segmentCount = _grown(self._segmentCount, size)
+        self._segmentLastUsed = _grown(self._segmentLastUsed, size)
+        self._segmentOrdinal = _grown(self._segmentOrdinal, size)
+        self._presynaptic = _grown(self._presynaptic, size)
+        self._permanences = _grown(self._permanences, size)
+
+    def _destroySegments(self, segments):
+        if not len(segments):
+            return
+        self._numSynapses -= int(self._segmentCount[segments].sum())
+        np.subtract.at(self._cellSegments, self._segmentCell[segments], 1)
+        self._segmentCount[segments] = 0
+        self._segmentCell[segments] = -1
+        self._freeSegments.extend(segments.tolist())
+
+    # presynaptic index
+
+    def _addToIndex(self, cells, segments, slots):
+        count = len(cells)
+        if self._tailCount + count > len(self._tailCell):
+            size = max(2 * len(self._tailCell), self._tailCount + count)
+            self._tailCell = _grown(self._tailCell, size)
+            self._tailSegment = _grown(self._tailSegment, size)
+            self._tailSlot = _grown(self._tailSlot, size)
+        end = self._tailCount + count
+        self._tailCell[self._tailCount:end] = cells
+        self._tailSegment[self._tailCount:end] = segments
+        self._tailSlot[self._tailCount:end] = slots
+        self._tailCount = end
+
+    def _rebuildIndex(self):
+        rows = self._numSegmentRows
+        live = np.arange(self._maxSynapses) < self._segmentCount[:rows, None]
+        segments, slots = np.nonzero(live)
+        cells = self._presynaptic[segments, slots]
+        order = np.argsort(cells, kind='mergesort')
+        self._indexSegment = segments[order].astype(np.int32)
+        self._indexSlot = slots[order].astype(np.uint8)
+        self._indexStart[1:] = np.cumsum(np.bincount(cells, minlength=self._numCells))
+        self._tailCount = 0
+
+    def _maybeRebuildIndex(self):
+        # the tail is scanned whole for every record, keep it short
+        if self._tailCount > max(_TAIL, self._numSynapses // 16):
+            self._rebuildIndex()
+
+    def _synapsesOf(self, cells):
+        '''
+        (segments, slots) of the live synapses from any of the cells, each
+        once.
+        '''
+        starts = self._indexStart[cells]
+        lengths = self._indexStart[cells + 1] - starts
+        total = int(lengths.sum())
+        # positions of every entry of the cells in the sorted part
+        positions = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(total)
+        owners = np.repeat(cells, lengths)
+        segments = self._indexSegment[positions]
+        slots = self._indexSlot[positions]
+        if self._tailCount:
+            selected = np.zeros(self._numCells, dtype=bool)
+            selected[cells] = True
+            tail = np.flatnonzero(selected[self._tailCell[:self._tailCount]])
+            owners = np.concatenate([owners, self._tailCell[tail]])
+            segments = np.concatenate([segments, self._tailSegment[tail]])
+            slots = np.concatenate([slots, self._tailSlot[tail]])
+        valid = ((slots < self._segmentCount[segments]) &
+                 (self._presynaptic[segments, slots] == owners))
+        keys = _unique(segments[valid].astype(np.int64) * self._maxSynapses + slots[valid])
+        return keys // self._maxSynapses, keys % self._maxSynapses
+
+    # learning
+
+    def _compact(self, segments, keep):
+        '''
+        Keep the synapses marked in `keep` (segments x slots), in their
+        order, and destroy the segments left without any.
+        '''
+        live = np.arange(self._maxSynapses) < self._segmentCount[segments, None]
+        changed = np.flatnonzero((keep != live).any(axis=1))
+        if not len(changed):
+            return
+        segments = segments[changed]
+        keep = keep[changed]
+        order = np.argsort(~keep, axis=1, kind='mergesort')
+        rows = np.arange(len(segments))[:, None]
+        self._presynaptic[segments] = self._presynaptic[segments][rows, order]
+        self._permanences[segments] = self._permanences[segments][rows, order]
+        counts = keep.sum(axis=1)
+        self._numSynapses -= int(self._segmentCount[segments].sum() - counts.sum())
+        self._segmentCount[segments] = counts
+        # synapses that moved to another slot get an index entry there
+        moved = (order != np.arange(self._maxSynapses)) & (np.arange(self._maxSynapses) < counts[:, None])
+        movedRows, movedSlots = np.nonzero(moved)
+        self._addToIndex(self._presynaptic[segments[movedRows], movedSlots],
+                         segments[movedRows], movedSlots)
+        self._destroySegments(segments[counts == 0])
+
+    def _adaptSegments(self, segments, previousActive, increment, decrement):
+        if not len(segments):
+            return
+        live = np.arange(self._maxSynapses) < self._segmentCount[segments, None]
+        active = previousActive[self._presynaptic[segments]]
+        permanences = self._permanences[segments].astype(np.float32)
+        permanences += np.where(active, np.float32(increment), np.float32(-decrement))
+        np.clip(permanences, 0.0, 1.0, out=permanences)
+        self._permanences[segments] = permanences
+        self._compact(segments, live & (permanences >= _EPSILON))
+
+    def _destroyMinPermanenceSynapses(self, segments, counts, excluded):
+        # the `counts` weakest synapses of every segment, not from an
+        # excluded cell, go; of equal ones the oldest
+        live = np.arange(self._maxSynapses) < self._segmentCount[segments, None]
+        candidates = live & ~excluded[self._presynaptic[segments]]
+        keys = np.where(candidates, self._permanences[segments].astype(np.float32), np.inf)
+        order = np.argsort(keys, axis=1, kind='mergesort')
+        rows = np.arange(len(segments))[:, None]
+        destroy = np.zeros(live.shape, dtype=bool)
+        destroy[rows, order] = np.arange(self._maxSynapses) < counts[:, None]
+        self._compact(segments, live & ~(destroy & candidates))
+
+    def _growSynapses(self, segments, desired, previousWinners, winnerMask):
+        '''
+        Grow up to `desired` synapses on every segment, from previous winner
+        cells it has no synapse from yet, chosen at random.
+        '''
+        grow = desired > 0
+        segments, desired = segments[grow], desired[grow]
+        if not len(segments) or not len(previousWinners):
+            return
+        live = np.arange(self._maxSynapses) < self._segmentCount[segments, None]
+        present = ((self._presynaptic[segments][:, :, None] == previousWinners[None, None, :]) &
+                   live[:, :, None]).any(axis=1)
+        actual = np.minimum(desired, len(previousWinners) - present.sum(axis=1))
+        overrun = self._segmentCount[segments].astype(np.int64) + actual - self._maxSynapses
+        if (overrun > 0).any():
+            full = np.flatnonzero(overrun > 0)
+            self._destroyMinPermanenceSynapses(segments[full], overrun[full], winnerMask)
+            actual = np.minimum(actual, self._maxSynapses - self._segmentCount[segments].astype(np.int64))
+
+        keys = self._random.rand(len(segments), len(previousWinners))
+        keys[present] = 2.0
+        chosen = np.argsort(keys, axis=1)
+        rows, picks = np.nonzero(np.arange(len(previousWinners)) < actual[:, None])
+        cells = previousWinners[chosen[rows, picks]]
+        targets = segments[rows]
+        slots = self._segmentCount[targets].astype(np.int64) + picks
+        self._presynaptic[targets, slots] = cells
+        self._permanences[targets, slots] = self._initialPerm
+        self._segmentCount[segments] += actual.astype(np.uint8)
+        self._numSynapses += int(actual.sum())
+        self._addToIndex(cells, targets, slots)
+
+    # one record
+
+    def _activateCells(self, activeColumns, learn):
+        previousActive = np.zeros(self._numCells, dtype=bool)
+        previousActive[self._activeCells] = True
+        previousWinners = self._winnerCells
+        winnerMask = np.zeros(self._numCells, dtype=bool)
+        winnerMask[previousWinners] = True
+        cellsPerColumn = self._cellsPerColumn
+
+        active = np.zeros(self._numColumns, dtype=bool)
+        active[activeColumns] = True
+        predicted = np.zeros(self._numColumns, dtype=bool)
+        predicted[self._predictiveCells // cellsPerColumn] = True
+        bursting = activeColumns[~predicted[activeColumns]]
+        burst = np.zeros(self._numColumns, dtype=bool)
+        burst[bursting] = True
+        correctSegments = self._activeSegments[
+            active[self._segmentCell[self._activeSegments] // cellsPerColumn]]
+        predictedCells = _unique(self._segmentCell[correctSegments])
+
+        # bursting columns learn on their best matching segment
+        matchingColumns = self._segmentCell[self._matchingSegments] // cellsPerColumn
+        inBurst = burst[matchingColumns]
+        matching = self._matchingSegments[inBurst]
+        matchingColumns = matchingColumns[inBurst]
+        order = np.lexsort((self._segmentOrdinal[matching], self._segmentCell[matching],
+                            -self._numActivePotential[matching], matchingColumns))
+        matching, matchingColumns = matching[order], matchingColumns[order]
+        first = np.ones(len(matching), dtype=bool)
+        first[1:] = matchingColumns[1:] != matchingColumns[:-1]
+        bestSegments = matching[first]
+
+        # or on a new segment of one of their least used cells
+        burst[matchingColumns[first]] = False
+        unmatched = np.flatnonzero(burst)
+        cells = unmatched[:, None] * cellsPerColumn + np.arange(cellsPerColumn)
+        leastUsed = self._cellSegments[cells] + self._random.rand(*cells.shape)
+        newWinners = cells[np.arange(len(unmatched)), np.argmin(leastUsed, axis=1)]
+
+        burstCells = (bursting[:, None] * cellsPerColumn + np.arange(cellsPerColumn)).ravel()
+        self._activeCells = np.sort(np.concatenate([predictedCells, burstCells]))
+        self._winnerCells = np.sort(np.concatenate([predictedCells, self._segmentCell[bestSegments],
+                                                    newWinners]))
+
+        if not learn:
+            return
+        learning = np.concatenate([correctSegments, bestSegments])
+        self._adaptSegments(learning, previousActive, self._permanenceInc, self._permanenceDec)
+        self._growSynapses(learning, self._newSynapseCount - self._numActivePotential[learning],
+                           previousWinners, winnerMask)
+        if self._predictedSegmentDecrement > 0:
+            wrong = self._matchingSegments[
+                ~active[self._segmentCell[self._matchingSegments] // cellsPerColumn]]
+            self._adaptSegments(wrong, previousActive, -self._predictedSegmentDecrement, 0.0)
+        if len(previousWinners):
+            created = np.array([self._createSegment(cell) for cell in newWinners], dtype=np.int64)
+            self._growSynapses(created, np.full(len(created), min(self._newSynapseCount, len(previousWinners))),
+                               previousWinners, winnerMask)
+
+    def _activateDendrites(self, learn):
+        segments, slots = self._synapsesOf(self._activeCells)
+        rows = self._numSegmentRows
+        potential = np.bincount(segments, minlength=rows)
+        connected = self._permanences[segments, slots] >= self._connectedPerm - _EPSILON
+        active = np.bincount(segments[connected], minlength=rows)
+        self._activeSegments = np.flatnonzero(active >= self._activationThreshold)
+        self._matchingSegments = np.flatnonzero(potential >= self._minThreshold)
+        self._numActivePotential = potential
+        self._predictiveCells = _unique(self._segmentCell[self._activeSegments])
+        if learn:
+            self._segmentLastUsed[self._activeSegments] = self._iteration
+            self._iteration += 1
+
+    def compute(self, bottomUpInput, enableLearn, computeInfOutput=None):
+        activeColumns = np.flatnonzero(bottomUpInput)
+        predicted = np.zeros(self._numColumns, dtype=bool)
+        predicted[self._predictiveCells // self._cellsPerColumn] = True
+        if len(activeColumns):
+            self.anomalyScore = 1.0 - predicted[activeColumns].sum() / float(len(activeColumns))
+        else:
+            self.anomalyScore = 0.0
+
+        self._activateCells(activeColumns, enableLearn)
+        self._activateDendrites(enableLearn)
+        if enableLearn:
+            self._maybeRebuildIndex()
+
+        activeState = np.zeros(self._numCells, dtype=np.float32)
+        activeState[self._activeCells] = 1
+        self.infActiveState["t"] = activeState
+        output = np.zeros(self._numCells, dtype=np.float32)
+        output[self._predictiveCells] = 1
+        output[self._activeCells] = 1
+        return output
+
+    def topDownCompute(self, topDownIn=None):
+        output = np.zeros(self._numColumns, dtype=np.float32)
+        output[self._predictiveCells // self._cellsPerColumn] = 1
+        return output
+
+    # state, in the form TMRegion reads it from the NuPIC shims
+
+    def getActiveState(self):
+        state = np.zeros(self._numCells, dtype=np.float32)
+        state[self._activeCells] = 1
+        return state
+
+    def getPredictedState(self):
+        state = np.zeros(self._numCells, dtype=np.float32)
+        state[self._predictiveCells] = 1
+        return state
+
+    def getLearnActiveStateT(self):
+        state = np.zeros((self._numColumns, self._cellsPerColumn), dtype=np.float32)
+        state.reshape(-1)[self._winnerCells] = 1
+        return state
+
+    def getActiveCells(self):
+        return self._activeCells
+
+    def getWinnerCells(self):
+        return self._winnerCells
+
+    def getPredictiveCells(self):
+        return self._predictiveCells
+
+    def numberOfColumns(self):
+        return self._numColumns
+
+    def numberOfCells(self):
+        return self._numCells
+
+    def getCellsPerColumn(self):
+        return self._cellsPerColumn
+
+    def getNumSegments(self):
+        return self._numSegmentRows - len(self._freeSegments)
+
+    def getNumSynapses(self):
+        return self._numSynapses
+
+    def finishLearning(self):
+        pass
+
+    @property
+    def nbytes(self):
+        return sum(value.nbytes for value in self.__dict__.values() if isinstance(value, np.ndarray))
+
+
+if __name__ == '__main__':
+    import time
+    import pickle
+    from nupic.algorithms.backtracking_tm_shim import TMShim
+    from nupic.algorithms.backtracking_tm_cpp import BacktrackingTMCPP
+
+    COLUMNS, ACTIVE, RECORDS = 2048, 40, 3000
+    random = np.random.RandomState(1)
+    # a repeating sequence of 50 SDRs with a little noise
+    sequence = [random.choice(COLUMNS, ACTIVE, replace=False) for _ in range(50)]
+
+    def record(k):
+        columns = sequence[k % len(sequence)].copy()
+        columns[random.rand(ACTIVE) < 0.05] = random.randint(COLUMNS)
+        vector = np.zeros(COLUMNS, dtype=np.float32)
+        vector[columns] = 1
+        return vector
+
+    inputs = [record(k) for k in range(RECORDS)]
+    # the TM parameters of MNetsChemicalHTM-v2.py, pamLength 1
+    params = dict(numberOfCols=COLUMNS, cellsPerColumn=32, initialPerm=0.21,
+                  connectedPerm=0.5, minThreshold=9, newSynapseCount=20,
+                  permanenceInc=0.1, permanenceDec=0.1, activationThreshold=12,
+                  maxSegmentsPerCell=128, maxSynapsesPerSegment=32,
+                  globalDecay=0.0, maxAge=0, pamLength=1, seed=1960)
+
+    def run(tm):
+        # the raw anomaly score of TMRegion: active columns that the
+        # previous record did not predict
+        scores = np.zeros(RECORDS)
+        start = time.time()
+        for k, vector in enumerate(inputs):
+            predicted = tm.topDownCompute() > 0
+            tm.compute(vector, True, True)
+            active = np.flatnonzero(vector)
+            scores[k] = 1.0 - predicted[active].sum() / float(len(active))
+        return scores, time.time() - start
+
+    reference = None
+    for name, tm in (("TemporalMemory (tm_py)", TMShim(**params)),
+                     ("ArrayTemporalMemory", ArrayTemporalMemory(**params)),
+                     ("BacktrackingTMCPP (cpp)", BacktrackingTMCPP(**params))):
+        scores, elapsed = run(tm)
+        if reference is None:
+            reference = scores
+        difference = np.abs(scores - reference)
+        print(name)
+        print('  %.1f us per record, saved in %.1f MB'
+              % (elapsed / RECORDS * 1e6, len(pickle.dumps(tm, pickle.HIGHEST_PROTOCOL)) / 1e6))
+        if isinstance(tm, ArrayTemporalMemory):
+            print('  %d segments, %d synapses, %.1f MB of arrays'
+                  % (tm.getNumSegments(), tm.getNumSynapses(), tm.nbytes / 1e6))
+        print('  anomaly score, first 100 records %.3f, last 100 %.3f'
+              % (scores[:100].mean(), scores[-100:].mean()))
+        print('  against TemporalMemory: %.1f%% of the records equal, mean difference %.3f'
+              % (100.0 * (difference < 1e-9).mean(), difference.mean()))
@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+'''
+TMRegion that can run the NumPy array temporal memory.
+
+With "temporalImp": "array" in the TM parameters the region computes with
+ArrayTemporalMemory (array_temporal_memory.py), the TemporalMemory
+algorithm of "tm_py" in NumPy arrays. It is not the backtracking TM of
+"cpp": the anomaly scores of a network switched over change, and
+pamLength > 1 or a global decay are refused. The other parameters are the
+usual TMRegion ones, and the anomaly score is computed by TMRegion as for
+the other TMs. Any other temporalImp behaves exactly like TMRegion.
+network_factory.py registers the region, so saved networks that use it load
+as well.
+
+-- ArrayTMRegion: the region, "py.ArrayTMRegion" in a network
+'''
+
+from nupic.regions.tm_region import TMRegion
+from array_temporal_memory import ArrayTemporalMemory
+
+
+class ArrayTMRegion(TMRegion):
+    '''
+    -- temporalImp: "array" for ArrayTemporalMemory, else as in TMRegion
+    '''
+
+    def __init__(self, columnCount, inputWidth, cellsPerColumn, temporalImp="array", **kwargs):
+        array = temporalImp == "array"
+        # the parameters of the array TM are those of NuPIC's TM shim
+        TMRegion.__init__(self, columnCount, inputWidth, cellsPerColumn,
+                          temporalImp="tm_py" if array else temporalImp, **kwargs)
+        if array:
+            self.temporalImp = temporalImp
+
+    def initialize(self):
+        if self._tfdr is None and self.temporalImp == "array":
+            autoArgs = dict((name, getattr(self, name)) for name in self._temporalArgNames)
+            self._tfdr = ArrayTemporalMemory(numberOfCols=self.columnCount,
+                                             cellsPerColumn=self.cellsPerColumn, **autoArgs)
+        TMRegion.initialize(self)
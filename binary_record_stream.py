@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+'''
+Memory-mapped binary record stream for RecordSensor.dataSource.
+
+A NuPIC CSV file is converted once into a fixed-width binary file
+(<file>.npy, one structured record per row) plus the three header rows in
+<file>.json. Every stream over the file memory-maps it read-only, so the
+twelve networks of a replay and all worker processes share the same pages
+instead of text-parsing the CSV twelve times, and any record can be reached
+directly for replays that start in the middle of the history.
+
+-- BinaryRecordStream: read-only RecordStreamIface over the binary file
+-- convertToBinary: write (or refresh) the binary file of a CSV file
+'''
+
+import os
+import json
+import numpy as np
+from nupic.data import SENTINEL_VALUE_FOR_MISSING_DATA
+from nupic.data.field_meta import FieldMetaInfo
+from nupic.data.record_stream import RecordStreamIface
+from record_loader import loadRecords
+
+
+def _binaryPaths(path):
+    return path + ".npy", path + ".json"
+
+
+def _isFresh(path):
+    binary_path, header_path = _binaryPaths(path)
+    if not (os.path.exists(binary_path) and os.path.exists(header_path)):
+        return False
+    return (os.path.getmtime(binary_path) >= os.path.getmtime(path) and
+            os.path.getmtime(header_path) >= os.path.getmtime(path))
+
+
+def convertToBinary(path, datetime_format='%Y-%m-%d %H:%M:%S'):
+    '''
+    Convert a NuPIC CSV file into <path>.npy and <path>.json, unless they are
+    already newer than the CSV file. Returns the path of the binary file.
+    '''
+    binary_path, header_path = _binaryPaths(path)
+    if _isFresh(path):
+        return binary_path
+
+    table = loadRecords(path, datetime_format=datetime_format)
+    columns = []
+    for name in table.names:
+        column = table[name]
+        if column.dtype.kind == 'U':
+            # fixed-width bytes, the same str NuPIC gets from the CSV reader
+            column = column.astype('S')
+        columns.append(column)
+    records = np.empty(len(table), dtype=[(str(name), column.dtype)
+                                          for name, column in zip(table.names, columns)])
+    for name, column in zip(table.names, columns):
+        records[str(name)] = column
+
+    # write next to the final files and rename, so concurrent readers never
+    # map a half-written file
+    np.save(binary_path + ".tmp.npy", records)
+    with open(header_path + ".tmp", 'w') as fout:
+        json.dump({"names": table.names, "types": table.types, "flags": table.flags}, fout)
+    os.rename(binary_path + ".tmp.npy", binary_path)
+    os.rename(header_path + ".tmp", header_path)
+    return binary_path
+
+
+class BinaryRecordStream(RecordStreamIface):
+    '''
+    Drop-in, read-only replacement of FileRecordStream for replays.
+
+    -- streamID: path of the NuPIC CSV file. Its binary file is created on
+                 first use if convertToBinary was not called beforehand.
+    -- start: index of the first record to return
+
+    -- seek: move to any record index
+    -- getNextRecord: the next record as a list of Python values, None at
+                      the end of the file
+    '''
+
+    def __init__(self, streamID, start=0):
+        super(BinaryRecordStream, self).__init__()
+        binary_path, header_path = _binaryPaths(streamID)
+        if not _isFresh(streamID):
+            convertToBinary(streamID)
+        with open(header_path) as fin:
+            header = json.load(fin)
+
+        self._streamID = streamID
+        self._records = np.load(binary_path, mmap_mode='r')
+        self._fieldNames = [str(name) for name in header["names"]]
+        self._fields = FieldMetaInfo.createListFromFileFieldList(
+            [(str(name), str(fieldType), str(flag)) for name, fieldType, flag
+             in zip(header["names"], header["types"], header["flags"])])
+        self._nextIdx = start
+        self._error = None
+        self._completed = False
+
+    def __len__(self):
+        return len(self._records)
+
+    def close(self):
+        self._records = None
+
+    def rewind(self):
+        super(BinaryRecordStream, self).rewind()
+        self._nextIdx = 0
+
+    def seek(self, index):
+        if index < 0:
+            index += len(self._records)
+        self._nextIdx = max(0, min(index, len(self._records)))
+
+    def _record(self, index):
+        # a structured scalar turns into a tuple of Python values, with the
+        # datetime64 fields as datetime objects; missing numbers are NaN in
+        # the file and None for NuPIC, as FileRecordStream gives them
+        return [SENTINEL_VALUE_FOR_MISSING_DATA if value != value else value
+                for value in self._records[index].item()]
+
+    def getNextRecord(self, useCache=True):
+        if self._nextIdx >= len(self._records):
+            return None
+        record = self._record(self._nextIdx)
+        self._nextIdx += 1
+        return record
+
+    def getNextRecordIdx(self):
+        return self._nextIdx
+
+    def getRecordsRange(self, bookmark=None, range=None):
+        start, end = range if range is not None else (0, len(self._records))
+        return [self._record(index) for index in xrange(start, min(end, len(self._records)))]
+
+    def getLastRecords(self, numRecords):
+        start = max(0, len(self._records) - numRecords)
+        return [self._record(index) for index in xrange(start, len(self._records))]
+
+    def getDataRowCount(self):
+        return len(self._records)
+
+    def getBookmark(self):
+        return json.dumps({"filepath": os.path.realpath(self._streamID),
+                           "currentRow": self._nextIdx})
+
+    def recordsExistAfter(self, bookmark):
+        return json.loads(bookmark)["currentRow"] < len(self._records)
+
+    def seekFromEnd(self, numRecords):
+        self.seek(len(self._records) - numRecords)
+        return self.getBookmark()
+
+    def getStats(self):
+        minimum, maximum = [], []
+        for name in self._fieldNames:
+            column = self._records[name]
+            if column.dtype.kind in 'if' and len(column):
+                minimum.append(np.nanmin(column).item())
+                maximum.append(np.nanmax(column).item())
+            else:
+                minimum.append(None)
+                maximum.append(None)
+        return {"min": minimum, "max": maximum}
+
+    def clearStats(self):
+        pass
+
+    def getError(self):
+        return self._error
+
+    def setError(self, error):
+        self._error = error
+
+    def isCompleted(self):
+        return self._completed
+
+    def setCompleted(self, completed=True):
+        self._completed = completed
+
+    def getFieldNames(self):
+        return list(self._fieldNames)
+
+    def getFields(self):
+        return list(self._fields)
+
+    def setTimeout(self, timeout):
+        pass
+
+    def flush(self):
+        pass
+
+    def removeOldData(self):
+        raise RuntimeError("BinaryRecordStream is read-only")
+
+    def appendRecord(self, record):
+        raise RuntimeError("BinaryRecordStream is read-only")
+
+    def appendRecords(self, records, progressCB=None):
+        raise RuntimeError("BinaryRecordStream is read-only")
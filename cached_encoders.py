@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+'''
+Date encoder that shares its encodings between the networks of a process.
+
+All the networks of a channel list encode the same Time field with the same
+DateEncoder. SharedDateEncoder keeps the encodings of the last records in a
+cache shared by every instance with the same arguments in the process, so
+of the networks run on one record (one worker's share of them, see
+network_engine.py) only the first computes the date encoding. The scalar
+channels have LookupScalarEncoder (see lookup_encoder.py). The outputs are
+bit for bit those of the NuPIC encoders.
+
+-- SharedDateEncoder: DateEncoder with a cache shared per process
+'''
+
+import collections
+from nupic.encoders import DateEncoder
+
+
+# records kept by the date cache, a few in case the networks drift apart
+_SHARED_RECORDS = 16
+
+
+class SharedDateEncoder(DateEncoder):
+    '''
+    Takes the arguments of DateEncoder, as keywords.
+    '''
+
+    # (arguments, date) -> encoding, oldest first
+    _shared = collections.OrderedDict()
+
+    def __init__(self, **kwargs):
+        DateEncoder.__init__(self, **kwargs)
+        self._sharedKey = tuple(sorted((name, repr(value)) for name, value in kwargs.items()))
+
+    def encodeIntoArray(self, input, output):
+        key = (self._sharedKey, input)
+        encoding = SharedDateEncoder._shared.get(key)
+        if encoding is None:
+            DateEncoder.encodeIntoArray(self, input, output)
+            encoding = output[:self.getWidth()].copy()
+            SharedDateEncoder._shared[key] = encoding
+            if len(SharedDateEncoder._shared) > _SHARED_RECORDS:
+                SharedDateEncoder._shared.popitem(last=False)
+        else:
+            output[:len(encoding)] = encoding
@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+'''
+Checkpoints of running models, written off the scoring loop.
+
+Every checkpoint is a directory <directory>/checkpoint-<record>. It is
+written under a temporary name and renamed into place once complete, so a
+crash while saving never leaves a half-written checkpoint behind, and it
+records the index of the next record to score so a restart resumes exactly
+where the run stopped. Only the last `keep` generations are kept.
+
+save() forks the process: the child writes a copy-on-write snapshot of the
+models while the parent goes on scoring. Without fork (Windows) the
+checkpoint is written in-process. Models living in worker processes must
+not be written from a forked child, which would talk on the parent's pipes:
+given `wait`, save() calls the writer in this process, to start a
+background save in the workers (NetworkEngine.save, ModelGroup.save_model),
+and the checkpoint is committed once `wait` reports it written.
+
+-- CheckpointManager: write, find and prune checkpoints
+'''
+
+import os
+import json
+import time
+import shutil
+import traceback
+
+
+_PREFIX = "checkpoint-"
+_INFO = "checkpoint.json"
+
+
+class CheckpointManager(object):
+    '''
+    -- directory: where the checkpoint directories live
+    -- keep: number of checkpoint generations kept
+
+    -- save: write a checkpoint in a forked child, or start its background
+             save in the workers, returns at once
+    -- begin, commit: write a checkpoint by hand. begin returns the temporary
+                      directory to write into, commit renames it into place.
+    -- abort: remove the temporary directory of a checkpoint whose writing
+              failed, instead of committing it
+    -- wait: block until the running save is done, returns whether it
+             succeeded
+    -- latest: (path, record) of the newest checkpoint, (None, None) if none
+    '''
+
+    def __init__(self, directory, keep=3):
+        self.directory = directory
+        self.keep = keep
+        self._pid = None
+        self._pending = None
+        self._temp = None
+        self._record = None
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    def _path(self, record):
+        return os.path.join(self.directory, "%s%012d" % (_PREFIX, record))
+
+    def begin(self, record):
+        self._record = record
+        self._temp = os.path.join(self.directory, ".%s%012d.tmp-%d" % (_PREFIX, record, os.getpid()))
+        if os.path.exists(self._temp):
+            shutil.rmtree(self._temp)
+        os.makedirs(self._temp)
+        return self._temp
+
+    def commit(self):
+        with open(os.path.join(self._temp, _INFO), 'w') as fout:
+            json.dump({"record": self._record, "time": time.time()}, fout)
+        path = self._path(self._record)
+        if os.path.exists(path):
+            shutil.rmtree(path)
+        os.rename(self._temp, path)
+        self._temp = None
+        self._prune()
+        return path
+
+    def abort(self):
+        if self._temp is not None:
+            shutil.rmtree(self._temp, ignore_errors=True)
+            self._temp = None
+
+    def _checkpoints(self):
+        names = sorted(name for name in os.listdir(self.directory) if name.startswith(_PREFIX))
+        return [os.path.join(self.directory, name) for name in names]
+
+    def _prune(self):
+        for path in self._checkpoints()[:-self.keep]:
+            shutil.rmtree(path, ignore_errors=True)
+
+    def save(self, record, write, wait=None):
+        '''
+        -- record: index of the next record to score after a restart
+        -- write: callable(directory) writing the models into directory
+        -- wait: None to call write in a forked child. Else write only
+                 starts a background save, in this process, and
+                 wait() -> bool tells when it is done and whether it
+                 succeeded
+        '''
+        self.wait()
+        if wait is not None:
+            try:
+                write(self.begin(record))
+            except BaseException:
+                self.abort()
+                raise
+            self._pending = wait
+            return self._path(record)
+        if not hasattr(os, "fork"):
+            write(self.begin(record))
+            return self.commit()
+
+        pid = os.fork()
+        if pid == 0:
+            try:
+                write(self.begin(record))
+                self.commit()
+            except BaseException:
+                traceback.print_exc()
+                self.abort()
+                os._exit(1)
+            # leave without running the parent's exit handlers
+            os._exit(0)
+        self._pid = pid
+        return self._path(record)
+
+    def wait(self):
+        if self._pending is not None:
+            pending, self._pending = self._pending, None
+            if pending():
+                self.commit()
+                return True
+            self.abort()
+            return False
+        if self._pid is not None:
+            _, status = os.waitpid(self._pid, 0)
+            self._pid = None
+            return status == 0
+        return True
+
+    def latest(self):
+        for path in reversed(self._checkpoints()):
+            try:
+                with open(os.path.join(path, _INFO)) as fin:
+                    return path, json.load(fin)["record"]
+            except (IOError, OSError, ValueError, KeyError):
+                continue
+        return None, None
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+'''
+Incremental tracking of anomaly episodes.
+
+An episode is a run of consecutive anomalous records. The tracker extends the
+open episode or starts a new one on every anomalous record and closes it on
+the first normal one, so each record costs the same no matter how long the
+run is. The last few episodes feed the "Log date / Anomaly Likelihood /
+Duration" table, every episode of the run is kept for export.
+
+-- Episode: start, end, peak and last likelihood of one episode
+-- EpisodeTracker: follows the episodes record by record
+-- parseTimestamps: parse the date strings of a run once, up front
+'''
+
+import csv
+from collections import deque
+from datetime import datetime
+
+
+def parseTimestamps(dates, fmt='%Y-%m-%d %H:%M:%S'):
+    return [datetime.strptime(date, fmt) for date in dates]
+
+
+class Episode(object):
+    '''
+    -- start, end: timestamps of the first and last anomalous record
+    -- peak: highest likelihood seen during the episode
+    -- last: likelihood of the last record
+    -- records: number of anomalous records
+    -- duration: seconds between start and end
+    '''
+
+    __slots__ = ("start", "end", "peak", "last", "records")
+
+    def __init__(self, time, likelihood):
+        self.start = time
+        self.end = time
+        self.peak = likelihood
+        self.last = likelihood
+        self.records = 1
+
+    def extend(self, time, likelihood):
+        self.end = time
+        self.last = likelihood
+        self.peak = max(self.peak, likelihood)
+        self.records += 1
+
+    @property
+    def duration(self):
+        return float((self.end - self.start).total_seconds())
+
+
+class EpisodeTracker(object):
+    '''
+    -- max_episodes: number of recent episodes shown by table()
+    -- label: shown after the likelihood in the table, e.g. 'B'. Without a
+              label the likelihood is shown as a number.
+
+    -- update: feed one record; returns the open episode, or None
+    -- table: rows of (last date, likelihood, duration) of the recent
+              episodes, oldest first, padded to max_episodes rows
+    -- episodes: every episode of the run, oldest first
+    -- export: write every episode of the run to a CSV file
+    '''
+
+    def __init__(self, max_episodes=4, label=None):
+        self.max_episodes = max_episodes
+        self.label = label
+        self.episodes = []
+        self._recent = deque(maxlen=max_episodes)
+        self._open = None
+
+    def update(self, time, likelihood, anomalous):
+        if not anomalous:
+            self._open = None
+        elif self._open is not None:
+            self._open.extend(time, likelihood)
+        else:
+            self._open = Episode(time, likelihood)
+            self.episodes.append(self._open)
+            self._recent.append(self._open)
+        return self._open
+
+    def _row(self, episode):
+        if self.label is None:
+            likelihood = episode.last
+        else:
+            likelihood = str(episode.last) + ' (' + self.label + ')'
+        return [str(episode.end), likelihood, episode.duration]
+
+    def table(self):
+        rows = [self._row(episode) for episode in self._recent]
+        rows += [[' ', ' ', ' '] for _ in range(self.max_episodes - len(rows))]
+        return rows
+
+    def export(self, path):
+        with open(path, 'w') as fout:
+            writer = csv.writer(fout)
+            writer.writerow(["start", "end", "duration", "records",
+                             "peak likelihood", "last likelihood"])
+            for episode in self.episodes:
+                writer.writerow([episode.start, episode.end, episode.duration,
+                                 episode.records, episode.peak, episode.last])
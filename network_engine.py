@@ -0,0 +1,292 @@
+# -*- coding: utf-8 -*-
+'''
+Execution engine that steps several independent HTM networks concurrently.
+
+Every network is built by its factory inside a worker process, so the
+NuPIC networks never have to cross a process boundary. Workers are pinned to
+one core each and own a shard of the networks; for every record the engine
+broadcasts one "run" command and gathers the anomaly likelihoods back in the
+original channel order.
+
+Saved networks are loaded by all workers at the same time, and start() does
+not wait for them, so the caller can prepare its data meanwhile. With lazy
+loading a network is only built when it is first run.
+
+-- NetworkEngine: owns the worker pool and the networks
+-- LazyNetwork: builds a network on first use and times the build
+-- runNetworkOnce: run one network for one record and read its outputs
+-- roundRobin: default sharding of the networks across the workers
+'''
+
+import os
+import time
+import traceback
+import multiprocessing
+
+
+def runNetworkOnce(network):
+    '''
+    Run a network on its next record and return a tuple of
+    (anomaly likelihood, value fed into the sensor).
+    '''
+    network.run(1)
+    anomalyLikelihood = network.regions["anomalyLikelihoodRegion"].getOutputData("anomalyLikelihood")[0]
+    fed_in_data = network.regions["sensor"].getOutputData("sourceOut")[0]
+    return anomalyLikelihood, fed_in_data
+
+
+class LazyNetwork(object):
+    '''
+    Stand-in for the network returned by a factory.
+
+    -- materialize: build (or load) the network now
+    -- load_time: seconds the factory took, None until materialized
+
+    Any other attribute is looked up on the network, which is materialized
+    on first access.
+    '''
+
+    def __init__(self, factory):
+        self.factory = factory
+        self.load_time = None
+        self._network = None
+
+    def materialize(self):
+        if self._network is None:
+            start = time.time()
+            self._network = self.factory()
+            self.load_time = time.time() - start
+        return self._network
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return getattr(self.materialize(), name)
+
+
+def _loadNetworks(factories, lazy):
+    networks = [LazyNetwork(factory) for factory in factories]
+    if not lazy:
+        for network in networks:
+            network.materialize()
+    return networks
+
+
+def _saveNetworks(networks, paths, background):
+    '''
+    Save the networks, in a forked child if background. Returns the pid of
+    the child, or None when the networks were saved in this process.
+    '''
+    if background and hasattr(os, "fork"):
+        pid = os.fork()
+        if pid == 0:
+            try:
+                for network, path in zip(networks, paths):
+                    network.save(path)
+            except BaseException:
+                traceback.print_exc()
+                os._exit(1)
+            os._exit(0)
+        return pid
+    for network, path in zip(networks, paths):
+        network.save(path)
+    return None
+
+
+def _waitSave(pid):
+    if pid is None:
+        return True
+    _, status = os.waitpid(pid, 0)
+    return status == 0
+
+
+def roundRobin(count, num_workers):
+    '''
+    Indices of the networks owned by each worker, dealt out like cards.
+    '''
+    return [list(range(k, count, num_workers)) for k in range(num_workers)]
+
+
+def _pinToCpu(cpu):
+    try:
+        os.sched_setaffinity(0, [cpu])
+    except AttributeError:
+        # python 2 has no sched_setaffinity, fall back to psutil if present
+        try:
+            import psutil
+            psutil.Process().cpu_affinity([cpu])
+        except (ImportError, AttributeError):
+            pass
+
+
+def _worker(conn, factories, cpu, lazy):
+    if cpu is not None:
+        _pinToCpu(cpu)
+    try:
+        networks = _loadNetworks(factories, lazy)
+        conn.send(("ready", None))
+    except Exception:
+        conn.send(("error", traceback.format_exc()))
+        conn.close()
+        return
+
+    save_pid = None
+    while True:
+        command, args = conn.recv()
+        try:
+            if command == "run":
+                conn.send(("ok", [runNetworkOnce(network) for network in networks]))
+            elif command == "save":
+                paths, background = args
+                _waitSave(save_pid)
+                save_pid = _saveNetworks(networks, paths, background)
+                conn.send(("ok", None))
+            elif command == "wait_save":
+                ok = _waitSave(save_pid)
+                save_pid = None
+                conn.send(("ok", ok))
+            elif command == "load_times":
+                conn.send(("ok", [network.load_time for network in networks]))
+            elif command == "close":
+                _waitSave(save_pid)
+                conn.send(("ok", None))
+                break
+        except Exception:
+            conn.send(("error", traceback.format_exc()))
+    conn.close()
+
+
+class NetworkEngine(object):
+    '''
+    Run N independent networks (one per chemical variable) side by side.
+
+    -- factories: list of callables, each returning a ready-to-run Network.
+                  They are called inside the workers.
+    -- num_workers: number of worker processes. None uses one worker per core
+                    (capped by the number of networks), 0 runs every network
+                    serially in this process like the original loop.
+    -- pin_workers: pin worker k to core k (modulo the core count)
+    -- partition: callable(num_workers) returning the indices of the networks
+                  owned by each worker, round-robin by default
+    -- lazy: only build a network when it is first run
+
+    -- start: create the workers, which start building the networks.
+              Returns without waiting for them.
+    -- wait: block until every worker has built its networks
+    -- run: step every network once and return a list of
+            (anomaly likelihood, fed in data) in the order of factories
+    -- save: save every network, paths given in the order of factories.
+             With background=True every worker forks and saves a snapshot
+             of its networks while scoring goes on.
+    -- waitSave: block until the background save is written, returns
+                 whether it succeeded
+    -- loadTimes: seconds each network took to build (None if not built yet)
+    -- close: stop the workers
+    '''
+
+    def __init__(self, factories, num_workers=None, pin_workers=True, partition=None,
+                 lazy=False):
+        self.factories = list(factories)
+        if num_workers is None:
+            num_workers = multiprocessing.cpu_count()
+        self.num_workers = min(num_workers, len(self.factories))
+        self.pin_workers = pin_workers
+        self.partition = partition or (lambda n: roundRobin(len(self.factories), n))
+        self.lazy = lazy
+        self._networks = None
+        self._workers = []
+        self._starting = False
+        self._save_pid = None
+
+    def start(self):
+        if self.num_workers <= 1:
+            self._networks = _loadNetworks(self.factories, self.lazy)
+            return self
+
+        num_cpus = multiprocessing.cpu_count()
+        # results are put back in the order of the factories by index
+        for k, indices in enumerate(self.partition(self.num_workers)):
+            parent_conn, child_conn = multiprocessing.Pipe()
+            cpu = k % num_cpus if self.pin_workers else None
+            process = multiprocessing.Process(
+                target=_worker,
+                args=(child_conn, [self.factories[i] for i in indices], cpu, self.lazy))
+            process.daemon = True
+            process.start()
+            child_conn.close()
+            self._workers.append((process, parent_conn, indices))
+        self._starting = True
+        return self
+
+    def wait(self):
+        if self._starting:
+            self._starting = False
+            for _, conn, _ in self._workers:
+                self._receive(conn)
+        return self
+
+    def _receive(self, conn):
+        status, payload = conn.recv()
+        if status == "error":
+            self.close()
+            raise RuntimeError("HTM worker failed:\n" + payload)
+        return payload
+
+    def _broadcast(self, command, args_per_worker=None):
+        self.wait()
+        for k, (_, conn, _) in enumerate(self._workers):
+            args = args_per_worker[k] if args_per_worker is not None else None
+            conn.send((command, args))
+        return [self._receive(conn) for _, conn, _ in self._workers]
+
+    def run(self):
+        if self._networks is not None:
+            return [runNetworkOnce(network) for network in self._networks]
+
+        results = [None] * len(self.factories)
+        for (_, _, indices), shard in zip(self._workers, self._broadcast("run")):
+            for i, result in zip(indices, shard):
+                results[i] = result
+        return results
+
+    def save(self, paths, background=False):
+        if self._networks is not None:
+            _waitSave(self._save_pid)
+            self._save_pid = _saveNetworks(self._networks, paths, background)
+            return
+        self._broadcast("save", [([paths[i] for i in indices], background)
+                                 for _, _, indices in self._workers])
+
+    def waitSave(self):
+        if self._networks is not None:
+            ok = _waitSave(self._save_pid)
+            self._save_pid = None
+            return ok
+        return all(self._broadcast("wait_save"))
+
+    def loadTimes(self):
+        if self._networks is not None:
+            return [network.load_time for network in self._networks]
+
+        load_times = [None] * len(self.factories)
+        for (_, _, indices), shard in zip(self._workers, self._broadcast("load_times")):
+            for i, load_time in zip(indices, shard):
+                load_times[i] = load_time
+        return load_times
+
+    def close(self):
+        self._starting = False
+        workers, self._workers = self._workers, []
+        for process, conn, _ in workers:
+            try:
+                conn.send(("close", None))
+                # skip the "ready" of a worker that was still loading
+                while conn.recv()[0] == "ready":
+                    pass
+            except (EOFError, IOError, OSError):
+                pass
+            conn.close()
+            process.join()
+        _waitSave(self._save_pid)
+        self._save_pid = None
+        self._networks = None
@@ -0,0 +1,243 @@
+# -*- coding: utf-8 -*-
+'''
+Build the per-variable anomaly networks from one declarative channel spec.
+
+Every channel is a dict with the CSV field name and the encoder range, e.g.
+{"name": "Matte Cu", "minval": 59.5, "maxval": 62.5}, optionally with "key"
+(the name the channel is published under), "title" (the plot title) and any
+ScalarEncoder argument overriding the defaults. All channels share the date
+encoder and the SP/TM parameters, so adding a channel is one more entry in
+the list. "spatialImp": "sparse" in the SP parameters runs the NumPy spatial
+pooler (see sparse_sp_region.py) instead of the C++ one, "temporalImp":
+"array" in the TM parameters the NumPy TemporalMemory, a different algorithm
+from the backtracking TM (see array_tm_region.py). With cached_encoders the
+channels encode through LookupScalarEncoder (a periodic channel keeps
+ScalarEncoder) and SharedDateEncoder (see lookup_encoder.py and
+cached_encoders.py): the date encoding is computed once per record and the
+scalar ones looked up.
+
+-- NetworkCollection: the networks of a channel list, as factories
+-- createTemporalAnomaly: sensor -> SP -> TM -> anomaly likelihood network
+'''
+
+import json
+from functools import partial
+from nupic.engine import Network
+from nupic.encoders import MultiEncoder, ScalarEncoder, DateEncoder
+from binary_record_stream import BinaryRecordStream
+from cached_encoders import SharedDateEncoder
+from lookup_encoder import LookupScalarEncoder
+from network_engine import roundRobin
+from sparse_sp_region import SparseSPRegion
+from array_tm_region import ArrayTMRegion
+
+
+# saved networks may use them too, so they are known before any is loaded
+Network.registerRegion(SparseSPRegion)
+Network.registerRegion(ArrayTMRegion)
+
+
+# Default config fields of the scalar encoder of every channel
+SCALAR_ENCODER_DEFAULTS = {
+  "w": 21,
+  "periodic": False,
+  "n": 50,
+  "radius": 0,
+  "resolution": 0,
+  "verbosity": 0,
+  "clipInput": True,
+  "forced": False,
+}
+
+# Default config fields of the date encoder shared by the channels
+DATE_ENCODER_DEFAULTS = {
+  "season": 0,
+  "dayOfWeek": 0,
+  "weekend": 0,
+  "holiday": 0,
+  "timeOfDay": (21, 6),
+  "customDays": 0,
+  "name": "Time",
+  "forced": False
+}
+
+# keys of a channel spec that are not ScalarEncoder arguments
+_SPEC_ONLY = ("key", "title")
+
+
+def createTemporalAnomaly(recordParams, 
+                          spatialParams, 
+                          temporalParams, 
+                          verbosity, 
+                          use_saved_model,
+                          model_path,
+                          start_record=None):
+
+    inputFilePath = recordParams["inputFilePath"]
+    scalarEncoder1Args = recordParams["scalarEncoder1Args"]
+    dateEncoderArgs = recordParams["dateEncoderArgs"]
+
+    if recordParams.get("cachedEncoders"):
+        if scalarEncoder1Args.get("periodic"):
+            scalarEncoder1 = ScalarEncoder(**scalarEncoder1Args)
+        else:
+            scalarEncoder1 = LookupScalarEncoder(**scalarEncoder1Args)
+        dateEncoder = SharedDateEncoder(**dateEncoderArgs)
+    else:
+        scalarEncoder1 = ScalarEncoder(**scalarEncoder1Args)
+        dateEncoder = DateEncoder(**dateEncoderArgs)
+
+    encoder = MultiEncoder()
+    encoder.addEncoder(scalarEncoder1Args["name"], scalarEncoder1)
+    encoder.addEncoder(dateEncoderArgs["name"], dateEncoder)
+
+    network = Network()
+    
+    if use_saved_model == False:
+        network.addRegion("sensor", "py.RecordSensor",
+                        json.dumps({"verbosity": verbosity}))
+    
+        sensor = network.regions["sensor"].getSelf()
+        sensor.encoder = encoder
+        sensor.dataSource = BinaryRecordStream(inputFilePath, start=start_record or 0)
+    
+        # Create the spatial pooler region
+        spatialParams["inputWidth"] = sensor.encoder.getWidth()
+        spatialRegion = "py.SparseSPRegion" if spatialParams.get("spatialImp") == "sparse" else "py.SPRegion"
+        network.addRegion("spatialPoolerRegion", spatialRegion,
+                          json.dumps(spatialParams))
+    
+        # Link the SP region to the sensor input
+        network.link("sensor", "spatialPoolerRegion", "UniformLink", "")
+        network.link("sensor", "spatialPoolerRegion", "UniformLink", "",
+                     srcOutput="resetOut", destInput="resetIn")
+        network.link("spatialPoolerRegion", "sensor", "UniformLink", "",
+                     srcOutput="spatialTopDownOut", destInput="spatialTopDownIn")
+        network.link("spatialPoolerRegion", "sensor", "UniformLink", "",
+                     srcOutput="temporalTopDownOut", destInput="temporalTopDownIn")
+    
+        # Add the TPRegion on top of the SPRegion
+        temporalRegion = "py.ArrayTMRegion" if temporalParams.get("temporalImp") == "array" else "py.TMRegion"
+        network.addRegion("temporalPoolerRegion", temporalRegion,
+                          json.dumps(temporalParams))
+    
+        network.link("spatialPoolerRegion", "temporalPoolerRegion", "UniformLink", "")
+        network.link("temporalPoolerRegion", "spatialPoolerRegion", "UniformLink", "",
+                     srcOutput="topDownOut", destInput="topDownIn")
+        
+        # Add the AnomalyLikelihoodRegion on top of the TMRegion
+        network.addRegion("anomalyLikelihoodRegion", "py.AnomalyLikelihoodRegion", json.dumps({}))
+        network.link("temporalPoolerRegion", "anomalyLikelihoodRegion", "UniformLink",
+                     "", srcOutput="anomalyScore", destInput="rawAnomalyScore")
+        network.link("sensor", "anomalyLikelihoodRegion", "UniformLink", "",
+                     srcOutput="sourceOut", destInput="metricValue")    
+    
+    
+        spatialPoolerRegion = network.regions["spatialPoolerRegion"]
+    
+        # Make sure learning is enabled
+        spatialPoolerRegion.setParameter("learningMode", True)
+        # We want temporal anomalies so disable anomalyMode in the SP. This mode is
+        # used for computing anomalies in a non-temporal model.
+        spatialPoolerRegion.setParameter("anomalyMode", False)
+    
+        temporalPoolerRegion = network.regions["temporalPoolerRegion"]
+    
+        # Enable topDownMode to get the predicted columns output
+        temporalPoolerRegion.setParameter("topDownMode", True)
+        # Make sure learning is enabled (this is the default)
+        temporalPoolerRegion.setParameter("learningMode", True)
+        # Enable inference mode so we get predictions
+        temporalPoolerRegion.setParameter("inferenceMode", True)
+        # Enable anomalyMode to compute the anomaly score.
+        temporalPoolerRegion.setParameter("anomalyMode", True)
+    
+    else:
+        network = Network(model_path)
+        if start_record is not None:
+            # resuming from a checkpoint, continue with the record after it
+            sensor = network.regions["sensor"].getSelf()
+            sensor.dataSource = BinaryRecordStream(inputFilePath, start=start_record)
+
+    return network
+
+
+class NetworkCollection(object):
+    '''
+    -- channels: list of channel specs, in the order of the networks
+    -- inputFilePath: NuPIC CSV file every network reads its channel from
+    -- spatialParams, temporalParams: shared SP/TM region parameters
+    -- dateEncoderArgs: overrides of DATE_ENCODER_DEFAULTS
+    -- model_paths: one saved network per channel to restore, or None to
+                    build new networks
+    -- start_record: index of the first record the sensors read, e.g. the
+                     record of the checkpoint the networks are restored from
+    -- verbosity: verbosity of the sensors
+    -- cached_encoders: encode with LookupScalarEncoder and SharedDateEncoder,
+                        new networks only, saved ones keep their encoders
+
+    -- names, keys, titles: per channel
+    -- recordParams: sensor and encoder parameters of one channel
+    -- factories: one callable per channel building its network
+    -- partition: indices of the channels run by each of num_workers workers
+    -- modelPaths: the paths the networks are saved to in a directory
+    '''
+
+    def __init__(self, channels, inputFilePath, spatialParams, temporalParams,
+                 dateEncoderArgs=None, model_paths=None, start_record=None, verbosity=0,
+                 cached_encoders=False):
+        self.channels = [dict(channel) for channel in channels]
+        self.inputFilePath = inputFilePath
+        self.spatialParams = spatialParams
+        self.temporalParams = temporalParams
+        self.dateEncoderArgs = dict(DATE_ENCODER_DEFAULTS, **(dateEncoderArgs or {}))
+        self.model_paths = model_paths
+        self.start_record = start_record
+        self.verbosity = verbosity
+        self.cached_encoders = cached_encoders
+
+    def __len__(self):
+        return len(self.channels)
+
+    @property
+    def names(self):
+        return [channel["name"] for channel in self.channels]
+
+    @property
+    def keys(self):
+        return [channel.get("key", channel["name"]) for channel in self.channels]
+
+    @property
+    def titles(self):
+        return [channel.get("title", channel["name"]) for channel in self.channels]
+
+    def recordParams(self, k):
+        scalarEncoderArgs = dict(SCALAR_ENCODER_DEFAULTS)
+        scalarEncoderArgs.update((key, value) for key, value in self.channels[k].items()
+                                 if key not in _SPEC_ONLY)
+        return {
+          "inputFilePath": self.inputFilePath,
+          "scalarEncoder1Args": scalarEncoderArgs,
+          "dateEncoderArgs": dict(self.dateEncoderArgs),
+          "cachedEncoders": self.cached_encoders,
+        }
+
+    def factories(self):
+        factories = []
+        for k in range(len(self.channels)):
+            model_path = self.model_paths[k] if self.model_paths else None
+            factories.append(partial(createTemporalAnomaly,
+                                     self.recordParams(k),
+                                     spatialParams=dict(self.spatialParams),
+                                     temporalParams=dict(self.temporalParams),
+                                     verbosity=self.verbosity,
+                                     use_saved_model=model_path is not None,
+                                     model_path=model_path,
+                                     start_record=self.start_record))
+        return factories
+
+    def partition(self, num_workers):
+        return roundRobin(len(self.channels), num_workers)
+
+    def modelPaths(self, directory):
+        return ['%s/network%d.nta' % (directory, k + 1) for k in range(len(self.channels))]
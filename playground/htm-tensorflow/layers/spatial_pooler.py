@@ -6,6 +6,10 @@ from .layer import Layer
 class SpatialPooler(Layer):
     """
     Represents the spatial pooling computation layer
+
+    The permanences are stored one row per mini-column (output_dim x input
+    size), so training only gathers and updates the rows of the columns
+    active in the batch. The output is a SparseTensor of the active columns.
     """
     def __init__(self, output_dim, sparsity=0.02, lr=1e-2, pool_density=0.9,
                  duty_cycle=1000, boost_strength=100, **kwargs):
@@ -26,17 +30,17 @@ class SpatialPooler(Layer):
         super().__init__(**kwargs)
 
     def build(self, input_shape):
-        # Permanence of connections between neurons
-        self.p = tf.Variable(tf.random_uniform((input_shape[1], self.output_dim), 0, 1), name='Permanence')
+        # Permanence of connections between neurons, one row per mini-column
+        self.p = tf.Variable(tf.random_uniform((self.output_dim, input_shape[1]), 0, 1), name='Permanence')
 
         # Potential pool matrix
         # Masks out the connections randomly
-        rand_mask = np.random.binomial(1, self.pool_density, input_shape[1] * self.output_dim)
-        pool_mask = tf.constant(np.reshape(rand_mask, [input_shape[1], self.output_dim]), dtype=tf.float32)
+        rand_mask = np.random.binomial(1, self.pool_density, self.output_dim * input_shape[1])
+        self.pool_mask = tf.constant(np.reshape(rand_mask, [self.output_dim, input_shape[1]]), dtype=tf.float32)
 
         # Connection matrix, dependent on the permenance values
         # If permenance > 0.5, we are connected.
-        self.connection = tf.round(self.p) * pool_mask
+        self.connection = tf.round(self.p) * self.pool_mask
 
         # Time-averaged activation level for each mini-column
         self.avg_activation = tf.Variable(tf.zeros([1, self.output_dim]))
@@ -45,14 +49,15 @@ class SpatialPooler(Layer):
 
     def call(self, x):
         # Boosting calculations
-        # The recent activity in the mini-column's (global) neighborhood
-        neighbor_mask = tf.constant(-np.identity(self.output_dim) + 1, dtype=tf.float32)
-        neighbor_activity = tf.matmul(self.avg_activation, neighbor_mask) / (self.output_dim - 1)
+        # The recent activity in the mini-column's (global) neighborhood:
+        # the mean of all the other mini-columns, (sum - self) / (n - 1)
+        total_activation = tf.reduce_sum(self.avg_activation, axis=1, keep_dims=True)
+        neighbor_activity = (total_activation - self.avg_activation) / (self.output_dim - 1)
         boost_factor = tf.exp(-self.boost_strength * (self.avg_activation - neighbor_activity))
 
         # TODO: Only global inhibition is implemented.
         # Compute the overlap score between input
-        overlap = tf.matmul(x, self.connection) * boost_factor
+        overlap = tf.matmul(x, self.connection, transpose_b=True) * boost_factor
 
         # Compute active mini-columns.
         # The top k activations of given sparsity activates
@@ -66,10 +71,9 @@ class SpatialPooler(Layer):
         act_vals = tf.ones((batch_size * self.top_k,))
         output_shape = tf.to_int64(tf.shape(overlap))
 
+        # The activation stays sparse, its indices in row-major order
         activation = tf.SparseTensor(act_indicies, act_vals, output_shape)
-        # TODO: Keeping it as a sparse tensor is more efficient.
-        activation = tf.sparse_tensor_to_dense(activation, validate_indices=False)
-        return activation
+        return tf.sparse_reorder(activation)
 
     def train(self, x, y):
         """
@@ -81,27 +85,37 @@ class SpatialPooler(Layer):
         We only want to modify permances of connections in active mini-columns.
         Ignoring all non-connections.
         Connections are clipped between 0 and 1.
+
+        y is the SparseTensor of the active mini-columns returned by call.
+        Only the permanence rows of the mini-columns active in the batch are
+        read and written.
         """
         # Shift input X from 0, 1 to -1, 1.
         x_shifted = 2 * x - 1
+        batch_size = tf.to_float(tf.shape(x)[0])
 
-        # TODO: We could take advantage of sparsity for computation efficiency?
+        # The mini-columns active in the batch, and the activation of each
+        # sample restricted to them (batch x active mini-columns)
+        columns, column_ids = tf.unique(tf.to_int32(y.indices[:, 1]))
+        samples = tf.to_int32(y.indices[:, 0])
+        active = tf.scatter_nd(tf.stack([samples, column_ids], axis=1), y.values,
+                               tf.stack([tf.shape(x)[0], tf.size(columns)]))
 
         # Compute delta matrix, which contains -1 for all connections to punish
-        # and 1 for all connections to reinforce. Use broadcasting behavior.
-        batch_size = tf.to_float(tf.shape(x)[0])
-        # active_cons = y * self.connection
-        # delta = tf.transpose(x_shifted * tf.transpose(active_cons))
-        delta = tf.einsum('ij,ik,jk->jk', x_shifted, y, self.connection) / batch_size
+        # and 1 for all connections to reinforce, for the active mini-columns.
+        p = tf.gather(self.p, columns)
+        connection = tf.round(p) * tf.gather(self.pool_mask, columns)
+        delta = tf.matmul(active, x_shifted, transpose_a=True) * connection / batch_size
 
         # Apply learning rate multiplier
-        new_p = tf.clip_by_value(self.p + self.lr * delta, 0, 1)
+        new_p = tf.clip_by_value(p + self.lr * delta, 0, 1)
 
         # Create train op
-        train_op = tf.assign(self.p, new_p)
+        train_op = tf.scatter_update(self.p, columns, new_p)
 
         # Update the average activation levels
-        avg_activation = tf.reduce_mean(y, axis=0, keep_dims=True)
+        activity = tf.unsorted_segment_sum(y.values, tf.to_int32(y.indices[:, 1]), self.output_dim)
+        avg_activation = tf.reshape(activity, [1, self.output_dim]) / batch_size
         new_act_avg = ((self.duty_cycle - 1) * self.avg_activation + avg_activation) / self.duty_cycle
         update_act_op = tf.assign(self.avg_activation, new_act_avg)
 
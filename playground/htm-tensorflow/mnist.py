@@ -29,7 +29,8 @@ class HTMModel:
         pooler = SpatialPooler(htm_units, lr=1e-2)
         # Model input
         self.x = tf.placeholder(tf.float32, [None, input_units])
-        self.y = pooler(self.x)
+        # The pooler output is sparse, the classifier takes it dense
+        self.y = tf.sparse_tensor_to_dense(pooler(self.x), validate_indices=False)
         self.train_ops = pooler.train_ops
 
         # Build classifier
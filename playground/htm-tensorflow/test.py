@@ -11,17 +11,17 @@ class SPTest(unittest.TestCase):
         """
         layer = SpatialPooler(4, pool_density=1, boost_strength=0)
         x = tf.placeholder(tf.float32, [None, 4], name='Input')
-        y = layer(x)
+        y = tf.sparse_tensor_to_dense(layer(x))
 
         with tf.Session() as sess:
             sess.run(tf.global_variables_initializer())
 
-            # Override permenance with a custom value
+            # Override permenance with a custom value, one row per column
             sess.run(tf.assign(layer.p, [
+                [1, 0, 1, 0],
+                [0, 1, 1, 0],
                 [1, 0, 1, 1],
-                [0, 1, 0, 0],
-                [1, 1, 1, 0],
-                [0, 0, 1, 1]
+                [1, 0, 0, 1]
             ]))
 
             # Compute
@@ -35,28 +35,52 @@ class SPTest(unittest.TestCase):
         layer = SpatialPooler(4, lr=0.1, pool_density=1, boost_strength=0)
         x = tf.placeholder(tf.float32, [None, 4], name='Input')
         layer.build([1, 4])
-        train = layer.train(x, tf.constant([[0., 1, 0, 1]]))
+        train = layer.train(x, tf.SparseTensor([[0, 1], [0, 3]], [1., 1.], [1, 4]))
 
         with tf.Session() as sess:
             sess.run(tf.global_variables_initializer())
 
-            # Override permenance with a custom value
+            # Override permenance with a custom value, one row per column
             sess.run(tf.assign(layer.p, [
-                [0.6, 0, 0.6, 0.6],
-                [0, 0.6, 0, 0],
-                [0.6, 0.6, 0.6, 0],
-                [0, 0, 0.6, 0.6]
+                [0.6, 0,   0.6, 0  ],
+                [0,   0.6, 0.6, 0  ],
+                [0.6, 0,   0.6, 0.6],
+                [0.6, 0,   0,   0.6]
             ]))
 
             # Compute
             result = sess.run(train, { x: [[1, 1, 0, 1]] })
             # Check the new permenance
             test.assert_allclose(result[0], [
-                [0.6, 0,   0.6, 0.7],
-                [0,   0.7, 0,   0  ],
-                [0.6, 0.5, 0.6, 0  ],
-                [0,   0,   0.6, 0.7]
+                [0.6, 0,   0.6, 0  ],
+                [0,   0.7, 0.5, 0  ],
+                [0.6, 0,   0.6, 0.6],
+                [0.7, 0,   0,   0.7]
             ])
 
+    def test_train_touches_active_columns(self):
+        """
+        Test that only the permanences of active columns change
+        """
+        layer = SpatialPooler(4, lr=0.1, pool_density=1, boost_strength=0)
+        x = tf.placeholder(tf.float32, [None, 4], name='Input')
+        layer.build([2, 4])
+        # Two samples, column 2 active in both and column 0 in one
+        train = layer.train(x, tf.SparseTensor([[0, 0], [0, 2], [1, 2]], [1., 1., 1.], [2, 4]))
+
+        with tf.Session() as sess:
+            sess.run(tf.global_variables_initializer())
+            sess.run(tf.assign(layer.p, [[0.6] * 4] * 4))
+
+            result = sess.run(train, { x: [[1, 0, 1, 0], [1, 1, 0, 0]] })
+            test.assert_allclose(result[0], [
+                [0.65, 0.55, 0.65, 0.55],
+                [0.6,  0.6,  0.6,  0.6 ],
+                [0.7,  0.6,  0.6,  0.5 ],
+                [0.6,  0.6,  0.6,  0.6 ]
+            ])
+            # Mean activation of the batch, averaged over the duty cycle
+            test.assert_allclose(result[1], [[0.5 / 1000, 0, 1. / 1000, 0]])
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+'''
+Columnar loader for CSV files in the NuPIC three-header-row format
+(field names, field types, special flags).
+
+The file is parsed once into typed NumPy columns: datetime64 timestamps,
+float64 and int64 channels, bool flags and unicode strings. The columns are
+cached in a .npz file next to the CSV, keyed by the modification time and
+size of the CSV, so later runs and every consumer of the same file (sensor,
+plots, dates) load the binary columns instead of parsing the text again.
+Every row must have as many fields as the header. Missing numbers (empty or
+"None" cells, which FileRecordStream reads as None) are NaN in the columns,
+an int column with missing numbers being float64; BinaryRecordStream gives
+them back as None.
+
+-- RecordTable: the typed columns of one file
+-- loadRecords: parse a CSV file, or load its cached columns
+'''
+
+import os
+import csv
+from datetime import datetime
+import numpy as np
+
+
+_DTYPES = {
+    "float": np.float64,
+    "int": np.int64,
+    "bool": np.bool_,
+    "datetime": "datetime64[s]",
+}
+# cells read as missing numbers
+_MISSING = ("", "None")
+# bumped when the parsing changes, so older caches are parsed again
+_CACHE_VERSION = 1
+
+
+class RecordTable(object):
+    '''
+    -- names, types, flags: the three NuPIC header rows
+    -- columns: dict of field name -> NumPy column
+
+    -- table[name]: column of a field
+    -- datetimes: a datetime64 column as a list of datetime objects
+    '''
+
+    def __init__(self, names, types, flags, columns):
+        self.names = list(names)
+        self.types = list(types)
+        self.flags = list(flags)
+        self.columns = columns
+
+    def __len__(self):
+        if not self.names:
+            return 0
+        return len(self.columns[self.names[0]])
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def __contains__(self, name):
+        return name in self.columns
+
+    def datetimes(self, name, total=None):
+        return self.columns[name][:total].astype(object).tolist()
+
+
+def _parseColumn(values, field_type, datetime_format):
+    if field_type == "datetime":
+        try:
+            return np.array(values, dtype="datetime64[s]")
+        except ValueError:
+            # not ISO 8601, go through strptime once per value
+            return np.array([datetime.strptime(value, datetime_format) for value in values],
+                            dtype="datetime64[s]")
+    if field_type in ("float", "int"):
+        missing = [value.strip() in _MISSING for value in values]
+        if field_type == "int" and not any(missing):
+            return np.array(values).astype(np.int64)
+        return np.array(["nan" if isMissing else value
+                         for value, isMissing in zip(values, missing)]).astype(np.float64)
+    if field_type == "bool":
+        return np.array([value.strip().lower() in ("1", "true") for value in values])
+    if field_type in _DTYPES:
+        return np.array(values).astype(_DTYPES[field_type])
+    return np.array(values, dtype="U")
+
+
+def _parseFile(path, datetime_format):
+    with open(path) as fin:
+        reader = csv.reader(fin)
+        names = next(reader)
+        # short header rows (e.g. "T," for the flags) are padded with blanks
+        types = (next(reader) + [''] * len(names))[:len(names)]
+        flags = (next(reader) + [''] * len(names))[:len(names)]
+        rows = []
+        for row in reader:
+            if not row:
+                continue
+            if len(row) != len(names):
+                raise ValueError("%s, line %d: %d fields, the header has %d"
+                                 % (path, reader.line_num, len(row), len(names)))
+            rows.append(row)
+    if rows:
+        values = list(zip(*rows))
+    else:
+        values = [() for _ in names]
+    columns = {}
+    for name, field_type, column in zip(names, types, values):
+        columns[name] = _parseColumn(list(column), field_type.strip(), datetime_format)
+    return RecordTable(names, types, flags, columns)
+
+
+def _cachePath(path):
+    return path + ".npz"
+
+
+def _cacheKey(path):
+    stat = os.stat(path)
+    return np.array([_CACHE_VERSION, stat.st_mtime, stat.st_size], dtype=np.float64)
+
+
+def _loadCache(path):
+    cache_path = _cachePath(path)
+    if not os.path.exists(cache_path):
+        return None
+    try:
+        cache = np.load(cache_path)
+    except (IOError, OSError, ValueError):
+        return None
+    try:
+        if not np.array_equal(cache["_key"], _cacheKey(path)):
+            return None
+        header = cache["_header"].tolist()
+        names, types, flags = header[0], header[1], header[2]
+        columns = dict((name, cache["column%d" % k]) for k, name in enumerate(names))
+        return RecordTable(names, types, flags, columns)
+    except (IOError, OSError, KeyError, ValueError):
+        return None
+    finally:
+        cache.close()
+
+
+def _saveCache(path, table):
+    arrays = dict(("column%d" % k, table[name]) for k, name in enumerate(table.names))
+    arrays["_key"] = _cacheKey(path)
+    arrays["_header"] = np.array([table.names, table.types, table.flags], dtype="U")
+    try:
+        # write to a temporary file first so a killed run never leaves a
+        # half-written cache behind
+        temp_path = _cachePath(path) + ".tmp.npz"
+        np.savez(temp_path, **arrays)
+        os.rename(temp_path, _cachePath(path))
+    except (IOError, OSError):
+        # read-only data directory, just parse again next time
+        pass
+
+
+def loadRecords(path, cache=True, datetime_format='%Y-%m-%d %H:%M:%S'):
+    '''
+    Return the RecordTable of a NuPIC CSV file.
+
+    -- cache: use and refresh the .npz cache next to the file
+    -- datetime_format: used for timestamps that are not ISO 8601
+    '''
+    if cache:
+        table = _loadCache(path)
+        if table is not None:
+            return table
+    table = _parseFile(path, datetime_format)
+    if cache:
+        _saveCache(path, table)
+    return table
@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+'''
+Vectorized status classification of anomaly likelihoods.
+
+A classifier is an ordered list of (status, rule) pairs plus a default status.
+Each rule looks at a (records x channels) array of anomaly likelihoods and the
+mean likelihood per record, and returns one boolean per record. The first rule
+that matches gives the status of the record, exactly like an if/elif chain,
+but the whole history is labelled with NumPy in one pass. Re-labelling a
+replay after changing a threshold therefore never needs the HTM again.
+
+-- AnomalyClassifier: ordered rules -> status per record
+-- meanAbove, meanBetween, anyAbove, countAbove, anyOf: rule builders
+-- chemicalStatusClassifier: GOOD/WARNING/BAD rules of the chemical networks
+-- motionStatusClassifier: running condition rules of the motion demo
+'''
+
+import numpy as np
+
+
+def meanAbove(threshold, inclusive=False):
+    '''
+    Mean likelihood of the record above (or at) threshold.
+    '''
+    if inclusive:
+        return lambda likelihoods, average: average >= threshold
+    return lambda likelihoods, average: average > threshold
+
+
+def meanBetween(low, high):
+    '''
+    Mean likelihood of the record strictly between low and high.
+    '''
+    return lambda likelihoods, average: (average > low) & (average < high)
+
+
+def countAbove(threshold, count, inclusive=False, exact=False):
+    '''
+    At least `count` channels (exactly `count` if exact) above threshold,
+    or at it if inclusive.
+    '''
+    def rule(likelihoods, average):
+        if inclusive:
+            hits = (likelihoods >= threshold).sum(axis=1)
+        else:
+            hits = (likelihoods > threshold).sum(axis=1)
+        if exact:
+            return hits == count
+        return hits >= count
+    return rule
+
+
+def anyAbove(threshold, inclusive=False):
+    '''
+    Any channel of the record above (or at) threshold.
+    '''
+    return countAbove(threshold, 1, inclusive)
+
+
+def anyOf(*rules):
+    '''
+    Any of the given rules matches.
+    '''
+    def rule(likelihoods, average):
+        matched = np.zeros(len(average), dtype=bool)
+        for r in rules:
+            matched |= r(likelihoods, average)
+        return matched
+    return rule
+
+
+class AnomalyClassifier(object):
+    '''
+    -- rules: list of (status, rule), checked in order
+    -- default: status of the records no rule matches
+
+    -- classify: statuses and mean likelihoods of a (records x channels) array
+    -- classifyOne: status and mean likelihood of a single record
+    '''
+
+    def __init__(self, rules, default):
+        self.rules = list(rules)
+        self.default = default
+
+    def classify(self, likelihoods):
+        likelihoods = np.atleast_2d(np.asarray(likelihoods, dtype=np.float64))
+        # sum the channels left to right like sum() does, so that records
+        # sitting exactly on a mean threshold get the same status as before
+        total = np.zeros(len(likelihoods))
+        for column in likelihoods.T:
+            total += column
+        average = total / likelihoods.shape[1]
+        conditions = [rule(likelihoods, average) for _, rule in self.rules]
+        statuses = np.select(conditions,
+                             [status for status, _ in self.rules],
+                             default=self.default)
+        return statuses, average
+
+    def classifyOne(self, likelihoods):
+        statuses, average = self.classify([likelihoods])
+        return statuses[0].item(), average[0].item()
+
+
+def chemicalStatusClassifier(bad_mean=0.9, bad_channel=0.999,
+                             warning_mean=0.8, warning_channel=0.9):
+    '''
+    'D' (bad), 'W' (warning) or 'G' (good) for the chemical networks: a record
+    is bad if the mean likelihood or any single channel is too high, and a
+    warning on the lower thresholds.
+    '''
+    return AnomalyClassifier(
+        [('D', anyOf(meanAbove(bad_mean), anyAbove(bad_channel))),
+         ('W', anyOf(meanAbove(warning_mean), anyAbove(warning_channel)))],
+        default='G')
+
+
+def motionStatusClassifier(channel=0.99, low_mean=0.96, high_mean=0.98):
+    '''
+    Running condition 1 (normal), 2 (abnormal) or 3 (dangerous) of the
+    motion demo: two sensors at `channel` or a mean between low_mean and
+    high_mean is abnormal, all four sensors or a mean from high_mean on is
+    dangerous.
+    '''
+    return AnomalyClassifier(
+        [(2, countAbove(channel, 2, inclusive=True, exact=True)),
+         (3, countAbove(channel, 4, inclusive=True, exact=True)),
+         (2, meanBetween(low_mean, high_mean)),
+         (3, meanAbove(high_mean, inclusive=True))],
+        default=1)
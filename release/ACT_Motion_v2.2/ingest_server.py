@@ -0,0 +1,362 @@
+# -*- coding: utf-8 -*-
+'''
+Ingest server for live sensor samples.
+
+PLC / edge collectors connect over TCP or a Unix socket and push SAMPLE
+frames (see result_protocol.py): one timestamped reading of one named
+channel each, the channel being the name of a model of the group. The
+samples go straight to a queue per channel, without a CSV written and read
+back in between, and the scoring loop takes them in micro-batches: as soon
+as a sample is waiting, it waits at most max_delay for more, then runs
+every channel with samples on up to batch_size of them (one round trip per
+worker, see ModelGroup.runBatch).
+
+The queues are bounded. A collector whose next sample is for a full channel
+is not read until the models catch up, so its socket fills and TCP slows it
+down; nothing is dropped and the other collectors go on.
+
+Run this file to replay the recorded sensors through the server into the
+four models of the demo and print the latency of the samples.
+
+-- IngestServer: receive, queue, batch and score the samples
+-- SampleSender: connection of a collector to the ingest server
+'''
+
+import os
+import time
+import errno
+import select
+import socket
+import struct
+import datetime
+import threading
+import collections
+from result_protocol import FrameReader, SAMPLE, encodeSample, decodeSample
+from result_server import _wakePair
+
+
+_RETRY = (errno.EAGAIN, errno.EWOULDBLOCK, errno.EINTR)
+
+
+def _socket(address):
+    # (host, port) is TCP, anything else the path of a Unix socket
+    if isinstance(address, tuple):
+        return socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    return socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+
+
+class _Collector(object):
+
+    def __init__(self, sock, address):
+        self.sock = sock
+        self.address = address
+        self.reader = FrameReader()
+        # samples received but not queued yet, their channel is full
+        self.backlog = collections.deque()
+
+
+class IngestServer(object):
+    '''
+    -- group: the ModelGroup scoring the samples, a channel is a model name
+              and its values come in the order of group.fields[channel]
+    -- address: (host, port) to listen on, or the path of a Unix socket
+    -- queue_size: samples queued per channel before the collectors sending
+                   to it are held back
+    -- batch_size: most samples of one channel scored in one go
+    -- max_delay: seconds a waiting sample gives the batch to fill up
+    -- on_result: called as on_result(channel, time, values, likelihood) for
+                  every scored sample, time in seconds since the epoch and
+                  values a dict of field -> value
+
+    -- start: listen and receive in a background thread
+    -- serve: score the samples in this thread until close() is called
+    -- received: number of samples queued so far
+    -- rejected: number of samples of an unknown channel or malformed
+    -- scored: number of samples scored so far
+    -- close: disconnect the collectors and stop, samples still queued are
+              not scored
+    '''
+
+    def __init__(self, group, address, queue_size=1000, batch_size=32,
+                 max_delay=0.005, on_result=None):
+        self.group = group
+        self.address = address
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.max_delay = max_delay
+        self.on_result = on_result
+        self.received = 0
+        self.rejected = 0
+        self.scored = 0
+        self._queues = dict((name, collections.deque()) for name in group.names)
+        self._collectors = {}
+        self._lock = threading.Lock()
+        self._ready = threading.Condition(self._lock)
+        self._listener = None
+        self._thread = None
+        self._running = False
+        self._wakeReader, self._wakeWriter = _wakePair()
+        self._wakeReader.setblocking(False)
+        self._wakeWriter.setblocking(False)
+
+    def start(self):
+        self._listener = _socket(self.address)
+        if isinstance(self.address, tuple):
+            self._listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        elif os.path.exists(self.address):
+            # left over by a server that did not close
+            os.unlink(self.address)
+        self._listener.bind(self.address)
+        self._listener.listen(16)
+        self._listener.setblocking(False)
+        # port 0 picks a free port
+        self.address = self._listener.getsockname()
+        self._running = True
+        self._thread = threading.Thread(target=self._receive, name="IngestServer")
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def _wake(self):
+        try:
+            self._wakeWriter.send(b'x')
+        except socket.error:
+            # the pipe is full, the loop is awake anyway
+            pass
+
+    def _receive(self):
+        while self._running:
+            with self._lock:
+                for collector in self._collectors.values():
+                    self._queue(collector)
+                # a collector with a backlog is not read: back-pressure
+                collectors = [collector.sock for collector in self._collectors.values()
+                              if not collector.backlog]
+            readers = [self._listener, self._wakeReader] + collectors
+            try:
+                readable, _, _ = select.select(readers, [], [], 1.0)
+            except (select.error, socket.error, ValueError):
+                # a socket was closed under us, look again
+                continue
+
+            for sock in readable:
+                if sock is self._listener:
+                    self._accept()
+                elif sock is self._wakeReader:
+                    self._drainWake()
+                else:
+                    self._read(sock)
+
+    def _accept(self):
+        try:
+            sock, address = self._listener.accept()
+        except socket.error:
+            return
+        sock.setblocking(False)
+        with self._lock:
+            self._collectors[sock] = _Collector(sock, address)
+
+    def _drainWake(self):
+        try:
+            while self._wakeReader.recv(4096):
+                pass
+        except socket.error:
+            pass
+
+    def _sample(self, payload):
+        try:
+            channel, timestamp, values = decodeSample(payload)
+        except (ValueError, struct.error):
+            return None
+        fields = self.group.fields.get(channel)
+        if fields is None or len(fields) != len(values):
+            return None
+        return (channel, timestamp, datetime.datetime.fromtimestamp(timestamp),
+                dict(zip(fields, values)))
+
+    def _read(self, sock):
+        collector = self._collectors.get(sock)
+        if collector is None:
+            return
+        try:
+            data = sock.recv(65536)
+        except socket.error as error:
+            if error.args[0] not in _RETRY:
+                self._disconnect(sock)
+            return
+        if not data:
+            self._disconnect(sock)
+            return
+        try:
+            frames = collector.reader.frames(data)
+        except ValueError:
+            # not our protocol, or out of sync
+            self._disconnect(sock)
+            return
+
+        samples = []
+        rejected = 0
+        for kind, payload in frames:
+            if kind != SAMPLE:
+                continue
+            sample = self._sample(payload)
+            if sample is None:
+                rejected += 1
+            else:
+                samples.append(sample)
+        with self._lock:
+            self.rejected += rejected
+            collector.backlog.extend(samples)
+            self._queue(collector)
+
+    def _queue(self, collector):
+        # with the lock held. Samples stay in order, so a sample for a full
+        # channel holds back the ones after it.
+        queued = 0
+        while collector.backlog:
+            queue = self._queues[collector.backlog[0][0]]
+            if len(queue) >= self.queue_size:
+                break
+            queue.append(collector.backlog.popleft())
+            queued += 1
+        if queued:
+            self.received += queued
+            self._ready.notify()
+
+    def _disconnect(self, sock):
+        with self._lock:
+            self._collectors.pop(sock, None)
+        try:
+            sock.close()
+        except socket.error:
+            pass
+
+    def _fullest(self):
+        return max(len(queue) for queue in self._queues.values())
+
+    def _takeBatch(self):
+        with self._ready:
+            while self._running and not self._fullest():
+                self._ready.wait(0.5)
+            deadline = time.time() + self.max_delay
+            while self._running and self._fullest() < self.batch_size:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    break
+                self._ready.wait(remaining)
+            if not self._running:
+                return None
+            batch = {}
+            for channel, queue in self._queues.items():
+                count = min(len(queue), self.batch_size)
+                if count:
+                    batch[channel] = [queue.popleft() for _ in range(count)]
+        # there is room in the queues again
+        self._wake()
+        return batch
+
+    def serve(self):
+        while True:
+            batch = self._takeBatch()
+            if batch is None:
+                return
+            likelihoods = self.group.runBatch(dict(
+                (channel, [(sample[2], sample[3]) for sample in samples])
+                for channel, samples in batch.items()))
+            for channel, samples in batch.items():
+                self.scored += len(samples)
+                if self.on_result is not None:
+                    for sample, likelihood in zip(samples, likelihoods[channel]):
+                        self.on_result(channel, sample[1], sample[3], likelihood)
+
+    def close(self):
+        with self._ready:
+            self._running = False
+            self._ready.notify_all()
+        self._wake()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        with self._lock:
+            socks = list(self._collectors.keys())
+        for sock in socks:
+            self._disconnect(sock)
+        if self._listener is not None:
+            self._listener.close()
+            self._listener = None
+            if not isinstance(self.address, tuple):
+                os.unlink(self.address)
+        self._wakeReader.close()
+        self._wakeWriter.close()
+
+
+class SampleSender(object):
+    '''
+    -- address: address of the ingest server, (host, port) or the path of
+                its Unix socket
+
+    -- send: send one reading of a channel, values in the order of the
+             fields of its model. timestamp is in seconds since the epoch,
+             now by default. Blocks while the server holds the collector
+             back.
+    -- close: close the connection
+    '''
+
+    def __init__(self, address):
+        self.sock = _socket(address)
+        self.sock.connect(address)
+        if isinstance(address, tuple):
+            # samples are small and should leave at once
+            self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def send(self, channel, values, timestamp=None):
+        if timestamp is None:
+            timestamp = time.time()
+        self.sock.sendall(encodeSample(channel, timestamp, values))
+
+    def close(self):
+        self.sock.close()
+
+
+if __name__ == '__main__':
+    from model_group import ModelGroup
+    from replay_source import ReplaySource
+    from htm_anomaly_detection import MODELS
+
+    RECORDS = 500
+    group = ModelGroup(MODELS, num_workers=len(MODELS))
+    latencies = []
+
+    def collected(channel, timestamp, values, likelihood):
+        latencies.append(time.time() - timestamp)
+
+    server = IngestServer(group, ('127.0.0.1', 0), on_result=collected).start()
+    replay = ReplaySource([('salt_acc', './data/salt_acc_timestep3.csv', ['x', 'y', 'z']),
+                           ('salt_qua', './data/salt_qua_timestep3.csv', ['w', 'x', 'y', 'z']),
+                           ('pepa_acc', './data/pepa_acc_timestep3.csv', ['x', 'y', 'z']),
+                           ('pepa_qua', './data/pepa_qua_timestep3.csv', ['w', 'x', 'y', 'z'])])
+
+    def collect():
+        # one collector pushing every channel, a reading every 2 ms
+        sender = SampleSender(server.address)
+        for i in range(RECORDS):
+            record = replay.record(i)
+            for name in replay.names:
+                sender.send(name, [record[name][field] for field in group.fields[name]])
+            time.sleep(0.002)
+        sender.close()
+        while server.scored < RECORDS * len(replay.names):
+            time.sleep(0.01)
+        server.close()
+
+    collector = threading.Thread(target=collect)
+    collector.start()
+    start = time.time()
+    server.serve()
+    collector.join()
+    group.close()
+
+    latencies.sort()
+    print('%d samples scored in %.2f s' % (server.scored, time.time() - start))
+    print('latency: median %.1f ms, 99%% %.1f ms' % (latencies[len(latencies) // 2] * 1000,
+                                                     latencies[int(len(latencies) * 0.99)] * 1000))
@@ -7,8 +7,8 @@ Created on Fri Jan 17 15:56:02 2020
 """
 
 import socket
-import json
 import sys
+from result_protocol import FrameReader
 IP = '192.168.1.1'
 port = 40005
 s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
@@ -19,10 +19,14 @@ except Exception as e:
     print('server not find or not open')
     sys.exit()
     
+# the server sends the field names first, then one framed record per tick
+reader = FrameReader()
 while True:
-    data = s.recv(1024)
-    data = data.decode()
-    data = json.loads(data)
-    print('recieved:',data[-4:])
+    received = s.recv(1024)
+    if not received:
+        print('server closed the connection')
+        break
+    for data in reader.feed(received):
+        print('recieved:',data[-4:])
     
 s.close()
\ No newline at end of file
@@ -6,99 +6,80 @@ Created on Sun Sep 29 22:02:49 2019
 """
 
 import os
-import pandas
-import socket
-import datetime
-import time
-import json
 from htm_anomaly_detection import HTM
+from anomaly_classifier import motionStatusClassifier
+from checkpoint_manager import CheckpointManager
+from replay_source import ReplaySource
+from replay_clock import ReplayClock, REAL
+from result_server import ResultServer
+from result_protocol import ResultSchema
 
 
-def csv_handler(source, header):
-    data = pandas.read_csv(source, names=header)
-    return data
-    
-def data_simulator(raw, index):
-    data = raw[index % len(raw)]
-    return round(data, 3)
-
 def getAverageAnomaly(raw1, raw2, raw3, raw4):
-    average = (raw1 + raw2 + raw3 + raw4) / 4.0   
-    if raw1 < 0.99 and raw2 < 0.99 and raw3 < 0.99 and raw4 < 0.99 and average < 0.96:
-        return 1, average
-    elif raw1 >= 0.99 and raw2 >= 0.99 and raw3 < 0.99 and raw4 < 0.99:
-        return 2, average
-    elif raw1 >= 0.99 and raw2 < 0.99 and raw3 >= 0.99 and raw4 < 0.99:
-        return 2, average
-    elif raw1 >= 0.99 and raw2 < 0.99 and raw3 < 0.99 and raw4 >= 0.99:
-        return 2, average
-    elif raw1 < 0.99 and raw2 >= 0.99 and raw3 >= 0.99 and raw4 < 0.99:
-        return 2, average
-    elif raw1 < 0.99 and raw2 >= 0.99 and raw3 < 0.99 and raw4 >= 0.99:
-        return 2, average
-    elif raw1 < 0.99 and raw2 < 0.99 and raw3 >= 0.99 and raw4 >= 0.99:
-        return 2, average
-    elif raw1 >= 0.99 and raw2 >= 0.99 and raw3 >= 0.99 and raw4 >= 0.99:
-        return 3, average
-    elif average > 0.96 and average < 0.98:
-        return 2, average
-    elif average >= 0.98:
-        return 3, average
-    else:
-        return 1, average
+    # 1: normal, 2: two sensors >= 0.99 or average in (0.96, 0.98),
+    # 3: all four sensors >= 0.99 or average >= 0.98
+    return classifier.classifyOne([raw1, raw2, raw3, raw4])
 
 '''
 use model or not to create a HTM instance
 '''
 #model = HTM(use_saved_model = False, checkpoint_path = None, likelihood_path = None)
-model = HTM(use_saved_model = True, checkpoint_path = 'model', likelihood_path = 'likelihood.pkl')
-
-# process the raw data to be as the random source
-header_salt_acc = ['salt_acc_x', 'salt_acc_y', 'salt_acc_z', 'time']
-raw_salt_acc = csv_handler('./data/salt_acc_timestep3.csv', header_salt_acc)
+checkpoints = CheckpointManager(os.path.join(os.getcwd(), 'checkpoints'), keep = 3)
+checkpoint, record = checkpoints.latest()
+if checkpoint is not None:
+    # resume with the record after the newest checkpoint
+    model = HTM(use_saved_model = True,
+                checkpoint_path = os.path.join(checkpoint, 'model'),
+                likelihood_path = os.path.join(checkpoint, 'likelihood.pkl'))
+else:
+    model = HTM(use_saved_model = True, checkpoint_path = 'model', likelihood_path = 'likelihood.pkl')
+classifier = motionStatusClassifier()
 
-header_salt_qua = ['salt_qua_w', 'salt_qua_x', 'salt_qua_y', 'salt_qua_z', 'time']
-raw_salt_qua = csv_handler('./data/salt_qua_timestep3.csv', header_salt_qua)
-
-header_pepa_acc = ['pepa_acc_x', 'pepa_acc_y', 'pepa_acc_z', 'time']
-raw_pepa_acc = csv_handler('./data/pepa_acc_timestep3.csv', header_pepa_acc)
+'''
+pace of the replay: REAL for the live demo, SCALED (CLOCK_SPEED times faster)
+or FAST (no waiting) to backtest, stamped with the recorded time
+'''
+CLOCK_MODE = REAL
+CLOCK_SPEED = 100
+clock = ReplayClock(CLOCK_MODE, period = 5, speed = CLOCK_SPEED)
 
-header_pepa_qua = ['pepa_qua_w', 'pepa_qua_x', 'pepa_qua_y', 'pepa_qua_z', 'time']
-raw_pepa_qua = csv_handler('./data/pepa_qua_timestep3.csv', header_pepa_qua)
+# process the raw data to be as the random source, read once
+replay = ReplaySource([('salt_acc', './data/salt_acc_timestep3.csv', ['x', 'y', 'z']),
+                       ('salt_qua', './data/salt_qua_timestep3.csv', ['w', 'x', 'y', 'z']),
+                       ('pepa_acc', './data/pepa_acc_timestep3.csv', ['x', 'y', 'z']),
+                       ('pepa_qua', './data/pepa_qua_timestep3.csv', ['w', 'x', 'y', 'z'])])
 
 '''
-Socket setup
+Socket setup: any number of HMIs can subscribe, at any time, without
+holding up the scoring
 '''
 IP = "192.168.1.1" 
 port = 40005
-s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-s.bind((IP,port))
-s.listen(1)
-print('listen at port :',port)
-conn,addr = s.accept()
-print('connected by',addr)
-
-i = 1400
-while True:
-    salt_acc_x = data_simulator(raw_salt_acc.salt_acc_x.tolist(), i)
-    salt_acc_y = data_simulator(raw_salt_acc.salt_acc_y.tolist(), i)
-    salt_acc_z = data_simulator(raw_salt_acc.salt_acc_z.tolist(), i)
+# one binary record per tick, its layout is sent to every HMI on connect.
+# The readings have 3 decimals and go as scaled int32, the likelihoods as
+# doubles.
+def reading(name):
+    return (name, 'i', 1000)
 
-    salt_qua_w = data_simulator(raw_salt_qua.salt_qua_w.tolist(), i)    
-    salt_qua_x = data_simulator(raw_salt_qua.salt_qua_x.tolist(), i)
-    salt_qua_y = data_simulator(raw_salt_qua.salt_qua_y.tolist(), i)
-    salt_qua_z = data_simulator(raw_salt_qua.salt_qua_z.tolist(), i)
-    
-    pepa_acc_x = data_simulator(raw_pepa_acc.pepa_acc_x.tolist(), i)
-    pepa_acc_y = data_simulator(raw_pepa_acc.pepa_acc_y.tolist(), i)
-    pepa_acc_z = data_simulator(raw_pepa_acc.pepa_acc_z.tolist(), i)
+result_schema = ResultSchema([reading('salt_acc_x'), reading('salt_acc_y'), reading('salt_acc_z'),
+                              reading('salt_qua_w'), reading('salt_qua_x'), reading('salt_qua_y'), reading('salt_qua_z'),
+                              'salt_acc_likelihood', 'salt_qua_likelihood',
+                              'pepa_acc_likelihood', 'pepa_qua_likelihood',
+                              reading('pepa_acc_x'), reading('pepa_acc_y'), reading('pepa_acc_z'),
+                              reading('pepa_qua_w'), reading('pepa_qua_x'), reading('pepa_qua_y'), reading('pepa_qua_z'),
+                              ('RunningCondition', 'B'), 'AverageAnomaly'])
+server = ResultServer(IP, port, queue_size = 100, send_buffer = 16384,
+                      greeting = result_schema.header()).start()
+print('listen at port :',port)
 
-    pepa_qua_w = data_simulator(raw_pepa_qua.pepa_qua_w.tolist(), i)    
-    pepa_qua_x = data_simulator(raw_pepa_qua.pepa_qua_x.tolist(), i)
-    pepa_qua_y = data_simulator(raw_pepa_qua.pepa_qua_y.tolist(), i)
-    pepa_qua_z = data_simulator(raw_pepa_qua.pepa_qua_z.tolist(), i)
+start = record if checkpoint is not None else 1400
+for i, inputs in replay.replay(start):
+    salt_acc_x, salt_acc_y, salt_acc_z = [inputs['salt_acc'][k] for k in 'xyz']
+    salt_qua_w, salt_qua_x, salt_qua_y, salt_qua_z = [inputs['salt_qua'][k] for k in 'wxyz']
+    pepa_acc_x, pepa_acc_y, pepa_acc_z = [inputs['pepa_acc'][k] for k in 'xyz']
+    pepa_qua_w, pepa_qua_x, pepa_qua_y, pepa_qua_z = [inputs['pepa_qua'][k] for k in 'wxyz']
     
-    timestamp = datetime.datetime.now()
+    timestamp = clock.now(replay.timestamp(i))
     
     anomaly_likelihood1, anomaly_likelihood2, \
     anomaly_likelihood3, anomaly_likelihood4 = model.run(salt_acc_x,
@@ -124,34 +105,38 @@ while True:
     
     
 #     saving model after a while
+    # written by forked children of the model workers (or of this process)
+    # while this loop goes on scoring, committed once they are done
     if i % 100 == 0:
-        model.save_model(os.path.join(os.getcwd(), "model"),
-                         os.path.join(os.getcwd(), "likelihood.pkl"))
-        print i, 'iter - checkpoint saved.'
+        checkpoints.save(i + 1,
+                         lambda directory: model.save_model(os.path.join(directory, "model"),
+                                                            os.path.join(directory, "likelihood.pkl"),
+                                                            background = True),
+                         wait = model.waitSave)
+        print i, 'iter - checkpoint started.'
         
-    conn.sendall(json.dumps([salt_acc_x,
-                            salt_acc_y,
-                            salt_acc_z,
-                            salt_qua_w,
-                            salt_qua_x,
-                            salt_qua_y,
-                            salt_qua_z,
-                            anomaly_likelihood1,
-                            anomaly_likelihood2,
-                            anomaly_likelihood3,
-                            anomaly_likelihood4,
-                            pepa_acc_x, 
-                            pepa_acc_y, 
-                            pepa_acc_z, 
-                            pepa_qua_w,
-                            pepa_qua_x,
-                            pepa_qua_y,
-                            pepa_qua_z,
-                            RunningCondition,
-                            AverageAnomaly]).encode())
-    i += 1
+    server.publish(result_schema.encode([salt_acc_x,
+                                         salt_acc_y,
+                                         salt_acc_z,
+                                         salt_qua_w,
+                                         salt_qua_x,
+                                         salt_qua_y,
+                                         salt_qua_z,
+                                         anomaly_likelihood1,
+                                         anomaly_likelihood2,
+                                         anomaly_likelihood3,
+                                         anomaly_likelihood4,
+                                         pepa_acc_x, 
+                                         pepa_acc_y, 
+                                         pepa_acc_z, 
+                                         pepa_qua_w,
+                                         pepa_qua_x,
+                                         pepa_qua_y,
+                                         pepa_qua_z,
+                                         RunningCondition,
+                                         AverageAnomaly]))
         
-    time.sleep(5)
+    clock.tick()
     
-conn.close()
-s.close()
+checkpoints.wait()
+server.close()
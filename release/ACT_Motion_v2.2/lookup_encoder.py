@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+'''
+Scalar encoder with a precomputed bucket table.
+
+A bounded (non-periodic) ScalarEncoder with n=50 and w=21 has only
+n - w + 1 = 30 different outputs. LookupScalarEncoder builds their table
+when it is created: a value is encoded by finding its bucket and copying a
+row, and a whole column of values at once with a few NumPy operations, as
+active bit indices. The bits are those of ScalarEncoder. The networks
+create it directly; OPF model params keep "type": "ScalarEncoder" and the
+code that builds the model switches them with lookupEncoders.
+
+-- LookupScalarEncoder: ScalarEncoder with a precomputed bucket table
+-- lookupEncoders: OPF encoder params with LookupScalarEncoder where it fits
+'''
+
+import math
+import numbers
+import numpy as np
+import nupic.encoders.multi
+from nupic.encoders import ScalarEncoder
+from nupic.data import SENTINEL_VALUE_FOR_MISSING_DATA
+
+
+class LookupScalarEncoder(ScalarEncoder):
+    '''
+    Takes the arguments of ScalarEncoder, periodic must be False.
+
+    -- encodeIntoArray: as ScalarEncoder, a row of the table
+    -- activeBits: indices of the active bits of a value, None for a missing
+                   one
+    -- bucketsOf: first active bit of every value of a column, -1 for the
+                  missing ones (NaN, or None in a list)
+    -- encodeColumn: active bits of every value of a column, one row of w
+                     each, rows of -1 for the missing ones
+    '''
+
+    def __init__(self, *args, **kwargs):
+        ScalarEncoder.__init__(self, *args, **kwargs)
+        if self.periodic:
+            raise ValueError("LookupScalarEncoder is for non-periodic encoders, use ScalarEncoder")
+        buckets = self.n - self.w + 1
+        # row b: bucket b, its first active bit being b
+        self._activeTable = np.arange(buckets)[:, None] + np.arange(self.w)
+        self._denseTable = np.zeros((buckets, self.n), dtype=np.uint8)
+        self._denseTable[np.arange(buckets)[:, None], self._activeTable] = 1
+
+    def _bucket(self, input):
+        if input is not None and not isinstance(input, numbers.Number):
+            raise TypeError("Expected a scalar input but got input of type %s" % type(input))
+        if type(input) is float and math.isnan(input):
+            input = SENTINEL_VALUE_FOR_MISSING_DATA
+        return self._getFirstOnBit(input)[0]
+
+    def encodeIntoArray(self, input, output, learn=True):
+        bucket = self._bucket(input)
+        if bucket is None:
+            output[:self.n] = 0
+        else:
+            output[:self.n] = self._denseTable[bucket]
+
+    def activeBits(self, input):
+        bucket = self._bucket(input)
+        return None if bucket is None else self._activeTable[bucket]
+
+    def bucketsOf(self, values):
+        if not isinstance(values, np.ndarray):
+            values = [np.nan if value is None else value for value in values]
+        values = np.asarray(values, dtype=np.float64)
+        missing = np.isnan(values)
+        if not self.clipInput:
+            present = values[~missing]
+            if (present < self.minval).any() or (present > self.maxval).any():
+                raise ValueError("values out of the range [%s, %s] of encoder %s"
+                                 % (self.minval, self.maxval, self.name))
+        # the arithmetic of ScalarEncoder._getFirstOnBit, value by value
+        clipped = np.clip(values[~missing], self.minval, self.maxval)
+        centers = (((clipped - self.minval) + self.resolution / 2) / self.resolution).astype(np.int64)
+        buckets = np.full(values.shape, -1, dtype=np.int64)
+        buckets[~missing] = centers + self.padding - self.halfwidth
+        return buckets
+
+    def encodeColumn(self, values):
+        buckets = self.bucketsOf(values)
+        active = self._activeTable[np.maximum(buckets, 0)]
+        active[buckets < 0] = -1
+        return active
+
+
+# MultiEncoder, which builds the encoders of OPF sensorParams, finds the
+# "type" of an encoder by name in its own module
+nupic.encoders.multi.LookupScalarEncoder = LookupScalarEncoder
+
+
+def lookupEncoders(encoders):
+    '''
+    Copy of the encoders of OPF sensorParams where every non-periodic
+    ScalarEncoder is a LookupScalarEncoder, the others as they are.
+    '''
+    lookup = {}
+    for name, encoder in encoders.items():
+        if encoder is not None and encoder['type'] == 'ScalarEncoder' \
+                and not encoder.get('periodic'):
+            encoder = dict(encoder, type='LookupScalarEncoder')
+        lookup[name] = encoder
+    return lookup
@@ -0,0 +1,297 @@
+# -*- coding: utf-8 -*-
+'''
+A group of OPF anomaly models, one per sensor, built from their
+MODEL_PARAMS.
+
+Every model is described by a name and its params (a model_params_*.py
+module or its MODEL_PARAMS dict); its input fields are read from the
+encoders, so adding a sensor is one more entry in the mapping. The models
+can run in worker processes, each owning a share of them, and every worker
+steps its models while the others do the same. The anomaly likelihoods are
+computed in this process from the raw anomaly scores, one estimator per
+model (see likelihood_registry.py). New models encode their bounded
+scalar fields with LookupScalarEncoder (see lookup_encoder.py), the params
+keep ScalarEncoder.
+
+Models can also be stepped apart from each other, several records at a
+time (runBatch), for inputs that arrive per sensor rather than in ticks of
+the whole group (see ingest_server.py). A batch costs one round trip per
+worker instead of one per record.
+
+Saved in the background, every worker (or this process, without workers)
+forks and writes a snapshot of its models while scoring goes on.
+
+-- ModelGroup: create, load, run and save the models of a group
+-- modelFields: input fields of a model, read from its encoders
+'''
+
+import os
+import copy
+import traceback
+import multiprocessing
+from nupic.frameworks.opf.model_factory import ModelFactory
+from likelihood_registry import LikelihoodRegistry
+from lookup_encoder import lookupEncoders
+
+
+def modelFields(params):
+    '''
+    Names of the scalar input fields of a model, sorted. The timestamp
+    (DateEncoder) is left out, it is given to every model.
+    '''
+    encoders = params['modelParams']['sensorParams']['encoders']
+    return sorted(set(str(encoder['fieldname']) for encoder in encoders.values()
+                      if encoder is not None and encoder['type'] != 'DateEncoder'))
+
+
+def _modelPath(path, name):
+    # same file names as the four hard-coded models: model_SALT_ACC, ...
+    return path + '_' + name.upper()
+
+
+def _createModel(params, path):
+    if path is not None:
+        model = ModelFactory.loadFromCheckpoint(path)
+    else:
+        # the bounded scalar encoders look their bits up (lookup_encoder.py),
+        # the params themselves keep ScalarEncoder
+        params = copy.deepcopy(params)
+        sensorParams = params['modelParams']['sensorParams']
+        sensorParams['encoders'] = lookupEncoders(sensorParams['encoders'])
+        model = ModelFactory.create(params)
+    model.enableInference({'predictedField': modelFields(params)[-1]})
+    return model
+
+
+def _saveModels(models, path, background):
+    '''
+    Save the (name, model) pairs, in a forked child if background. Returns
+    the pid of the child, or None when the models were saved in this
+    process.
+    '''
+    if background and hasattr(os, "fork"):
+        pid = os.fork()
+        if pid == 0:
+            try:
+                for name, model in models:
+                    model.save(_modelPath(path, name))
+            except BaseException:
+                traceback.print_exc()
+                os._exit(1)
+            os._exit(0)
+        return pid
+    for name, model in models:
+        model.save(_modelPath(path, name))
+    return None
+
+
+def _waitSave(pid):
+    if pid is None:
+        return True
+    _, status = os.waitpid(pid, 0)
+    return status == 0
+
+
+def _runModel(model, fields, values, timestamp):
+    # bond the input variables together as modelInput
+    modelInput = dict((field, float(values[field])) for field in fields)
+    modelInput['timestamp'] = timestamp
+    return model.run(modelInput).inferences['anomalyScore']
+
+
+def _worker(conn, specs):
+    try:
+        models = [(name, modelFields(params), _createModel(params, path))
+                  for name, params, path in specs]
+        conn.send(("ready", None))
+    except Exception:
+        conn.send(("error", traceback.format_exc()))
+        conn.close()
+        return
+
+    save_pid = None
+    while True:
+        command, args = conn.recv()
+        try:
+            if command == "run":
+                inputs, timestamp = args
+                conn.send(("ok", dict((name, _runModel(model, fields, inputs[name], timestamp))
+                                      for name, fields, model in models)))
+            elif command == "batch":
+                scores = {}
+                for name, fields, model in models:
+                    if name in args:
+                        scores[name] = [_runModel(model, fields, values, timestamp)
+                                        for timestamp, values in args[name]]
+                conn.send(("ok", scores))
+            elif command == "save":
+                path, background = args
+                _waitSave(save_pid)
+                save_pid = _saveModels([(name, model) for name, _, model in models], path, background)
+                conn.send(("ok", None))
+            elif command == "wait_save":
+                ok = _waitSave(save_pid)
+                save_pid = None
+                conn.send(("ok", ok))
+            elif command == "close":
+                _waitSave(save_pid)
+                conn.send(("ok", None))
+                break
+        except Exception:
+            conn.send(("error", traceback.format_exc()))
+    conn.close()
+
+
+class ModelGroup(object):
+    '''
+    -- models: list of (name, params) pairs, or a dict of name -> params.
+               params is a model_params_*.py module or its MODEL_PARAMS.
+    -- use_saved_model: load model `name` from checkpoint_path + '_NAME' and
+                        the likelihood estimators from likelihood_path
+    -- num_workers: 0 runs the models one after the other in this process,
+                    N > 0 spreads them round-robin over N worker processes
+
+    -- run: run every model once on a dict of name -> {field: value} and
+            return a dict of name -> anomaly likelihood
+    -- runBatch: run some of the models on a dict of name -> list of
+                 (timestamp, {field: value}), in order, and return a dict
+                 of name -> list of anomaly likelihoods
+    -- save_model: save the models and the likelihood estimators. With
+                   background=True the models are written by forked
+                   children of the workers (or of this process) while
+                   scoring goes on. Call it from the process that owns the
+                   group, not from a forked child.
+    -- waitSave: block until the background save is written, returns
+                 whether it succeeded
+    -- close: stop the workers
+    '''
+
+    def __init__(self, models, use_saved_model=False, checkpoint_path=None,
+                 likelihood_path=None, num_workers=0):
+        if hasattr(models, 'items'):
+            models = sorted(models.items())
+        self.names = [name for name, _ in models]
+        self.params = dict((name, getattr(params, 'MODEL_PARAMS', params))
+                           for name, params in models)
+        self.fields = dict((name, modelFields(self.params[name])) for name in self.names)
+
+        def path(name):
+            return _modelPath(checkpoint_path, name) if use_saved_model else None
+
+        if use_saved_model:
+            self.anomalyLikelihoods = LikelihoodRegistry.load(likelihood_path, self._likelihoodChannels())
+        else:
+            self.anomalyLikelihoods = LikelihoodRegistry(self._likelihoodChannels())
+
+        self.num_workers = min(num_workers, len(self.names))
+        self._models = None
+        self._workers = []
+        self._shards = []
+        self._save_pid = None
+        if self.num_workers <= 0:
+            self._models = dict((name, _createModel(self.params[name], path(name)))
+                                for name in self.names)
+            return
+
+        for k in range(self.num_workers):
+            names = self.names[k::self.num_workers]
+            parent_conn, child_conn = multiprocessing.Pipe()
+            process = multiprocessing.Process(
+                target=_worker,
+                args=(child_conn, [(name, self.params[name], path(name)) for name in names]))
+            process.daemon = True
+            process.start()
+            child_conn.close()
+            self._workers.append((process, parent_conn))
+            self._shards.append(names)
+        for _, conn in self._workers:
+            self._receive(conn)
+
+    def _receive(self, conn):
+        status, payload = conn.recv()
+        if status == "error":
+            self.close()
+            raise RuntimeError("HTM worker failed:\n" + payload)
+        return payload
+
+    def _broadcast(self, command, args=None):
+        for _, conn in self._workers:
+            conn.send((command, args))
+        return [self._receive(conn) for _, conn in self._workers]
+
+    def _anomalyScores(self, inputs, timestamp):
+        if self._models is not None:
+            return dict((name, _runModel(self._models[name], self.fields[name], inputs[name], timestamp))
+                        for name in self.names)
+        anomalyScores = {}
+        for shard in self._broadcast("run", (inputs, timestamp)):
+            anomalyScores.update(shard)
+        return anomalyScores
+
+    def _batchScores(self, batches):
+        if self._models is not None:
+            return dict((name, [_runModel(self._models[name], self.fields[name], values, timestamp)
+                                for timestamp, values in samples])
+                        for name, samples in batches.items())
+        # only the workers owning a model of the batch are asked
+        busy = []
+        for names, (_, conn) in zip(self._shards, self._workers):
+            shard = dict((name, batches[name]) for name in names if name in batches)
+            if shard:
+                conn.send(("batch", shard))
+                busy.append(conn)
+        anomalyScores = {}
+        for conn in busy:
+            anomalyScores.update(self._receive(conn))
+        return anomalyScores
+
+    def _likelihoodChannels(self):
+        return dict((name, len(self.fields[name])) for name in self.names)
+
+    def _likelihood(self, name, values, anomalyScore, timestamp):
+        values = [float(values[field]) for field in self.fields[name]]
+        return self.anomalyLikelihoods.anomalyProbability(name, values, anomalyScore, timestamp)
+
+    def run(self, inputs, timestamp):
+        anomalyScores = self._anomalyScores(inputs, timestamp)
+        return dict((name, self._likelihood(name, inputs[name], anomalyScores[name], timestamp))
+                    for name in self.names)
+
+    def runBatch(self, batches):
+        for name in batches:
+            if name not in self.fields:
+                raise KeyError("no model named %r in the group" % (name,))
+        batches = dict((name, samples) for name, samples in batches.items() if samples)
+        anomalyScores = self._batchScores(batches)
+        return dict((name, [self._likelihood(name, values, anomalyScore, timestamp)
+                            for (timestamp, values), anomalyScore in zip(samples, anomalyScores[name])])
+                    for name, samples in batches.items())
+
+    def save_model(self, model_path, likelihood_path, background=False):
+        if self._models is not None:
+            _waitSave(self._save_pid)
+            self._save_pid = _saveModels([(name, self._models[name]) for name in self.names],
+                                         model_path, background)
+        else:
+            self._broadcast("save", (model_path, background))
+        self.anomalyLikelihoods.save(likelihood_path)
+
+    def waitSave(self):
+        if self._models is not None:
+            ok = _waitSave(self._save_pid)
+            self._save_pid = None
+            return ok
+        return all(self._broadcast("wait_save"))
+
+    def close(self):
+        workers, self._workers = self._workers, []
+        for process, conn in workers:
+            try:
+                conn.send(("close", None))
+                conn.recv()
+            except (EOFError, IOError, OSError):
+                pass
+            conn.close()
+            process.join()
+        _waitSave(self._save_pid)
+        self._save_pid = None
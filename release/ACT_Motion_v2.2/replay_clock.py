@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+'''
+Pace of the demo loops: real time in production, faster for backtests.
+
+In real time the loop waits `period` seconds per record and the records are
+stamped with the wall clock, as before. The scaled mode waits period / speed
+and the fast mode does not wait at all; both stamp the records with
+simulated time (taken from the data when it has timestamps), so the models
+see the same time of day as in production while a day of data replays in
+minutes. Waits are measured against a deadline, so the time spent scoring a
+record is part of the period instead of being added to it.
+
+-- ReplayClock: timestamps and waits of a replay loop
+'''
+
+import time
+import datetime
+
+
+REAL = 'real'
+SCALED = 'scaled'
+FAST = 'fast'
+
+
+class ReplayClock(object):
+    '''
+    -- mode: REAL, SCALED or FAST
+    -- period: seconds between two records in real time
+    -- speed: speed-up of the scaled mode
+    -- start: simulated time of the first record, now by default
+    -- step: simulated seconds between two records, period by default
+
+    -- now: timestamp of the current record. In the simulated modes a
+            timestamp from the data is used as is when given.
+    -- tick: wait until the next record is due
+    -- ticks: number of records so far
+    '''
+
+    def __init__(self, mode=REAL, period=1.0, speed=100.0, start=None, step=None):
+        if mode not in (REAL, SCALED, FAST):
+            raise ValueError("unknown clock mode %r" % (mode,))
+        self.mode = mode
+        self.period = period
+        self.speed = speed
+        self.start = start if start is not None else datetime.datetime.now()
+        self.step = step if step is not None else period
+        self.ticks = 0
+        self._deadline = None
+
+    def now(self, data_time=None):
+        if self.mode == REAL:
+            return datetime.datetime.now()
+        if data_time is not None:
+            return data_time
+        return self.start + datetime.timedelta(seconds=self.step * self.ticks)
+
+    def tick(self):
+        self.ticks += 1
+        if self.mode == FAST:
+            return
+        interval = self.period if self.mode == REAL else self.period / float(self.speed)
+        if self._deadline is None:
+            self._deadline = time.time()
+        self._deadline += interval
+        delay = self._deadline - time.time()
+        if delay > 0:
+            time.sleep(delay)
+        else:
+            # running late, carry on from now rather than rushing to catch up
+            self._deadline = time.time()
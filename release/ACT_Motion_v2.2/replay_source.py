@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+'''
+Replay of recorded sensor files as a live stream.
+
+Every CSV file is read once and its columns are kept as contiguous NumPy
+arrays, already rounded the way the demo sends them, so producing the
+record of a tick is a few array lookups instead of converting every column
+to a list. Each sensor wraps around at the end of its own file, like the
+old data_simulator(). The times of the first file are kept as well, so a
+replay faster than real time can stamp its records with the recorded time.
+
+-- ReplaySource: the recorded sensors, record by record
+'''
+
+import datetime
+import pandas
+import numpy as np
+
+
+class ReplaySource(object):
+    '''
+    -- sources: list of (name, path, fields). The file has no header row,
+                its columns are name_field for every field, then the time.
+    -- decimals: values are rounded to this many decimals
+    -- time_format: format of the time column
+
+    -- record: dict of name -> {field: value} for record index i
+    -- timestamp: recorded time of record index i, None if the first file
+                  has no readable times. Every round through the file is
+                  shifted by the span of the file, so the times keep
+                  increasing.
+    -- replay: generator of (i, record) from record `start` on, forever
+    '''
+
+    def __init__(self, sources, decimals=3, time_format='%Y-%m-%d %H:%M:%S'):
+        self.names = []
+        self.fields = {}
+        self._columns = {}
+        self._times = None
+        self._span = None
+        for name, path, fields in sources:
+            header = ['%s_%s' % (name, field) for field in fields] + ['time']
+            data = pandas.read_csv(path, names=header)
+            self.names.append(name)
+            self.fields[name] = list(fields)
+            # round once with Python's round(), the same values as before
+            self._columns[name] = [np.array([round(value, decimals) for value in data[column].tolist()])
+                                   for column in header[:-1]]
+            if len(self.names) == 1:
+                self._times = self._parseTimes(data['time'].tolist(), time_format)
+
+        if self._times is not None:
+            count = len(self._times)
+            step = (self._times[-1] - self._times[0]) / (count - 1) if count > 1 else np.timedelta64(1, 's')
+            self._span = self._times[-1] - self._times[0] + step
+
+    @staticmethod
+    def _parseTimes(values, time_format):
+        try:
+            times = np.array([datetime.datetime.strptime(str(value), time_format) for value in values],
+                             dtype='datetime64[s]')
+        except ValueError:
+            return None
+        if not len(times):
+            return None
+        return times
+
+    def __len__(self):
+        return max(len(columns[0]) for columns in self._columns.values())
+
+    def record(self, i):
+        record = {}
+        for name in self.names:
+            columns = self._columns[name]
+            k = i % len(columns[0])
+            record[name] = dict((field, float(column[k]))
+                                for field, column in zip(self.fields[name], columns))
+        return record
+
+    def timestamp(self, i):
+        if self._times is None:
+            return None
+        rounds, k = divmod(i, len(self._times))
+        return (self._times[k] + rounds * self._span).astype(object)
+
+    def replay(self, start=0):
+        i = start
+        while True:
+            yield i, self.record(i)
+            i += 1
@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+'''
+Framed binary wire protocol of the result stream and of the sensor samples
+pushed by the collectors.
+
+Every frame is a 5-byte header (kind, payload length; network byte order)
+followed by the payload, so a reader always knows where a message ends no
+matter how TCP splits or merges the bytes. A SCHEMA frame carries the field
+names and struct type codes as JSON and is sent once, when a subscriber
+connects; every RECORD frame is then the fixed struct layout of those
+fields, decoded with one struct.unpack. Values with a fixed number of
+decimals (the sensor readings) can be sent as scaled integers.
+
+A SAMPLE frame is one reading of one channel sent to the ingest server:
+the time (seconds since the epoch, double), the channel name and its values
+as doubles.
+
+-- ResultSchema: named fields of a record, encodes records and the schema
+-- FrameReader: turns received bytes back into records or frames
+-- encodeSample: SAMPLE frame of one reading of a channel
+-- decodeSample: (channel, time, values) of a SAMPLE payload
+'''
+
+import json
+import struct
+
+
+SCHEMA = 1
+RECORD = 2
+SAMPLE = 3
+
+_HEADER = struct.Struct('!BI')
+# nothing the demo sends comes close, a bigger length means a broken stream
+_MAX_PAYLOAD = 1 << 20
+# time, length of the channel name
+_SAMPLE_HEADER = struct.Struct('!dB')
+
+
+def _frame(kind, payload):
+    return _HEADER.pack(kind, len(payload)) + payload
+
+
+def encodeSample(channel, timestamp, values):
+    name = channel.encode()
+    return _frame(SAMPLE, _SAMPLE_HEADER.pack(timestamp, len(name)) + name +
+                  struct.pack('!%dd' % len(values), *values))
+
+
+def decodeSample(payload):
+    timestamp, length = _SAMPLE_HEADER.unpack_from(payload)
+    start = _SAMPLE_HEADER.size + length
+    if start > len(payload) or (len(payload) - start) % 8:
+        raise ValueError("malformed sample of %d bytes" % len(payload))
+    channel = payload[_SAMPLE_HEADER.size:start].decode()
+    values = struct.unpack_from('!%dd' % ((len(payload) - start) // 8), payload, start)
+    return channel, timestamp, list(values)
+
+
+class ResultSchema(object):
+    '''
+    -- fields: list of (name, struct type code) or (name, type code, scale),
+               e.g. ('salt_acc_x', 'i', 1000) sends round(x * 1000) as an
+               int32 and decodes it as that / 1000.0. A bare name is a
+               double.
+
+    -- header: the SCHEMA frame, sent once per subscriber
+    -- encode: RECORD frame of a list of values in field order, or a dict
+    -- decode: list of values of a RECORD payload
+    -- asDict: dict of name -> value of a decoded record
+    -- fromJson: schema of a SCHEMA payload
+    '''
+
+    VERSION = 1
+
+    def __init__(self, fields):
+        self.fields = []
+        for field in fields:
+            if not isinstance(field, (list, tuple)):
+                field = (field, 'd')
+            scale = field[2] if len(field) > 2 else None
+            self.fields.append((str(field[0]), str(field[1]), scale))
+        self.names = [name for name, _, _ in self.fields]
+        self.struct = struct.Struct('!' + ''.join(code for _, code, _ in self.fields))
+        self._scaled = [(k, scale) for k, (_, _, scale) in enumerate(self.fields) if scale]
+
+    def header(self):
+        return _frame(SCHEMA, json.dumps({"version": self.VERSION,
+                                          "fields": self.fields}).encode())
+
+    def encode(self, values):
+        if isinstance(values, dict):
+            values = [values[name] for name in self.names]
+        if self._scaled:
+            values = list(values)
+            for k, scale in self._scaled:
+                values[k] = int(round(values[k] * scale))
+        return _frame(RECORD, self.struct.pack(*values))
+
+    def decode(self, payload):
+        values = list(self.struct.unpack(payload))
+        for k, scale in self._scaled:
+            values[k] = values[k] / float(scale)
+        return values
+
+    def asDict(self, values):
+        return dict(zip(self.names, values))
+
+    @classmethod
+    def fromJson(cls, payload):
+        schema = json.loads(payload.decode())
+        if schema.get("version") != cls.VERSION:
+            raise ValueError("unsupported result schema version %r" % (schema.get("version"),))
+        return cls(schema["fields"])
+
+
+class FrameReader(object):
+    '''
+    -- schema: schema of the records, None to wait for the SCHEMA frame
+
+    -- feed: add received bytes, returns the list of records completed by
+             them (each a list of values in field order)
+    -- frames: add received bytes, returns the list of (kind, payload) of
+               the frames completed by them, whatever their kind
+    '''
+
+    def __init__(self, schema=None):
+        self.schema = schema
+        self._buffer = b''
+
+    def frames(self, data):
+        self._buffer += data
+        frames = []
+        offset = 0
+        while len(self._buffer) - offset >= _HEADER.size:
+            kind, length = _HEADER.unpack_from(self._buffer, offset)
+            if length > _MAX_PAYLOAD:
+                raise ValueError("frame of %d bytes, the stream is out of sync" % length)
+            end = offset + _HEADER.size + length
+            if end > len(self._buffer):
+                break
+            frames.append((kind, self._buffer[offset + _HEADER.size:end]))
+            offset = end
+        self._buffer = self._buffer[offset:]
+        return frames
+
+    def feed(self, data):
+        records = []
+        for kind, payload in self.frames(data):
+            if kind == SCHEMA:
+                self.schema = ResultSchema.fromJson(payload)
+            elif kind == RECORD:
+                if self.schema is None:
+                    raise ValueError("record received before the schema")
+                records.append(self.schema.decode(payload))
+            # frames of other kinds are skipped, for newer servers
+        return records
@@ -0,0 +1,258 @@
+# -*- coding: utf-8 -*-
+'''
+Publish server for the results of the scoring loop.
+
+Any number of subscribers (the HMI, loggers, ...) can connect at any time.
+The server runs in a background thread around one select() loop; publish()
+only appends the message to the queue of every subscriber and returns, so a
+slow, stalled or vanished subscriber never holds up the scoring. Each queue
+is bounded: when a subscriber falls behind, its oldest messages are dropped.
+A message partly sent is always finished, so the stream stays well framed.
+
+Run this file to try it on localhost with a few simulated subscribers, one
+of them too slow to keep up.
+
+-- ResultServer: accept subscribers and fan the published messages out
+'''
+
+import errno
+import select
+import socket
+import threading
+import collections
+
+
+_RETRY = (errno.EAGAIN, errno.EWOULDBLOCK, errno.EINTR)
+
+
+def _wakePair():
+    # a connected pair of sockets, written to wake the select() loop up
+    try:
+        return socket.socketpair()
+    except AttributeError:
+        # no socketpair on Windows with python 2
+        listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        listener.bind(('127.0.0.1', 0))
+        listener.listen(1)
+        writer = socket.create_connection(listener.getsockname())
+        reader, _ = listener.accept()
+        listener.close()
+        return reader, writer
+
+
+class _Subscriber(object):
+
+    def __init__(self, sock, address, queue_size):
+        self.sock = sock
+        self.address = address
+        self.queue = collections.deque(maxlen=queue_size)
+        self.pending = b''
+        self.dropped = 0
+
+
+class ResultServer(object):
+    '''
+    -- host, port: address to listen on, '' for every interface
+    -- queue_size: messages queued per subscriber before the oldest ones
+                   are dropped
+    -- send_buffer: kernel send buffer of every subscriber (bytes). Small
+                    values keep stale results out of the kernel, so a slow
+                    subscriber gets the newest ones. None keeps the default.
+    -- greeting: bytes sent to every subscriber first, e.g. the schema of
+                 the messages (see result_protocol.py)
+
+    -- start: listen and serve in a background thread
+    -- publish: queue one message (bytes) for every subscriber, never blocks
+    -- subscribers: addresses of the connected subscribers
+    -- dropped: number of messages dropped so far, all subscribers together
+    -- close: disconnect everybody and stop the thread
+    '''
+
+    def __init__(self, host, port, queue_size=100, send_buffer=None, greeting=None):
+        self.host = host
+        self.port = port
+        self.queue_size = queue_size
+        self.send_buffer = send_buffer
+        self.greeting = greeting
+        self.dropped = 0
+        self._subscribers = {}
+        self._lock = threading.Lock()
+        self._listener = None
+        self._thread = None
+        self._running = False
+        self._wakeReader, self._wakeWriter = _wakePair()
+        self._wakeReader.setblocking(False)
+        self._wakeWriter.setblocking(False)
+
+    def start(self):
+        self._listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._listener.bind((self.host, self.port))
+        self._listener.listen(16)
+        self._listener.setblocking(False)
+        # port 0 picks a free port
+        self.port = self._listener.getsockname()[1]
+        self._running = True
+        self._thread = threading.Thread(target=self._serve, name="ResultServer")
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    @property
+    def subscribers(self):
+        with self._lock:
+            return [subscriber.address for subscriber in self._subscribers.values()]
+
+    def publish(self, message):
+        with self._lock:
+            for subscriber in self._subscribers.values():
+                if len(subscriber.queue) == subscriber.queue.maxlen:
+                    subscriber.dropped += 1
+                    self.dropped += 1
+                subscriber.queue.append(message)
+        self._wake()
+
+    def _wake(self):
+        try:
+            self._wakeWriter.send(b'x')
+        except socket.error:
+            # the pipe is full, the loop is awake anyway
+            pass
+
+    def _serve(self):
+        while self._running:
+            with self._lock:
+                subscribers = list(self._subscribers.values())
+                writers = [subscriber.sock for subscriber in subscribers
+                           if subscriber.pending or subscriber.queue]
+            readers = [self._listener, self._wakeReader] + [subscriber.sock for subscriber in subscribers]
+            try:
+                readable, writable, _ = select.select(readers, writers, [], 1.0)
+            except (select.error, socket.error, ValueError):
+                # a socket was closed under us, look again
+                continue
+
+            for sock in readable:
+                if sock is self._listener:
+                    self._accept()
+                elif sock is self._wakeReader:
+                    self._drainWake()
+                else:
+                    self._read(sock)
+            for sock in writable:
+                self._write(sock)
+
+    def _accept(self):
+        try:
+            sock, address = self._listener.accept()
+        except socket.error:
+            return
+        sock.setblocking(False)
+        if self.send_buffer is not None:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, self.send_buffer)
+        subscriber = _Subscriber(sock, address, self.queue_size)
+        if self.greeting:
+            subscriber.pending = self.greeting
+        with self._lock:
+            self._subscribers[sock] = subscriber
+
+    def _drainWake(self):
+        try:
+            while self._wakeReader.recv(4096):
+                pass
+        except socket.error:
+            pass
+
+    def _read(self, sock):
+        # subscribers do not talk, anything readable is data to ignore or
+        # the end of the connection
+        try:
+            if not sock.recv(4096):
+                self._disconnect(sock)
+        except socket.error as error:
+            if error.args[0] not in _RETRY:
+                self._disconnect(sock)
+
+    def _write(self, sock):
+        with self._lock:
+            subscriber = self._subscribers.get(sock)
+            if subscriber is None:
+                return
+            if not subscriber.pending and subscriber.queue:
+                subscriber.pending = subscriber.queue.popleft()
+            data = subscriber.pending
+        try:
+            sent = sock.send(data)
+        except socket.error as error:
+            if error.args[0] not in _RETRY:
+                self._disconnect(sock)
+            return
+        subscriber.pending = data[sent:]
+
+    def _disconnect(self, sock):
+        with self._lock:
+            self._subscribers.pop(sock, None)
+        try:
+            sock.close()
+        except socket.error:
+            pass
+
+    def close(self):
+        self._running = False
+        self._wake()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        with self._lock:
+            socks = list(self._subscribers.keys())
+        for sock in socks:
+            self._disconnect(sock)
+        if self._listener is not None:
+            self._listener.close()
+            self._listener = None
+        self._wakeReader.close()
+        self._wakeWriter.close()
+
+
+if __name__ == '__main__':
+    import time
+
+    def subscribe(port, name, delay):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        if delay:
+            # a small receive buffer, so the backlog piles up in the server
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 2048)
+        sock.connect(('127.0.0.1', port))
+        sock.settimeout(1.0)
+        received = 0
+        buffered = b''
+        while True:
+            try:
+                data = sock.recv(512)
+            except socket.timeout:
+                break
+            if not data:
+                break
+            buffered += data
+            received += buffered.count(b'\n')
+            buffered = buffered[buffered.rfind(b'\n') + 1:]
+            time.sleep(delay)
+        sock.close()
+        print('%s received %d messages' % (name, received))
+
+    server = ResultServer('127.0.0.1', 0, queue_size=50, send_buffer=4096).start()
+    clients = [threading.Thread(target=subscribe, args=(server.port, 'client %d' % k, 0.0))
+               for k in range(3)]
+    clients.append(threading.Thread(target=subscribe, args=(server.port, 'slow client', 0.01)))
+    for client in clients:
+        client.start()
+    time.sleep(0.2)
+    start = time.time()
+    for k in range(2000):
+        # about the size of the 20 values of the demo
+        server.publish(('[%d' % k + ', 0.123456789' * 19 + ']\n').encode())
+        time.sleep(0.0005)
+    print('published 2000 messages in %.2f s, %d dropped' % (time.time() - start, server.dropped))
+    for client in clients:
+        client.join()
+    server.close()
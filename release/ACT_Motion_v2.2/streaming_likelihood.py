@@ -0,0 +1,383 @@
+# -*- coding: utf-8 -*-
+'''
+Streaming anomaly likelihood with incremental window statistics.
+
+StreamingLikelihood follows the algorithm of NuPIC's AnomalyLikelihood
+(moving average of the raw anomaly scores, normal distribution re-estimated
+every `reestimationPeriod` records over the historic window, tail
+probability, red/yellow filtering) and keeps its anomalyProbability()
+contract. The historic window lives in NumPy ring buffers and its mean and
+variance are running sums updated as records enter and leave the window, so
+a re-estimation costs O(1) instead of a pass over up to 8640 records in pure
+Python. One estimator scores any number of channels at once, and a whole
+(records x channels) replay can be scored in one call.
+
+-- StreamingLikelihood: drop-in replacement of AnomalyLikelihood
+'''
+
+import math
+import numbers
+import numpy as np
+
+
+# thresholds of NuPIC's _filterLikelihoods, computed the same way
+_RED_THRESHOLD = 1.0 - 0.99999
+_YELLOW_THRESHOLD = 1.0 - 0.999
+
+# lower bounds of the fitted distribution, and the distribution used when
+# the metric itself is (nearly) constant
+_MIN_MEAN = 0.03
+_MIN_VARIANCE = 0.0003
+_MIN_METRIC_VARIANCE = 1.5e-5
+_NULL_MEAN = 0.5
+_NULL_STDEV = 1000.0
+
+_erfc = np.frompyfunc(math.erfc, 1, 1)
+
+
+class _RollingMoments(object):
+    '''
+    Count, sum and sum of squares of a window of rows, per channel. Values
+    are shifted by the first row seen so the variance does not lose its
+    precision to large means.
+    '''
+
+    def __init__(self, channels):
+        self.shift = np.zeros(channels)
+        self.shifted = False
+        self.count = 0
+        self.sum = np.zeros(channels)
+        self.squares = np.zeros(channels)
+
+    def reset(self, rows):
+        self.count = 0
+        self.sum[:] = 0.0
+        self.squares[:] = 0.0
+        self.add(rows)
+
+    def add(self, rows):
+        if not len(rows):
+            return
+        if not self.shifted:
+            self.shift = np.nan_to_num(rows[0]).copy()
+            self.shifted = True
+        delta = rows - self.shift
+        self.count += len(rows)
+        self.sum += delta.sum(axis=0)
+        self.squares += (delta * delta).sum(axis=0)
+
+    def remove(self, rows):
+        if not len(rows):
+            return
+        delta = rows - self.shift
+        self.count -= len(rows)
+        self.sum -= delta.sum(axis=0)
+        self.squares -= (delta * delta).sum(axis=0)
+
+    def finite(self):
+        return np.isfinite(self.sum).all() and np.isfinite(self.squares).all()
+
+    def moments(self, old=None, new=None):
+        '''
+        Mean and population variance of the window, with the rows `old`
+        replaced by the rows `new` if given.
+        '''
+        total, squares = self.sum, self.squares
+        if old is not None and len(old):
+            total = total - (old - self.shift).sum(axis=0) + (new - self.shift).sum(axis=0)
+            squares = (squares - ((old - self.shift) ** 2).sum(axis=0)
+                       + ((new - self.shift) ** 2).sum(axis=0))
+        mean = total / self.count
+        variance = np.maximum(squares / self.count - mean * mean, 0.0)
+        return self.shift + mean, variance
+
+
+class StreamingLikelihood(object):
+    '''
+    -- channels: number of anomaly score streams scored side by side
+    -- learningPeriod, estimationSamples, historicWindowSize,
+       reestimationPeriod: as in NuPIC's AnomalyLikelihood
+    -- averagingWindow: records in the moving average of the raw scores
+
+    -- anomalyProbability: likelihood of one record of one channel
+    -- anomalyProbabilities: likelihoods of a (records x channels) array,
+                             1 - p like anomalyProbability
+    -- writeToFile, readFromFile: save and restore the whole state
+    '''
+
+    def __init__(self, channels=1, learningPeriod=288, estimationSamples=100,
+                 historicWindowSize=8640, reestimationPeriod=100, averagingWindow=10):
+        if historicWindowSize < estimationSamples:
+            raise ValueError("estimationSamples exceeds historicWindowSize")
+        if historicWindowSize < averagingWindow:
+            raise ValueError("averagingWindow exceeds historicWindowSize")
+        self.channels = channels
+        self._learningPeriod = learningPeriod
+        self._estimationSamples = estimationSamples
+        self._probationaryPeriod = learningPeriod + estimationSamples
+        self._windowSize = historicWindowSize
+        self._reestimationPeriod = reestimationPeriod
+        self._averagingWindow = averagingWindow
+
+        self._iteration = 0
+        shape = (historicWindowSize, channels)
+        self._scores = np.zeros(shape)
+        self._averages = np.zeros(shape)
+        self._values = np.zeros(shape)
+        self._numeric = np.ones(shape, dtype=bool)
+        self._nonNumeric = np.zeros(channels, dtype=np.int64)
+        self._averageMoments = _RollingMoments(channels)
+        self._valueMoments = _RollingMoments(channels)
+        self._synced = 0
+        self._total = np.zeros(channels)
+        self._mean = None
+        self._stdev = None
+        self._previousTail = None
+
+    def _rows(self, ring, start, end):
+        return ring[np.arange(start, end) % self._windowSize]
+
+    def _windowStart(self, iteration):
+        # the window skips the learning period of the TM, as long as it is
+        # still in the history
+        return max(self._learningPeriod, iteration - self._windowSize)
+
+    def _tail(self, averages):
+        mean, stdev = self._mean, self._stdev
+        averages = np.where(averages < mean, 2 * mean - averages, averages)
+        return 0.5 * _erfc((averages - mean) / stdev / 1.4142).astype(np.float64)
+
+    def _estimate(self):
+        n = self._iteration
+        first = max(0, n - self._windowSize)
+        start = self._windowStart(n)
+        if n <= start:
+            self._mean = np.full(self.channels, _NULL_MEAN)
+            self._stdev = np.full(self.channels, _NULL_STDEV)
+            self._previousTail = self._tail(self._averages[(n - 1) % self._windowSize])
+            return
+
+        if (n - self._synced >= self._windowSize or not self._averageMoments.finite()
+                or not self._valueMoments.finite()):
+            # start over from the ring buffers once per window, so rounding
+            # errors of the running sums never pile up
+            self._averageMoments.reset(self._rows(self._averages, start, n))
+            self._valueMoments.reset(self._rows(self._values, start, n))
+            self._synced = n
+
+        old = new = None
+        end = min(n, first + self._averagingWindow - 1)
+        if first > 0 and start < end:
+            # NuPIC averages the history from its oldest record on, so the
+            # first averages of a full window cover fewer scores
+            scores = self._rows(self._scores, first, end)
+            partial = np.cumsum(scores, axis=0) / np.arange(1, len(scores) + 1)[:, None]
+            old = self._rows(self._averages, start, end)
+            new = partial[start - first:]
+        mean, variance = self._averageMoments.moments(old, new)
+        mean = np.maximum(mean, _MIN_MEAN)
+        stdev = np.sqrt(np.maximum(variance, _MIN_VARIANCE))
+
+        _, metricVariance = self._valueMoments.moments()
+        constant = (self._nonNumeric == 0) & (metricVariance < _MIN_METRIC_VARIANCE)
+        self._mean = np.where(constant, _NULL_MEAN, mean)
+        self._stdev = np.where(constant, _NULL_STDEV, stdev)
+        # the filter compares every likelihood with the one before it
+        self._previousTail = self._tail(self._averages[(n - 1) % self._windowSize])
+
+    def _ingest(self, scores, values, numeric):
+        n0 = self._iteration
+        n1 = n0 + len(scores)
+        size = self._windowSize
+        window = self._averagingWindow
+
+        # moving averages, continuing over the last scores of the history
+        first = max(0, n0 - window + 1)
+        padded = np.concatenate([self._rows(self._scores, first, n0), scores])
+        cumulative = np.vstack([np.zeros((1, self.channels)), np.cumsum(padded, axis=0)])
+        index = np.arange(n0, n1)
+        low = np.maximum(0, index - window + 1)
+        averages = ((cumulative[index - first + 1] - cumulative[low - first])
+                    / (index - low + 1)[:, None])
+
+        if n0 < self._probationaryPeriod:
+            likelihoods = np.full(scores.shape, 0.5)
+        else:
+            raw = self._tail(averages)
+            previous = np.vstack([self._previousTail, raw[:-1]])
+            self._previousTail = raw[-1]
+            filtered = np.where((raw <= _RED_THRESHOLD) & (previous <= _RED_THRESHOLD),
+                                _YELLOW_THRESHOLD, raw)
+            likelihoods = 1.0 - filtered
+
+        # records leaving the window and the history, read before the ring
+        # buffers are overwritten
+        self._averageMoments.remove(self._rows(self._averages, self._windowStart(n0),
+                                               self._windowStart(n1)))
+        self._valueMoments.remove(self._rows(self._values, self._windowStart(n0),
+                                             self._windowStart(n1)))
+        self._nonNumeric -= (~self._rows(self._numeric, max(0, n0 - size),
+                                         max(0, n1 - size))).sum(axis=0)
+
+        skip = max(0, self._learningPeriod - n0)
+        self._averageMoments.add(averages[skip:])
+        self._valueMoments.add(values[skip:])
+        self._nonNumeric += (~numeric).sum(axis=0)
+
+        slots = index % size
+        self._scores[slots] = scores
+        self._averages[slots] = averages
+        self._values[slots] = values
+        self._numeric[slots] = numeric
+        self._total = padded[-window:].sum(axis=0)
+        self._iteration = n1
+        return likelihoods
+
+    def _ingestRecord(self, score, value, numeric):
+        # the same as _ingest for one record, the per-tick path of live
+        # scoring, without the block bookkeeping
+        n = self._iteration
+        size = self._windowSize
+        slot = n % size
+        window = self._averagingWindow
+
+        self._total += score
+        if n >= window:
+            self._total -= self._scores[(n - window) % size]
+        average = self._total / min(n + 1, window)
+
+        if n < self._probationaryPeriod:
+            likelihood = np.full(self.channels, 0.5)
+        else:
+            raw = self._tail(average)
+            filtered = np.where((raw <= _RED_THRESHOLD) & (self._previousTail <= _RED_THRESHOLD),
+                                _YELLOW_THRESHOLD, raw)
+            self._previousTail = raw
+            likelihood = 1.0 - filtered
+
+        start = self._windowStart(n)
+        if self._windowStart(n + 1) > start:
+            self._averageMoments.remove(self._averages[start % size][None])
+            self._valueMoments.remove(self._values[start % size][None])
+        if n >= size:
+            self._nonNumeric -= ~self._numeric[slot]
+        if n >= self._learningPeriod:
+            self._averageMoments.add(average[None])
+            self._valueMoments.add(value[None])
+        self._nonNumeric += ~numeric
+
+        self._scores[slot] = score
+        self._averages[slot] = average
+        self._values[slot] = value
+        self._numeric[slot] = numeric
+        self._iteration = n + 1
+        return likelihood
+
+    def _advance(self, scores, values, numeric):
+        likelihoods = np.empty_like(scores)
+        start = 0
+        while start < len(scores):
+            n = self._iteration
+            if n >= self._probationaryPeriod and (self._mean is None or
+                                                   n % self._reestimationPeriod == 0):
+                self._estimate()
+            if len(scores) == 1:
+                likelihoods[0] = self._ingestRecord(scores[0], values[0], numeric[0])
+                break
+            # the distribution stays the same up to the next re-estimation
+            if n < self._probationaryPeriod:
+                stop = self._probationaryPeriod
+            else:
+                stop = (n // self._reestimationPeriod + 1) * self._reestimationPeriod
+            end = start + min(stop - n, self._windowSize, len(scores) - start)
+            likelihoods[start:end] = self._ingest(scores[start:end], values[start:end],
+                                                  numeric[start:end])
+            start = end
+        return likelihoods
+
+    def _metricValues(self, values, shape):
+        array = np.asarray(values)
+        if array.dtype.kind in 'biuf':
+            return array.astype(np.float64).reshape(shape), np.ones(shape, dtype=bool)
+        # values that are not numbers (None, strings) are kept out of the
+        # metric variance check, like in NuPIC
+        array = array.astype(object).reshape(shape)
+        numeric = np.vectorize(lambda value: isinstance(value, numbers.Number),
+                               otypes=[bool])(array)
+        return np.where(numeric, array, 0.0).astype(np.float64), numeric
+
+    def anomalyProbabilities(self, values, anomalyScores):
+        '''
+        Score a block of records in one call.
+
+        -- values: metric values, same shape as anomalyScores
+        -- anomalyScores: raw anomaly scores, (records x channels). A single
+                          channel estimator also takes a 1-D array of records.
+        '''
+        scores = np.asarray(anomalyScores, dtype=np.float64)
+        outputShape = scores.shape
+        scores = scores.reshape(-1, self.channels)
+        values, numeric = self._metricValues(values, scores.shape)
+        return self._advance(scores, values, numeric).reshape(outputShape)
+
+    def anomalyProbability(self, value, anomalyScore, timestamp=None):
+        '''
+        Likelihood of one record, as AnomalyLikelihood.anomalyProbability.
+        The timestamp is accepted for compatibility and not used.
+        '''
+        numeric = isinstance(value, numbers.Number)
+        likelihoods = self._advance(np.array([[anomalyScore]], dtype=np.float64),
+                                    np.array([[value if numeric else 0.0]], dtype=np.float64),
+                                    np.array([[numeric]]))
+        return float(likelihoods[0, 0])
+
+    def _state(self):
+        state = {
+            "params": np.array([self.channels, self._learningPeriod, self._estimationSamples,
+                                self._windowSize, self._reestimationPeriod,
+                                self._averagingWindow, self._iteration, self._synced]),
+            "scores": self._scores,
+            "averages": self._averages,
+            "values": self._values,
+            "numeric": self._numeric,
+            "nonNumeric": self._nonNumeric,
+            "total": self._total,
+        }
+        for name, moments in (("averageMoments", self._averageMoments),
+                              ("valueMoments", self._valueMoments)):
+            state[name] = np.vstack([moments.shift, moments.sum, moments.squares])
+            state[name + "Count"] = np.array([moments.count, moments.shifted])
+        if self._mean is not None:
+            state["distribution"] = np.vstack([self._mean, self._stdev, self._previousTail])
+        return state
+
+    def writeToFile(self, f):
+        np.savez(f, **self._state())
+
+    @classmethod
+    def readFromFile(cls, f):
+        state = np.load(f)
+        try:
+            return cls._fromState(state)
+        finally:
+            state.close()
+
+    @classmethod
+    def _fromState(cls, state):
+        params = [int(value) for value in state["params"]]
+        estimator = cls(*params[:6])
+        estimator._iteration, estimator._synced = params[6:]
+        estimator._scores = state["scores"]
+        estimator._averages = state["averages"]
+        estimator._values = state["values"]
+        estimator._numeric = state["numeric"]
+        estimator._nonNumeric = state["nonNumeric"]
+        estimator._total = state["total"]
+        for name, moments in (("averageMoments", estimator._averageMoments),
+                              ("valueMoments", estimator._valueMoments)):
+            moments.shift, moments.sum, moments.squares = [row.copy() for row in state[name]]
+            moments.count, moments.shifted = int(state[name + "Count"][0]), bool(state[name + "Count"][1])
+        if "distribution" in state.files:
+            estimator._mean, estimator._stdev, estimator._previousTail = \
+                [row.copy() for row in state["distribution"]]
+        return estimator
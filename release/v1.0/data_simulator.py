@@ -9,7 +9,10 @@ import os
 #import numpy as np
 import psutil
 import csv
+import time
+import struct
 import datetime
+import threading
 
 '''
 The data simulator that you can play with, and you have to modify this file to
@@ -19,34 +22,138 @@ In this case, I used my real-time cpu and memory usage for experiments, which
 performs normally.
 
 
--- data_generator: define your source of data
+-- data_generator: define your source of data. interval=None does not wait
+                  for the cpu usage, it is measured since the last call
 
--- count_rows: count how many rows in csv cache
+-- count_rows: count how many rows in csv cache, from its index
+
+-- update_index: bring the sidecar index of a csv cache (filepath + '.idx',
+                 the offset of every row) up to date. Only the rows
+                 appended since the last call are read.
 
 -- write_to_csv: write data to csv cache
 
 -- time_arithmetic: add 1 hour to a give datetime. You can also modify this 
                     based on your time gap, like in minutes or in seconds
                     
--- getLastTimeFromCSV: get the datetime for the last record in current cache
+-- getLastTimeFromCSV: get the datetime for the last record in current cache,
+                      read backwards from the end of the file
 
--- getRunningTime: get the datetime based on an indicator
+-- getRunningTime: get the datetime based on an indicator, the row is found
+                  with the index
 
 -- getBatchData2csv: should be called externally to write a new batch of data 
                      into csv cache
+
+-- RecordSampler: samples data_generator() in a background thread and feeds
+                  the records straight to the networks through
+                  QueueRecordStreams (see queue_record_stream.py), instead
+                  of the csv cache
 '''
     
-def data_generator():
+def data_generator(interval=1):
 #    x1 = np.random.uniform(2, 5)
 #    x2 = np.random.uniform(2, 5)
-    x1 = psutil.cpu_percent(interval=1)
+    x1 = psutil.cpu_percent(interval=interval)
     x2 = psutil.virtual_memory().percent
     return x1, x2
 
 
+# index file: rows indexed and offset scanned up to, then one offset per row
+_INDEX_HEADER = struct.Struct('<QQ')
+_OFFSET = struct.Struct('<Q')
+
+
+def _index_path(filepath):
+    return filepath + '.idx'
+
+
+def update_index(filepath):
+    '''
+    Returns (rows, scanned, size): the number of complete rows indexed, the
+    offset right after the last of them and the size of the csv file. A
+    last row still being written is left for the next call.
+    '''
+    index_path = _index_path(filepath)
+    size = os.path.getsize(filepath)
+    rows, scanned = 0, 0
+    if os.path.exists(index_path):
+        with open(index_path, 'rb') as index:
+            header = index.read(_INDEX_HEADER.size)
+        if len(header) == _INDEX_HEADER.size:
+            rows, scanned = _INDEX_HEADER.unpack(header)
+        if scanned > size:
+            # the csv was replaced by a shorter one
+            rows, scanned = 0, 0
+    if scanned == size:
+        return rows, scanned, size
+
+    offsets = []
+    row_start = scanned
+    with open(filepath, 'rb') as f:
+        f.seek(scanned)
+        position = scanned
+        while True:
+            chunk = f.read(1 << 16)
+            if not chunk:
+                break
+            k = chunk.find(b'\n')
+            while k >= 0:
+                offsets.append(row_start)
+                row_start = position + k + 1
+                k = chunk.find(b'\n', k + 1)
+            position += len(chunk)
+
+    mode = 'r+b' if rows and os.path.exists(index_path) else 'wb'
+    with open(index_path, mode) as index:
+        # offsets past the header's count were left by an interrupted update
+        index.truncate(_INDEX_HEADER.size + rows * _OFFSET.size)
+        index.seek(_INDEX_HEADER.size + rows * _OFFSET.size)
+        index.write(b''.join(_OFFSET.pack(offset) for offset in offsets))
+        index.seek(0)
+        index.write(_INDEX_HEADER.pack(rows + len(offsets), row_start))
+    return rows + len(offsets), row_start, size
+
+
 def count_rows(filepath):
-    with open(filepath, 'r') as f:
-        return len(f.readlines())
+    rows, scanned, size = update_index(filepath)
+    # a last row without its line end counts, as with readlines()
+    return rows + (1 if size > scanned else 0)
+
+
+def _read_row(filepath, indicator):
+    rows, scanned, size = update_index(filepath)
+    total = rows + (1 if size > scanned else 0)
+    if indicator < 0:
+        indicator += total
+    if not 0 <= indicator < total:
+        raise IndexError('row %d of %d rows' % (indicator, total))
+    if indicator == rows:
+        offset = scanned
+    else:
+        with open(_index_path(filepath), 'rb') as index:
+            index.seek(_INDEX_HEADER.size + indicator * _OFFSET.size)
+            offset, = _OFFSET.unpack(index.read(_OFFSET.size))
+    with open(filepath, 'rb') as f:
+        f.seek(offset)
+        return f.readline().decode()
+
+
+def _read_last_row(filepath):
+    # read backwards from the end until a whole row is in
+    with open(filepath, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        position = f.tell()
+        data = b''
+        while position > 0:
+            step = min(4096, position)
+            position -= step
+            f.seek(position)
+            data = f.read(step) + data
+            k = data.rstrip(b'\r\n').rfind(b'\n')
+            if k >= 0:
+                return data[k + 1:].decode()
+        return data.decode()
  
     
 def write_to_csv(data, filepath):
@@ -56,6 +163,9 @@ def write_to_csv(data, filepath):
         --row: The rows write to csv file
     
     '''
+    # the old index does not match the new file
+    if os.path.exists(_index_path(filepath)):
+        os.remove(_index_path(filepath))
     csvfile = open(filepath, 'wb+')
     writer = csv.writer(csvfile)
     writer.writerows(data)
@@ -69,19 +179,15 @@ def time_arithmetic(date):
 
 
 def getLastTimeFromCSV(filepath):
-    with open(filepath, 'r') as csvfile:
-        lines = csvfile.readlines()
-        targetLine = lines[-1]
-        lastime = targetLine.split(',')[0]
-        return datetime.datetime.strptime(lastime, '%Y-%m-%d %H:%M:%S')
+    targetLine = _read_last_row(filepath)
+    lastime = targetLine.split(',')[0]
+    return datetime.datetime.strptime(lastime, '%Y-%m-%d %H:%M:%S')
 
 
 def getRunningTime(filepath, indicator):
-    with open(filepath, 'r') as csvfile:
-        lines = csvfile.readlines()
-        targetLine = lines[indicator]
-        lastime = targetLine.split(',')[0]
-        return datetime.datetime.strptime(lastime, '%Y-%m-%d %H:%M:%S')
+    targetLine = _read_row(filepath, indicator)
+    lastime = targetLine.split(',')[0]
+    return datetime.datetime.strptime(lastime, '%Y-%m-%d %H:%M:%S')
 
 
 def getBatchData2csv(buffer_size, filepath1, filepath2):
@@ -118,4 +224,78 @@ def getBatchData2csv(buffer_size, filepath1, filepath2):
             buffer1 = []
             buffer2 = []
             
-            break
\ No newline at end of file
+            break
+
+
+class RecordSampler(object):
+    '''
+    Every `period` seconds, takes one sample of the generator and appends
+    [time, value] to the stream of every value, the time going up by
+    time_arithmetic(). The sampling never waits for the networks and the
+    networks wait for the next record in their stream.
+    
+    -- streams: one QueueRecordStream per value of the generator
+    -- period: seconds between two samples
+    -- date: time of the record before the first one. By default the time of
+             the last record persisted by the first stream, or 2019-09-09
+             00:00:00 like getBatchData2csv
+    -- generator: returns the values of a sample, data_generator() without
+                  waiting by default
+    
+    -- start: start sampling, returns the sampler
+    -- stop: stop sampling
+    '''
+    
+    def __init__(self, streams, period=1.0, date=None, generator=None):
+        self.streams = streams
+        self.period = period
+        if date is None:
+            date = self._lastPersistedTime(streams[0].persist_path)
+        if date is None:
+            date = datetime.datetime.strptime('2019-09-09 00:00:00', '%Y-%m-%d %H:%M:%S')
+        self.date = date
+        self.generator = generator
+        self._stop = threading.Event()
+        self._thread = None
+    
+    
+    @staticmethod
+    def _lastPersistedTime(filepath):
+        if filepath is None or not os.path.exists(filepath):
+            return None
+        try:
+            return getLastTimeFromCSV(filepath)
+        except (ValueError, IndexError):
+            # no record below the header rows yet
+            return None
+    
+    
+    def start(self):
+        if self.generator is None:
+            # the first non-blocking cpu_percent() has nothing to compare to
+            psutil.cpu_percent(interval=None)
+            self.generator = lambda: data_generator(interval=None)
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="RecordSampler")
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+    
+    
+    def _run(self):
+        next_sample = time.time() + self.period
+        while not self._stop.wait(max(next_sample - time.time(), 0)):
+            values = self.generator()
+            self.date = time_arithmetic(self.date)
+            for stream, value in zip(self.streams, values):
+                stream.appendRecord([self.date, value])
+            next_sample += self.period
+    
+    
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        for stream in self.streams:
+            stream.flush()
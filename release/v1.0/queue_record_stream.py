@@ -0,0 +1,209 @@
+# -*- coding: utf-8 -*-
+"""
+In-memory record stream that a RecordSensor consumes directly.
+
+Records are appended from any thread (see RecordSampler in
+data_simulator.py) to a thread-safe queue, and the sensor takes them out
+of it, waiting for the next one when the queue is empty. No CSV cache is
+rewritten and re-read between batches. With persist_path every record is
+also appended to a CSV file in the FileRecordStream format: the three
+header rows are written once, when the file is new, and the file is never
+rewritten.
+
+-- QueueRecordStream: RecordStreamIface fed with appendRecord()
+"""
+
+import os
+import csv
+import time
+import threading
+try:
+    import Queue as queue
+except ImportError:
+    import queue
+from nupic.data.field_meta import FieldMetaInfo
+from nupic.data.record_stream import RecordStreamIface
+
+
+# the fields of the csv cache of data_simulator.py
+DEFAULT_FIELDS = [('time', 'datetime', 'T'), ('value', 'float', '')]
+
+_NUMERIC = ('int', 'float')
+
+
+class QueueRecordStream(RecordStreamIface):
+    '''
+    -- fields: list of (name, type, special) of the records
+    -- maxsize: records queued before appendRecord() waits for the sensor,
+                0 for no limit
+    -- persist_path: CSV file the records are also appended to, None for
+                     no file
+    -- timeout: seconds getNextRecord() waits for a record before it
+                returns None, None to wait for ever
+
+    -- appendRecord: queue a record (list of values in field order), from
+                     any thread
+    -- getNextRecord: take the next record, waits for it. None once the
+                      stream is closed or after the timeout
+    -- lastRecord: the record taken last, e.g. for its time
+    -- pending: number of records queued
+    -- close: stop the stream and close the CSV file
+    '''
+
+    def __init__(self, fields=DEFAULT_FIELDS, maxsize=0, persist_path=None, timeout=None):
+        super(QueueRecordStream, self).__init__()
+        self._fields = [FieldMetaInfo(*field) for field in fields]
+        self._maxsize = maxsize
+        self.persist_path = persist_path
+        self._timeout = timeout
+        self._nextRecordIdx = 0
+        self._error = False
+        self._completed = False
+        self._closed = False
+        self.lastRecord = None
+        self.clearStats()
+        self._open([])
+
+
+    def _open(self, records):
+        self._queue = queue.Queue(self._maxsize)
+        for record in records:
+            self._queue.put(record)
+        # producers of several threads write to the same file
+        self._lock = threading.Lock()
+        self._file = None
+        self._writer = None
+        if self.persist_path is not None:
+            new = not os.path.exists(self.persist_path) or os.path.getsize(self.persist_path) == 0
+            self._file = open(self.persist_path, 'ab')
+            self._writer = csv.writer(self._file)
+            if new:
+                self._writer.writerows([self.getFieldNames(),
+                                        [field.type for field in self._fields],
+                                        [field.special for field in self._fields]])
+
+
+    def __getstate__(self):
+        # saved with the network: the queued records are kept, the file is
+        # opened again on load
+        state = self.__dict__.copy()
+        for name in ('_queue', '_lock', '_file', '_writer'):
+            del state[name]
+        state['_pending'] = list(self._queue.queue)
+        return state
+
+
+    def __setstate__(self, state):
+        records = state.pop('_pending')
+        self.__dict__.update(state)
+        self._open(records)
+
+
+    def appendRecord(self, record):
+        record = list(record)
+        with self._lock:
+            if self._writer is not None:
+                self._writer.writerow(record)
+            for k, field in enumerate(self._fields):
+                if field.type in _NUMERIC and record[k] is not None:
+                    self._min[k] = record[k] if self._min[k] is None else min(self._min[k], record[k])
+                    self._max[k] = record[k] if self._max[k] is None else max(self._max[k], record[k])
+        self._queue.put(record)
+
+
+    def appendRecords(self, records, progressCB=None):
+        for record in records:
+            self.appendRecord(record)
+            if progressCB is not None:
+                progressCB()
+
+
+    def getNextRecord(self, useCache=True):
+        deadline = None if self._timeout is None else time.time() + self._timeout
+        while True:
+            # short waits, so close() and Ctrl-C are noticed
+            wait = 0.5 if deadline is None else min(0.5, deadline - time.time())
+            try:
+                record = self._queue.get(timeout=max(wait, 0))
+                break
+            except queue.Empty:
+                if self._closed or (deadline is not None and time.time() >= deadline):
+                    return None
+        self._nextRecordIdx += 1
+        self.lastRecord = record
+        return record
+
+
+    @property
+    def pending(self):
+        return self._queue.qsize()
+
+
+    def getNextRecordIdx(self):
+        return self._nextRecordIdx
+
+
+    def getBookmark(self):
+        # records taken out of the queue are gone, there is nothing to go
+        # back to
+        return None
+
+
+    def recordsExistAfter(self, bookmark):
+        return not self._queue.empty()
+
+
+    def seekFromEnd(self, numRecords):
+        raise IOError("a QueueRecordStream can not seek, the records taken are gone")
+
+
+    def getStats(self):
+        return {'min': list(self._min), 'max': list(self._max)}
+
+
+    def clearStats(self):
+        self._min = [None] * len(self._fields)
+        self._max = [None] * len(self._fields)
+
+
+    def getError(self):
+        return self._error
+
+
+    def setError(self, error):
+        self._error = error
+
+
+    def isCompleted(self):
+        return self._completed
+
+
+    def setCompleted(self, completed):
+        self._completed = completed
+
+
+    def getFieldNames(self):
+        return [field.name for field in self._fields]
+
+
+    def getFields(self):
+        return list(self._fields)
+
+
+    def setTimeout(self, timeout):
+        self._timeout = timeout
+
+
+    def flush(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.flush()
+
+
+    def close(self):
+        self._closed = True
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+                self._writer = None
@@ -6,20 +6,25 @@ Created on Sun Sep 29 22:02:49 2019
 """
 
 import os
-import datetime
-import time
 import psutil
 from htm_anomaly_detection import HTM
+from replay_clock import ReplayClock, REAL
 
 # use model or not to create a HTM instance
 model = HTM(use_saved_model = False, checkpoint_path = None, likelihood_path = None)
 #model = HTM(use_saved_model = True, checkpoint_path = 'model', likelihood_path = 'likelihood.pkl')
 
+# pace of the loop: REAL samples once a second, SCALED (CLOCK_SPEED times
+# faster) or FAST (no waiting) stamp the samples with simulated time
+CLOCK_MODE = REAL
+CLOCK_SPEED = 100
+clock = ReplayClock(CLOCK_MODE, period = 1, speed = CLOCK_SPEED)
+
 i = 1
 while True:
     cpu = psutil.cpu_percent()
     memory = psutil.virtual_memory().percent
-    timestamp = datetime.datetime.now()
+    timestamp = clock.now()
     
     anomaly_likelihood = model.run(cpu, memory, timestamp)
     
@@ -31,4 +36,4 @@ while True:
         print 'checkpoint saved.'
     i += 1
     
-    time.sleep(1)
+    clock.tick()
@@ -6,7 +6,7 @@ Created on Sun Sep 29 18:45:14 2019
 """
 
 from nupic.frameworks.opf.model_factory import ModelFactory
-from nupic.algorithms import anomaly_likelihood
+from likelihood_registry import LikelihoodRegistry
 import model_params
 
 class HTM:
@@ -18,21 +18,25 @@ class HTM:
             loop this method for iterative prediction on records 
             (see my ipynb file for the usage)
     -- save_model: save the model and states after running
+    
+    The likelihood estimator is kept in a registry (see likelihood_registry.py)
+    and fed once per record with the model's anomaly score and both fields.
     '''
     
+    MODELS = {'model': 2}
+    
     def __init__(self, use_saved_model, checkpoint_path, likelihood_path):
         self.use_saved_model = use_saved_model
         if use_saved_model:
             self.model = ModelFactory.loadFromCheckpoint(checkpoint_path)
             self.model.enableInference({'predictedField': 'cpu'})
             self.model.enableInference({'predictedField': 'memory'})
-            with open(likelihood_path, "rb") as f:
-                self.anomalyLikelihood = anomaly_likelihood.AnomalyLikelihood().readFromFile(f)
+            self.anomalyLikelihoods = LikelihoodRegistry.load(likelihood_path, self.MODELS)
         else:
             self.model = ModelFactory.create(model_params.MODEL_PARAMS)
             self.model.enableInference({'predictedField': 'cpu'})
             self.model.enableInference({'predictedField': 'memory'})
-            self.anomalyLikelihood = anomaly_likelihood.AnomalyLikelihood()
+            self.anomalyLikelihoods = LikelihoodRegistry(self.MODELS)
 
                
     def run(self, cpu, memory, timestamp):
@@ -43,13 +47,10 @@ class HTM:
                       }
         result = self.model.run(modelInput)
         anomalyScore = result.inferences['anomalyScore']
-        likelihood1 = self.anomalyLikelihood.anomalyProbability(float(cpu), anomalyScore, timestamp)
-        likelihood2 = self.anomalyLikelihood.anomalyProbability(float(memory), anomalyScore, timestamp)
-        likelihood = (likelihood1 + likelihood2)/2
+        likelihood = self.anomalyLikelihoods.anomalyProbability('model', [float(cpu), float(memory)], anomalyScore, timestamp)
         return likelihood
     
     
     def save_model(self, model_path, likelihood_path):
         self.model.save(model_path)
-        with open(likelihood_path, "wb") as f:
-            self.anomalyLikelihood.writeToFile(f)
+        self.anomalyLikelihoods.save(likelihood_path)
@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+'''
+One anomaly likelihood estimator per model, kept in a keyed registry.
+
+Every estimator only ever sees the raw anomaly scores of its own model, so
+the distribution it fits is not polluted by the other models. It has one
+channel per input field of the model: every record feeds each field's value
+with the model's anomaly score, and the likelihood of the model is the mean
+over its fields, as with the single estimator fed once per field before,
+in one call per model. The whole registry is saved and restored as one
+file. The estimators are StreamingLikelihood, the NumPy version of NuPIC's
+AnomalyLikelihood.
+
+-- LikelihoodRegistry: estimators keyed by model name
+'''
+
+import copy
+import pickle
+import numpy as np
+from nupic.algorithms import anomaly_likelihood
+from streaming_likelihood import StreamingLikelihood
+
+
+# first bytes of a registry file, older likelihood files hold a single
+# AnomalyLikelihood written by writeToFile
+_MAGIC = b"LikelihoodRegistry\n"
+_VERSION = 1
+
+
+class LikelihoodRegistry(object):
+    '''
+    -- channels: dict of model name -> number of input fields, an estimator
+                 is created for each model
+
+    -- anomalyProbability: likelihood of a model's raw anomaly score, given
+                           the values of its fields
+    -- save: pickle every estimator into one file, after a format marker
+    -- load: restore a registry saved by save(). A likelihood file of the
+             older single shared estimator is accepted as well, every model
+             then starts from a copy of it.
+    '''
+
+    def __init__(self, channels=None):
+        self.channels = dict(channels or {})
+        self.estimators = dict((key, StreamingLikelihood(count))
+                               for key, count in self.channels.items())
+
+    def anomalyProbability(self, key, values, anomalyScore, timestamp):
+        estimator = self.estimators[key]
+        if isinstance(estimator, StreamingLikelihood):
+            likelihoods = estimator.anomalyProbabilities([values], [[anomalyScore] * len(values)])
+        else:
+            # the shared estimator of an older likelihood file
+            likelihoods = [estimator.anomalyProbability(value, anomalyScore, timestamp)
+                           for value in values]
+        return float(np.mean(likelihoods))
+
+    def save(self, path):
+        with open(path, "wb") as f:
+            f.write(_MAGIC)
+            pickle.dump({"version": _VERSION, "estimators": self.estimators},
+                        f, pickle.HIGHEST_PROTOCOL)
+
+    @classmethod
+    def load(cls, path, channels=None):
+        registry = cls()
+        registry.channels = dict(channels or {})
+        with open(path, "rb") as f:
+            if f.read(len(_MAGIC)) == _MAGIC:
+                state = pickle.load(f)
+                if state["version"] != _VERSION:
+                    raise ValueError("%s: likelihood registry version %s, expected %s"
+                                     % (path, state["version"], _VERSION))
+                registry.estimators = state["estimators"]
+            else:
+                # written by AnomalyLikelihood.writeToFile before the registry
+                f.seek(0)
+                shared = anomaly_likelihood.AnomalyLikelihood.readFromFile(f)
+                registry.estimators = dict((key, copy.deepcopy(shared))
+                                           for key in registry.channels)
+        for key, count in registry.channels.items():
+            estimator = registry.estimators.get(key)
+            if estimator is None:
+                registry.estimators[key] = StreamingLikelihood(count)
+            elif isinstance(estimator, StreamingLikelihood) and estimator.channels != count:
+                raise ValueError("%s: the estimator of %s has %d fields, the model %d"
+                                 % (path, key, estimator.channels, count))
+        return registry
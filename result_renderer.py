@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+'''
+Live matplotlib dashboard running in its own process.
+
+The HTM loop only scores records and publishes the results into a queue. The
+renderer process drains that queue and redraws at a fixed frame rate by
+updating the data of Line2D artists and table cells that are created once,
+instead of rebuilding every subplot and table on every record. The history of
+every channel lives in a fixed-size ring buffer, so memory and redraw cost stay
+flat however long the furnace runs.
+
+-- ResultRenderer: start/stop the renderer process and publish results
+'''
+
+import time
+import multiprocessing
+import numpy as np
+try:
+    import Queue as queue
+except ImportError:
+    import queue
+
+from ring_buffer import RingBufferStore
+
+
+def _createTable(figure, rows, cols, spec):
+    ax = figure.add_subplot(rows, cols, spec["position"])
+    num_cols = len(spec["colLabels"])
+    table = ax.table(
+            cellText = [[' '] * num_cols for _ in range(spec["rows"])],
+            cellColours = [['w'] * num_cols for _ in range(spec["rows"])],
+            cellLoc = 'center',
+            colLabels = spec["colLabels"],
+            bbox = spec["bbox"]
+            )
+    table.scale(spec["scale"], spec["scale"])
+    ax.axis("off")
+
+    for key, cell in table.get_celld().items():
+        cell.set_linewidth(0.5)
+    return table
+
+
+def _updateTable(table, content, colours):
+    cells = table.get_celld()
+    for row, values in enumerate(content):
+        for col, value in enumerate(values):
+            # row 0 holds the column labels
+            cells[(row + 1, col)].get_text().set_text(str(value))
+            if colours is not None and colours[row][col]:
+                cells[(row + 1, col)].set_facecolor(colours[row][col])
+
+
+def _renderLoop(results, layout, buffer_size, fps):
+    # pyplot is only ever imported in the renderer process
+    import matplotlib.pyplot as plt
+
+    figure = plt.figure(layout["name"], figsize=layout["figsize"])
+    figure.subplots_adjust(wspace =1, hspace =0.5)
+    rows, cols = layout["grid"]
+
+    store = RingBufferStore(buffer_size)
+    store.addChannel("_record", np.int64)
+    lines = []
+    for panel in layout["panels"]:
+        ax = figure.add_subplot(rows, cols, panel["position"])
+        ax.set_xticks([])
+        ax.set_title(panel["title"])
+        for channel, style, width in panel["lines"]:
+            store.addChannel(channel)
+            line, = ax.plot([], [], style, linewidth=width)
+            lines.append((ax, line, channel))
+
+    tables = dict((spec["name"], _createTable(figure, rows, cols, spec))
+                  for spec in layout.get("tables", []))
+    plt.show(block=False)
+
+    interval = 1.0 / fps
+    table_updates = {}
+    closed = False
+    while not closed:
+        deadline = time.time() + interval
+        updated = False
+        # drain everything that arrived during this frame
+        while True:
+            timeout = deadline - time.time()
+            if timeout <= 0:
+                break
+            try:
+                result = results.get(timeout=timeout)
+            except queue.Empty:
+                break
+            if result is None:
+                closed = True
+                break
+            record, values, table_content = result
+            values["_record"] = record
+            store.append(values)
+            table_updates.update(table_content)
+            updated = True
+
+        if updated:
+            # windows are views into the ring buffers, nothing is copied here
+            for ax, line, channel in lines:
+                line.set_data(store.window("_record"), store.window(channel))
+            for ax in set(ax for ax, _, _ in lines):
+                ax.relim()
+                ax.autoscale_view()
+            for name, (content, colours) in table_updates.items():
+                _updateTable(tables[name], content, colours)
+            table_updates = {}
+            figure.canvas.draw_idle()
+        plt.pause(1e-3)
+
+    plt.close(figure)
+
+
+class ResultRenderer(object):
+    '''
+    Draw the results published by the HTM loop in a separate process.
+
+    -- layout: figure description with the keys
+               "name", "figsize", "grid" (rows, cols),
+               "panels": [{"position", "title", "lines": [(channel, style, linewidth)]}],
+               "tables": [{"name", "position", "colLabels", "rows", "bbox", "scale"}]
+    -- buffer_size: number of records kept on screen per channel
+    -- fps: redraw rate of the figure
+    -- queue_size: results waiting to be drawn. If the renderer falls behind,
+                   new results are dropped rather than blocking the HTM loop.
+
+    -- start: start the renderer process
+    -- publish: hand over the channel values (and table contents) of a record
+    -- close: draw what is left and stop the renderer process
+    '''
+
+    def __init__(self, layout, buffer_size=500, fps=5, queue_size=10000):
+        self.layout = layout
+        self.buffer_size = buffer_size
+        self.fps = fps
+        self.dropped = 0
+        self._results = multiprocessing.Queue(queue_size)
+        self._process = None
+
+    def start(self):
+        self._process = multiprocessing.Process(
+            target=_renderLoop,
+            args=(self._results, self.layout, self.buffer_size, self.fps))
+        self._process.daemon = True
+        self._process.start()
+        return self
+
+    def publish(self, record, values, tables=None):
+        '''
+        -- record: index of the record, used as the x axis
+        -- values: dict of channel name -> value
+        -- tables: dict of table name -> (cellText, cellColours or None).
+                   The rows are copied, callers may keep mutating them.
+        '''
+        tables = dict((name, ([list(row) for row in content],
+                              None if colours is None else [list(row) for row in colours]))
+                      for name, (content, colours) in (tables or {}).items())
+        try:
+            self._results.put_nowait((record, values, tables))
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self):
+        if self._process is None:
+            return
+        self._results.put(None)
+        self._process.join()
+        self._process = None
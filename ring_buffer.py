@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+'''
+Fixed-capacity time-series store backed by NumPy ring buffers.
+
+Every value is written twice, at its slot and at slot + capacity, so the
+last n values are always one contiguous slice of the backing array. Appends
+are O(1) and a window is a view into the buffer, never a copy, no matter
+how long the furnace has been running.
+
+-- RingBuffer: one channel
+-- RingBufferStore: channels keyed by name, all sharing one capacity
+'''
+
+import numpy as np
+
+
+class RingBuffer(object):
+    '''
+    -- append: add one value, dropping the oldest one when full
+    -- view: read-only view of the last `size` values (all by default),
+             oldest first
+    '''
+
+    def __init__(self, capacity, dtype=np.float64):
+        self.capacity = capacity
+        self._data = np.zeros(2 * capacity, dtype=dtype)
+        self._head = 0
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    def append(self, value):
+        self._data[self._head] = value
+        self._data[self._head + self.capacity] = value
+        self._head = (self._head + 1) % self.capacity
+        if self._count < self.capacity:
+            self._count += 1
+
+    def view(self, size=None):
+        if size is None or size > self._count:
+            size = self._count
+        end = self._head + self.capacity
+        window = self._data[end - size:end]
+        window.flags.writeable = False
+        return window
+
+    def last(self):
+        return self._data[self._head + self.capacity - 1]
+
+
+class RingBufferStore(object):
+    '''
+    A set of named ring buffers that grow record by record.
+
+    -- addChannel: create a channel, float64 unless told otherwise
+    -- append: append one record, given as a dict of channel -> value.
+               Channels missing from the record get `fill`.
+    -- window: view of the last `size` values of a channel
+    '''
+
+    def __init__(self, capacity, channels=(), fill=np.nan):
+        self.capacity = capacity
+        self.fill = fill
+        self._buffers = {}
+        for name in channels:
+            self.addChannel(name)
+
+    def __len__(self):
+        if not self._buffers:
+            return 0
+        return len(next(iter(self._buffers.values())))
+
+    def __contains__(self, name):
+        return name in self._buffers
+
+    @property
+    def channels(self):
+        return list(self._buffers.keys())
+
+    def addChannel(self, name, dtype=np.float64):
+        if name not in self._buffers:
+            self._buffers[name] = RingBuffer(self.capacity, dtype)
+        return self._buffers[name]
+
+    def append(self, values):
+        for name, buffer in self._buffers.items():
+            buffer.append(values.get(name, self.fill))
+
+    def window(self, name, size=None):
+        return self._buffers[name].view(size)
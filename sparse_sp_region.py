@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+'''
+SPRegion that can run the NumPy spatial pooler.
+
+With "spatialImp": "sparse" in the SP parameters the region computes with
+SparseSpatialPooler (sparse_spatial_pooler.py) instead of NuPIC's C++ or
+Python pooler; the other parameters are the usual SPRegion ones. Any other
+spatialImp behaves exactly like SPRegion. network_factory.py registers the
+region, so saved networks that use it load as well.
+
+-- SparseSPRegion: the region, "py.SparseSPRegion" in a network
+'''
+
+from nupic.regions.sp_region import SPRegion
+from sparse_spatial_pooler import SparseSpatialPooler
+
+
+class SparseSPRegion(SPRegion):
+    '''
+    -- spatialImp: "sparse" for SparseSpatialPooler, else as in SPRegion
+    '''
+
+    def __init__(self, columnCount, inputWidth, spatialImp="sparse", **kwargs):
+        sparse = spatialImp == "sparse"
+        # the parameters of the sparse pooler are those of the Python one
+        SPRegion.__init__(self, columnCount, inputWidth,
+                          spatialImp="py" if sparse else spatialImp, **kwargs)
+        if sparse:
+            self.spatialImp = spatialImp
+            self.SpatialClass = SparseSpatialPooler
+
+    def _allocateSpatialFDR(self, rfInput):
+        if self._sfdr or self.SpatialClass is not SparseSpatialPooler:
+            return SPRegion._allocateSpatialFDR(self, rfInput)
+        autoArgs = dict((name, getattr(self, name)) for name in self._spatialArgNames)
+        autoArgs['columnDimensions'] = [self.columnCount]
+        autoArgs['inputDimensions'] = [self.inputWidth]
+        autoArgs['potentialRadius'] = self.inputWidth
+        self._sfdr = SparseSpatialPooler(**autoArgs)
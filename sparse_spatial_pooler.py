@@ -0,0 +1,416 @@
+# -*- coding: utf-8 -*-
+'''
+Spatial pooler in pure NumPy, with sparse index arrays.
+
+SparseSpatialPooler follows NuPIC's SpatialPooler for the configurations
+used here: a global potential pool of potentialPct of the inputs per
+column, global inhibition of numActiveColumnsPerInhArea winners, permanence
+learning with synPermActiveInc / synPermInactiveDec around synPermConnected,
+duty cycles, bumping of weak columns and boosting. It takes the same
+constructor arguments and has the same compute(inputVector, learn,
+activeArray) contract, so it can stand in for the C++ pooler
+(see sparse_sp_region.py) on hosts where the C++ build is not available.
+
+The potential pools are a (columns x potential) array of input indices with
+their permanences next to them, and the connected synapses are kept as an
+(inputs x columns) mask updated only for the columns that learned. The
+overlap of a record is then a gather over its few active input bits, the
+k winners are found with a partition instead of a full sort, and learning
+touches the winner columns alone. With learning off, computeBatch() scores
+a whole (records x inputs) batch with one matrix product. The random
+initialisation is NumPy's, so the columns differ from those of the C++
+pooler with the same seed, not their behaviour.
+
+Run this file to time it against the NuPIC pooler, when that is installed.
+
+-- SparseSpatialPooler: the spatial pooler
+'''
+
+import numpy as np
+
+
+# same constants as NuPIC's SpatialPooler
+_PERMANENCE_EPSILON = 0.000001
+_SYN_PERM_MAX = 1.0
+_INIT_CONNECTED_PCT = 0.5
+_UPDATE_PERIOD = 50
+
+# records of a batch scored together, larger blocks fall out of the cache
+_BATCH_ROWS = 128
+
+
+class SparseSpatialPooler(object):
+    '''
+    -- inputDimensions, columnDimensions: the inputs and columns, flattened
+    -- potentialRadius: must cover every input, the pool is global
+    -- potentialPct: part of the inputs in the potential pool of a column
+    -- globalInhibition: must be True
+    -- localAreaDensity, numActiveColumnsPerInhArea: number of winners, the
+                                                     density is used when
+                                                     the count is <= 0
+    -- stimulusThreshold: smallest overlap of a winner
+    -- synPermInactiveDec, synPermActiveInc, synPermConnected: learning
+    -- minPctOverlapDutyCycle, dutyCyclePeriod, boostStrength: homeostasis
+    -- seed: seed of the initialisation, -1 for a random one
+
+    -- compute: winners of one input vector, learning if learn, written to
+                activeArray as 0 / 1
+    -- computeBatch: winners of every row of a (records x inputs) array,
+                     without learning, as a (records x columns) array
+    '''
+
+    def __init__(self,
+                 inputDimensions=(32, 32),
+                 columnDimensions=(64, 64),
+                 potentialRadius=16,
+                 potentialPct=0.5,
+                 globalInhibition=False,
+                 localAreaDensity=-1.0,
+                 numActiveColumnsPerInhArea=10.0,
+                 stimulusThreshold=0,
+                 synPermInactiveDec=0.008,
+                 synPermActiveInc=0.05,
+                 synPermConnected=0.10,
+                 minPctOverlapDutyCycle=0.001,
+                 dutyCyclePeriod=1000,
+                 boostStrength=0.0,
+                 seed=-1,
+                 spVerbosity=0,
+                 wrapAround=True):
+        self._numInputs = int(np.prod(inputDimensions))
+        self._numColumns = int(np.prod(columnDimensions))
+        if not globalInhibition:
+            raise ValueError("SparseSpatialPooler only has global inhibition")
+        if potentialRadius < self._numInputs:
+            raise ValueError("SparseSpatialPooler only has a global potential pool, "
+                             "potentialRadius must be >= the number of inputs")
+        if numActiveColumnsPerInhArea > 0:
+            self._numActive = min(int(numActiveColumnsPerInhArea), self._numColumns)
+        else:
+            self._numActive = max(int(localAreaDensity * self._numColumns), 1)
+        self._inputDimensions = list(np.atleast_1d(inputDimensions))
+        self._columnDimensions = list(np.atleast_1d(columnDimensions))
+        self._potentialRadius = potentialRadius
+        self._potentialPct = potentialPct
+        self._globalInhibition = True
+        self._localAreaDensity = localAreaDensity
+        self._numActiveColumnsPerInhArea = numActiveColumnsPerInhArea
+        self._stimulusThreshold = stimulusThreshold
+        self._synPermInactiveDec = synPermInactiveDec
+        self._synPermActiveInc = synPermActiveInc
+        self._synPermConnected = synPermConnected
+        self._synPermBelowStimulusInc = synPermConnected / 10.0
+        self._synPermTrimThreshold = synPermActiveInc / 2.0
+        self._minPctOverlapDutyCycles = minPctOverlapDutyCycle
+        self._dutyCyclePeriod = dutyCyclePeriod
+        self._boostStrength = boostStrength
+        self._spVerbosity = spVerbosity
+        self._wrapAround = wrapAround
+        self._seed = seed
+        self._iterationNum = 0
+        self._iterationLearnNum = 0
+
+        self._random = np.random.RandomState(seed if seed >= 0 else None)
+        numPotential = int(round(potentialPct * self._numInputs))
+        # the numPotential inputs of every column, sorted
+        order = np.argsort(self._random.rand(self._numColumns, self._numInputs), axis=1)
+        self._pools = np.sort(order[:, :numPotential], axis=1).astype(np.intp)
+
+        connected = self._random.rand(self._numColumns, numPotential) <= _INIT_CONNECTED_PCT
+        draw = self._random.rand(self._numColumns, numPotential)
+        permanences = np.where(connected,
+                               synPermConnected + (_SYN_PERM_MAX - synPermConnected) * draw,
+                               synPermConnected * draw)
+        # no more precision than NuPIC's initial permanences
+        self._permanences = (np.floor(permanences * 100000) / 100000.0).astype(np.float32)
+        self._permanences[self._permanences < self._synPermTrimThreshold] = 0
+
+        # input-major, the rows of the active inputs of a record are contiguous
+        self._connected = np.zeros((self._numInputs, self._numColumns), dtype=bool)
+        self._poolConnected = np.zeros(self._pools.shape, dtype=bool)
+        self._connectedCounts = np.zeros(self._numColumns, dtype=np.int32)
+        self._updatePermanences(np.arange(self._numColumns), raisePerm=True)
+
+        self._overlapDutyCycles = np.zeros(self._numColumns, dtype=np.float32)
+        self._activeDutyCycles = np.zeros(self._numColumns, dtype=np.float32)
+        self._minOverlapDutyCycles = np.zeros(self._numColumns, dtype=np.float32)
+        self._boostFactors = np.ones(self._numColumns, dtype=np.float32)
+        self._overlaps = np.zeros(self._numColumns, dtype=np.float32)
+        self._boostedOverlaps = np.zeros(self._numColumns, dtype=np.float32)
+
+    def _updatePermanences(self, columns, raisePerm=False):
+        # trim, clip and raise the permanences of some columns, then refresh
+        # their connected synapses
+        permanences = self._permanences[columns]
+        permanences *= permanences >= self._synPermTrimThreshold
+        np.clip(permanences, 0, _SYN_PERM_MAX, out=permanences)
+        connected = permanences >= self._synPermConnected - _PERMANENCE_EPSILON
+        if raisePerm:
+            weak = connected.sum(axis=1) < self._stimulusThreshold
+            while weak.any():
+                permanences[weak] += self._synPermBelowStimulusInc
+                connected = permanences >= self._synPermConnected - _PERMANENCE_EPSILON
+                weak = connected.sum(axis=1) < self._stimulusThreshold
+        self._permanences[columns] = permanences
+        # a learning step moves few synapses across the threshold, only
+        # those are written to the mask
+        rows, synapses = np.nonzero(connected != self._poolConnected[columns])
+        self._connected[self._pools[columns[rows], synapses], columns[rows]] = connected[rows, synapses]
+        self._poolConnected[columns] = connected
+        self._connectedCounts[columns] = connected.sum(axis=1)
+
+    def _inhibit(self, overlaps):
+        # the numActive largest overlaps; of equal ones the last columns win,
+        # like NuPIC's stable sort
+        count = self._numColumns - self._numActive
+        kth = np.partition(overlaps, count)[count]
+        winners = np.flatnonzero(overlaps > kth)
+        ties = np.flatnonzero(overlaps == kth)
+        winners = np.concatenate([winners, ties[len(ties) - (self._numActive - len(winners)):]])
+        winners = winners[overlaps[winners] >= self._stimulusThreshold]
+        winners.sort()
+        return winners
+
+    def _inhibitBatch(self, overlaps):
+        # overlaps without boosting are whole numbers, so overlap * columns +
+        # column orders the columns with the same ties as _inhibit
+        count = self._numColumns - self._numActive
+        keys = overlaps.astype(np.float64) * self._numColumns + np.arange(self._numColumns)
+        winners = np.argpartition(keys, count, axis=1)[:, count:]
+        rows = np.arange(len(overlaps))[:, None]
+        active = np.zeros(overlaps.shape, dtype=bool)
+        active[rows, winners] = overlaps[rows, winners] >= self._stimulusThreshold
+        return active
+
+    def _activeInputs(self, inputVector):
+        inputVector = np.asarray(inputVector).reshape(-1)
+        if inputVector.size != self._numInputs:
+            raise ValueError("input vector of %d bits, the pooler has %d inputs"
+                             % (inputVector.size, self._numInputs))
+        return inputVector, np.flatnonzero(inputVector)
+
+    def compute(self, inputVector, learn, activeArray):
+        self._iterationNum += 1
+        if learn:
+            self._iterationLearnNum += 1
+        inputVector, activeInputs = self._activeInputs(inputVector)
+
+        overlaps = self._connected[activeInputs].sum(axis=0, dtype=np.int32).astype(np.float32)
+        overlaps[overlaps < self._stimulusThreshold] = 0
+        self._overlaps = overlaps
+        if learn:
+            self._boostedOverlaps = self._boostFactors * overlaps
+        else:
+            self._boostedOverlaps = overlaps
+        winners = self._inhibit(self._boostedOverlaps)
+
+        if learn:
+            self._adaptSynapses(inputVector != 0, winners)
+            self._updateDutyCycles(overlaps, winners)
+            self._bumpUpWeakColumns()
+            self._updateBoostFactors()
+            if self._iterationNum % _UPDATE_PERIOD == 0:
+                self._updateMinDutyCycles()
+
+        activeArray.fill(0)
+        activeArray[winners] = 1
+        return winners
+
+    def computeBatch(self, inputVectors):
+        inputVectors = np.asarray(inputVectors)
+        inputVectors = inputVectors.reshape(inputVectors.shape[0], -1)
+        if inputVectors.shape[1] != self._numInputs:
+            raise ValueError("input vectors of %d bits, the pooler has %d inputs"
+                             % (inputVectors.shape[1], self._numInputs))
+        self._iterationNum += len(inputVectors)
+        connected = self._connected.astype(np.float32)
+        activeArrays = np.zeros((len(inputVectors), self._numColumns), dtype=np.uint32)
+        for start in range(0, len(inputVectors), _BATCH_ROWS):
+            block = inputVectors[start:start + _BATCH_ROWS]
+            overlaps = np.dot((block != 0).astype(np.float32), connected)
+            overlaps[overlaps < self._stimulusThreshold] = 0
+            activeArrays[start:start + len(block)] = self._inhibitBatch(overlaps)
+        return activeArrays
+
+    def _adaptSynapses(self, activeInputs, winners):
+        activeSynapses = activeInputs.take(self._pools[winners])
+        self._permanences[winners] += (activeSynapses * np.float32(self._synPermActiveInc + self._synPermInactiveDec)
+                                       - np.float32(self._synPermInactiveDec))
+        self._updatePermanences(winners, raisePerm=True)
+
+    def _updateDutyCycles(self, overlaps, winners):
+        period = min(self._dutyCyclePeriod, self._iterationNum)
+        active = np.zeros(self._numColumns, dtype=np.float32)
+        active[winners] = 1
+        self._overlapDutyCycles = (self._overlapDutyCycles * (period - 1) + (overlaps > 0)) / period
+        self._activeDutyCycles = (self._activeDutyCycles * (period - 1) + active) / period
+
+    def _bumpUpWeakColumns(self):
+        weak = np.flatnonzero(self._overlapDutyCycles < self._minOverlapDutyCycles)
+        if len(weak):
+            self._permanences[weak] += self._synPermBelowStimulusInc
+            self._updatePermanences(weak)
+
+    def _updateBoostFactors(self):
+        targetDensity = float(self._numActive) / self._numColumns
+        self._boostFactors = np.exp((targetDensity - self._activeDutyCycles) *
+                                    self._boostStrength).astype(np.float32)
+
+    def _updateMinDutyCycles(self):
+        self._minOverlapDutyCycles.fill(self._minPctOverlapDutyCycles *
+                                        self._overlapDutyCycles.max())
+
+    # accessors of NuPIC's SpatialPooler used by SPRegion
+
+    def getNumColumns(self):
+        return self._numColumns
+
+    def getNumInputs(self):
+        return self._numInputs
+
+    def getColumnDimensions(self):
+        return self._columnDimensions
+
+    def getInputDimensions(self):
+        return self._inputDimensions
+
+    def getPotentialRadius(self):
+        return self._potentialRadius
+
+    def getPotentialPct(self):
+        return self._potentialPct
+
+    def getGlobalInhibition(self):
+        return self._globalInhibition
+
+    def getNumActiveColumnsPerInhArea(self):
+        return self._numActiveColumnsPerInhArea
+
+    def getLocalAreaDensity(self):
+        return self._localAreaDensity
+
+    def getStimulusThreshold(self):
+        return self._stimulusThreshold
+
+    def getSynPermActiveInc(self):
+        return self._synPermActiveInc
+
+    def setSynPermActiveInc(self, synPermActiveInc):
+        self._synPermActiveInc = synPermActiveInc
+        self._synPermTrimThreshold = synPermActiveInc / 2.0
+
+    def getSynPermInactiveDec(self):
+        return self._synPermInactiveDec
+
+    def setSynPermInactiveDec(self, synPermInactiveDec):
+        self._synPermInactiveDec = synPermInactiveDec
+
+    def getSynPermConnected(self):
+        return self._synPermConnected
+
+    def getMinPctOverlapDutyCycles(self):
+        return self._minPctOverlapDutyCycles
+
+    def setMinPctOverlapDutyCycles(self, minPctOverlapDutyCycle):
+        self._minPctOverlapDutyCycles = minPctOverlapDutyCycle
+
+    def getDutyCyclePeriod(self):
+        return self._dutyCyclePeriod
+
+    def setDutyCyclePeriod(self, dutyCyclePeriod):
+        self._dutyCyclePeriod = dutyCyclePeriod
+
+    def getBoostStrength(self):
+        return self._boostStrength
+
+    def setBoostStrength(self, boostStrength):
+        self._boostStrength = boostStrength
+
+    def getSpVerbosity(self):
+        return self._spVerbosity
+
+    def setSpVerbosity(self, spVerbosity):
+        self._spVerbosity = spVerbosity
+
+    def getWrapAround(self):
+        return self._wrapAround
+
+    def getIterationNum(self):
+        return self._iterationNum
+
+    def getIterationLearnNum(self):
+        return self._iterationLearnNum
+
+    def getBoostFactors(self, boostFactors):
+        boostFactors[:] = self._boostFactors
+
+    def getOverlapDutyCycles(self, overlapDutyCycles):
+        overlapDutyCycles[:] = self._overlapDutyCycles
+
+    def getActiveDutyCycles(self, activeDutyCycles):
+        activeDutyCycles[:] = self._activeDutyCycles
+
+    def getMinOverlapDutyCycles(self, minOverlapDutyCycles):
+        minOverlapDutyCycles[:] = self._minOverlapDutyCycles
+
+    def getConnectedCounts(self, connectedCounts):
+        connectedCounts[:] = self._connectedCounts
+
+    def getOverlaps(self):
+        return self._overlaps
+
+    def getBoostedOverlaps(self):
+        return self._boostedOverlaps
+
+
+if __name__ == '__main__':
+    import time
+
+    # encodings like the chemical networks: one scalar encoder (n=50, w=21)
+    # and the time of day (w=21) of the date encoder
+    SCALAR_N, TIME_N, W = 50, 300, 21
+    RECORDS = 1000
+
+    def encoding(k):
+        vector = np.zeros(SCALAR_N + TIME_N, dtype=np.uint32)
+        start = int((np.sin(k / 20.0) + 1) / 2 * (SCALAR_N - W))
+        vector[start:start + W] = 1
+        start = SCALAR_N + (k * 7) % (TIME_N - W)
+        vector[start:start + W] = 1
+        return vector
+
+    inputs = np.array([encoding(k) for k in range(RECORDS)])
+    params = dict(inputDimensions=[inputs.shape[1]], columnDimensions=[2048],
+                  potentialRadius=inputs.shape[1], potentialPct=0.8, globalInhibition=True,
+                  numActiveColumnsPerInhArea=40, synPermConnected=0.1,
+                  synPermActiveInc=0.0001, synPermInactiveDec=0.0005, boostStrength=0.0,
+                  seed=1956)
+
+    def timePooler(name, pooler, batch):
+        active = np.zeros(2048, dtype=np.uint32)
+        start = time.time()
+        for vector in inputs:
+            pooler.compute(vector, True, active)
+        learning = (time.time() - start) / RECORDS
+        start = time.time()
+        for vector in inputs:
+            pooler.compute(vector, False, active)
+        inference = (time.time() - start) / RECORDS
+        line = '%-20s learn %7.1f us  infer %7.1f us' % (name, learning * 1e6, inference * 1e6)
+        if batch:
+            start = time.time()
+            pooler.computeBatch(inputs)
+            line += '  batch infer %7.1f us' % ((time.time() - start) / RECORDS * 1e6)
+        print(line + '  per record')
+
+    timePooler('SparseSpatialPooler', SparseSpatialPooler(**params), True)
+    try:
+        from nupic.bindings.algorithms import SpatialPooler as CPPSpatialPooler
+        timePooler('NuPIC cpp', CPPSpatialPooler(**params), False)
+    except ImportError:
+        print('NuPIC cpp SpatialPooler not installed')
+    try:
+        from nupic.algorithms.spatial_pooler import SpatialPooler as PYSpatialPooler
+        timePooler('NuPIC py', PYSpatialPooler(**params), False)
+    except ImportError:
+        print('NuPIC py SpatialPooler not installed')
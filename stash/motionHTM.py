@@ -1,19 +1,22 @@
 #!/usr/bin/env python
 # coding: utf-8
 
-import matplotlib.pyplot as plt
-
+import os
+import sys
 import csv
 from itertools import islice
 import json
-import time
-from datetime import datetime
 import numpy as np
 
 from nupic.data.file_record_stream import FileRecordStream
 from nupic.engine import Network
 from nupic.encoders import MultiEncoder, ScalarEncoder, DateEncoder
 
+# the shared helpers live in the repository root
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from result_renderer import ResultRenderer
+from episode_tracker import EpisodeTracker, parseTimestamps
+
 
 def createTemporalAnomaly_acc(recordParams, spatialParams, temporalParams, verbosity):
 
@@ -166,12 +169,6 @@ def mean(numbers):
     return float(sum(numbers)) / max(len(numbers), 1)
 
 
-def seconds_difference(date_str1, date_str2):
-    date1 = datetime.strptime(date_str1, '%Y-%m-%d %H:%M:%S')
-    date2 = datetime.strptime(date_str2, '%Y-%m-%d %H:%M:%S')
-    return float((date2 - date1).total_seconds())
-
-
 def getDate(recordParams, total):
     inputFilePath = recordParams["inputFilePath"]
     date = []
@@ -186,30 +183,7 @@ def getDate(recordParams, total):
     return date
 
 
-def plot_acc_data(x, y, z, date, buffer_size=100):
-    if len(x) > buffer_size and len(y) > buffer_size and len(z) > buffer_size:
-        new_x = x[-buffer_size:]
-        new_y = y[-buffer_size:]
-        new_z = z[-buffer_size:]
-        new_date = date[-buffer_size:]
-        return new_x, new_y, new_z, new_date
-    else:        
-        return x, y, z, date
-
-    
-def plot_qua_data(w, x, y, z, date, buffer_size=100):
-    if len(w) > buffer_size and len(x) > buffer_size and len(y) > buffer_size and len(z) > buffer_size:
-        new_w = w[-buffer_size:]
-        new_x = x[-buffer_size:]
-        new_y = y[-buffer_size:]
-        new_z = z[-buffer_size:]
-        new_date = date[-buffer_size:]
-        return new_w, new_x, new_y, new_z, new_date
-    else:        
-        return w, x, y, z, date
-
-	  
-def runNetwork(network1, network2, network3, network4, date1, date2, date3, date4):
+def runNetwork(network1, network2, network3, network4, date1, date2, date3, date4, renderer=None):
     sensorRegion1 = network1.regions["sensor"]
     temporalPoolerRegion1 = network1.regions["temporalPoolerRegion"]
 
@@ -222,48 +196,22 @@ def runNetwork(network1, network2, network3, network4, date1, date2, date3, date
     sensorRegion4 = network4.regions["sensor"]
     temporalPoolerRegion4 = network4.regions["temporalPoolerRegion"]
 	
-    date = []
-    pepa_acc_plot_x = []
-    pepa_acc_plot_y = []
-    pepa_acc_plot_z = []
-    salt_acc_plot_x = []
-    salt_acc_plot_y = []
-    salt_acc_plot_z = []    
-    pepa_qua_plot_w = []
-    pepa_qua_plot_x = []
-    pepa_qua_plot_y = []
-    pepa_qua_plot_z = []
-    salt_qua_plot_w = []
-    salt_qua_plot_x = []
-    salt_qua_plot_y = []
-    salt_qua_plot_z = []
-    
-    table_content = [[' ', ' ', ' '],[' ', ' ', ' '],[' ', ' ', ' '],[' ', ' ', ' ']]
+    episodes = EpisodeTracker(max_episodes=4)
+    times = parseTimestamps(date1[:_NUM_RECORDS])
     previous_result = 'G'
-    contineous_flag = False
 
-    plot = plt.figure("Outotec Motion Anomaly Detection", figsize=(28, 6))
-    plot.subplots_adjust(wspace =1, hspace =0.5)
-    plot.subplots(ncols=2, nrows=3)
-    
     for i in xrange(_NUM_RECORDS):
         network1.run(1)
         anomalyScore1 = temporalPoolerRegion1.getOutputData("anomalyScore")[0]
         pre1_1 = sensorRegion1.getOutputData("sourceOut")[0]
         pre2_1 = sensorRegion1.getOutputData("sourceOut")[1]
         pre3_1 = sensorRegion1.getOutputData("sourceOut")[2]
-        pepa_acc_plot_x.append(pre1_1)
-        pepa_acc_plot_y.append(pre2_1)
-        pepa_acc_plot_z.append(pre3_1)
 		
         network2.run(1)
         anomalyScore2 = temporalPoolerRegion2.getOutputData("anomalyScore")[0]
         pre1_2 = sensorRegion2.getOutputData("sourceOut")[0]
         pre2_2 = sensorRegion2.getOutputData("sourceOut")[1]
         pre3_2 = sensorRegion2.getOutputData("sourceOut")[2]
-        salt_acc_plot_x.append(pre1_2)
-        salt_acc_plot_y.append(pre2_2)
-        salt_acc_plot_z.append(pre3_2)
 
         network3.run(1)
         anomalyScore3 = temporalPoolerRegion3.getOutputData("anomalyScore")[0]
@@ -271,10 +219,6 @@ def runNetwork(network1, network2, network3, network4, date1, date2, date3, date
         pre2_3 = sensorRegion3.getOutputData("sourceOut")[1]
         pre3_3 = sensorRegion3.getOutputData("sourceOut")[2]
         pre4_3 = sensorRegion3.getOutputData("sourceOut")[3]
-        pepa_qua_plot_w.append(pre1_3)
-        pepa_qua_plot_x.append(pre2_3)
-        pepa_qua_plot_y.append(pre3_3)
-        pepa_qua_plot_z.append(pre4_3)
         
         network4.run(1)
         anomalyScore4 = temporalPoolerRegion4.getOutputData("anomalyScore")[0]
@@ -282,15 +226,9 @@ def runNetwork(network1, network2, network3, network4, date1, date2, date3, date
         pre2_4 = sensorRegion4.getOutputData("sourceOut")[1]
         pre3_4 = sensorRegion4.getOutputData("sourceOut")[2]
         pre4_4 = sensorRegion4.getOutputData("sourceOut")[3]
-        salt_qua_plot_w.append(pre1_4)
-        salt_qua_plot_x.append(pre2_4)
-        salt_qua_plot_y.append(pre3_4)
-        salt_qua_plot_z.append(pre4_4)
         
         average_anomalyScore = mean([anomalyScore1, anomalyScore2, anomalyScore3, anomalyScore4])
         
-        date.append(date1[i])
-        		
         print "Date: ", date1[i], "  PEPA ACC:", anomalyScore1, "  PEPA QUA:", anomalyScore3, "  SALT ACC:", anomalyScore2, "  SALT QUA", anomalyScore4
         print "    --> PEPA_ACC: ", (pre1_1, pre2_1, pre3_1)
         print "        SALT_ACC: ", (pre1_2, pre2_2, pre3_2)
@@ -303,158 +241,30 @@ def runNetwork(network1, network2, network3, network4, date1, date2, date3, date
             print "        \033[1;43m WARNING CAUTION \033[0m"
             previous_result = 'W'
         else:
-            if previous_result == 'D':
-                contineous_flag = True
-            else:
-                contineous_flag = False
-
-            if table_content[0][0] == ' ' and contineous_flag == False:
-                table_content[0][0] = date1[i]
-                table_content[0][1] = average_anomalyScore
-                table_content[0][2] = float(0)
-            elif table_content[1][0] == ' ' and contineous_flag == False:
-                table_content[1][0] = date1[i]
-                table_content[1][1] = average_anomalyScore
-                table_content[1][2] = float(0)
-            elif table_content[2][0] == ' ' and contineous_flag == False:
-                table_content[2][0] = date1[i]
-                table_content[2][1] = average_anomalyScore
-                table_content[2][2] = float(0)
-            elif table_content[3][0] == ' ' and contineous_flag == False:
-                table_content[3][0] = date1[i]
-                table_content[3][1] = average_anomalyScore
-                table_content[3][2] = float(0)         
-            elif table_content[1][0] == ' ' and contineous_flag == True:
-                table_content[0][0] = date1[i]
-                table_content[0][1] = average_anomalyScore
-                table_content[0][2] += seconds_difference(date1[i-1], date1[i])
-            elif table_content[2][0] == ' ' and contineous_flag == True:
-                table_content[1][0] = date1[i]
-                table_content[1][1] = average_anomalyScore
-                table_content[1][2] += seconds_difference(date1[i-1], date1[i])
-            elif table_content[3][0] == ' ' and contineous_flag == True:
-                table_content[2][0] = date1[i]
-                table_content[2][1] = average_anomalyScore
-                table_content[2][2] += seconds_difference(date1[i-1], date1[i])
-            elif table_content[0][0] != ' ' and table_content[1][0] != ' ' and table_content[2][0] != ' ' and table_content[3][0] != ' ' and contineous_flag == False:
-                table_content[0][0] = table_content[1][0]
-                table_content[0][1] = table_content[1][1]
-                table_content[0][2] = table_content[1][2]
-                
-                table_content[1][0] = table_content[2][0]
-                table_content[1][1] = table_content[2][1]
-                table_content[1][2] = table_content[2][2]
-                
-                table_content[2][0] = table_content[3][0]
-                table_content[2][1] = table_content[3][1]
-                table_content[2][2] = table_content[3][2]
-                
-                table_content[3][0] = date1[i]
-                table_content[3][1] = average_anomalyScore
-                table_content[3][2] = 0
-            elif table_content[0][0] != ' ' and table_content[1][0] != ' ' and table_content[2][0] != ' ' and table_content[3][0] != ' ' and contineous_flag == True:                
-                table_content[3][0] = date1[i]
-                table_content[3][1] = average_anomalyScore
-                table_content[3][2] += seconds_difference(date1[i-1], date1[i])   
             print "        \033[1;41m DANGEROUS CONDITION \033[0m"
             previous_result = 'D'
         print "\n"
         
-        plt_pepa_acc_x, plt_pepa_acc_y, plt_pepa_acc_z, plt_date_pepa_acc = plot_acc_data(pepa_acc_plot_x, pepa_acc_plot_y, pepa_acc_plot_z, date)
-        plt_salt_acc_x, plt_salt_acc_y, plt_salt_acc_z, plt_date_salt_acc = plot_acc_data(salt_acc_plot_x, salt_acc_plot_y, salt_acc_plot_z, date)
-        plt_pepa_qua_w, plt_pepa_qua_x, plt_pepa_qua_y, plt_pepa_qua_z, plt_date_pepa_qua = plot_qua_data(pepa_qua_plot_w, pepa_qua_plot_x, pepa_qua_plot_y, pepa_qua_plot_z, date)
-        plt_salt_qua_w, plt_salt_qua_x, plt_salt_qua_y, plt_salt_qua_z, plt_date_salt_qua = plot_qua_data(salt_qua_plot_w, salt_qua_plot_x, salt_qua_plot_y, salt_qua_plot_z, date)
-
-        # pepa acc plot
-        ax1 = plot.add_subplot(4,4,1)
-        ax1.set_xticks([])
-        ax1.plot(plt_date_pepa_acc, plt_pepa_acc_x, "b--", linewidth=1)
-        ax1.set_title('PEPA_ACC_X')
-        
-        ax2 = plot.add_subplot(4,4,5)
-        ax2.set_xticks([])
-        ax2.plot(plt_date_pepa_acc, plt_pepa_acc_y, "b--", linewidth=1)
-        ax2.set_title('PEPA_ACC_Y')
-    
-        ax3 = plot.add_subplot(4,4,9)
-        ax3.set_xticks([])
-        ax3.plot(plt_date_pepa_acc, plt_pepa_acc_z, "b--", linewidth=1)
-        ax3.set_title('PEPA_ACC_Z')
-        
-        # salt acc plot
-        ax4 = plot.add_subplot(4,4,2)
-        ax4.set_xticks([])
-        ax4.plot(plt_date_salt_acc, plt_salt_acc_x, "b--", linewidth=1)
-        ax4.set_title('SALT_ACC_X')
-        
-        ax5 = plot.add_subplot(4,4,6)
-        ax5.set_xticks([])
-        ax5.plot(plt_date_salt_acc, plt_salt_acc_y, "b--", linewidth=1)
-        ax5.set_title('SALT_ACC_Y')
-    
-        ax6 = plot.add_subplot(4,4,10)
-        ax6.set_xticks([])
-        ax6.plot(plt_date_salt_acc, plt_salt_acc_z, "b--", linewidth=1)
-        ax6.set_title('SALT_ACC_Z')
-        
-        # pepa qua plot
-        ax7 = plot.add_subplot(4,4,3)
-        ax7.set_xticks([])
-        ax7.plot(plt_date_pepa_qua, plt_pepa_qua_w, "b--", linewidth=1)
-        ax7.set_title('PEPA_QUA_W')
-        
-        ax8 = plot.add_subplot(4,4,7)
-        ax8.set_xticks([])
-        ax8.plot(plt_date_pepa_qua, plt_pepa_qua_x, "b--", linewidth=1)
-        ax8.set_title('PEPA_QUA_X')
-    
-        ax9 = plot.add_subplot(4,4,11)
-        ax9.set_xticks([])
-        ax9.plot(plt_date_pepa_qua, plt_pepa_qua_y, "b--", linewidth=1)
-        ax9.set_title('PEPA_QUA_Y')
-
-        ax10 = plot.add_subplot(4,4,15)
-        ax10.set_xticks([])
-        ax10.plot(plt_date_pepa_qua, plt_pepa_qua_z, "b--", linewidth=1)
-        ax10.set_title('PEPA_QUA_Z')
-        
-        # salt qua plot
-        ax11 = plot.add_subplot(4,4,4)
-        ax11.set_xticks([])
-        ax11.plot(plt_date_salt_qua, plt_salt_qua_w, "b--", linewidth=1)
-        ax11.set_title('SALT_QUA_W')
-        
-        ax12 = plot.add_subplot(4,4,8)
-        ax12.set_xticks([])
-        ax12.plot(plt_date_salt_qua, plt_salt_qua_x, "b--", linewidth=1)
-        ax12.set_title('SALT_QUA_X')
-    
-        ax13 = plot.add_subplot(4,4,12)
-        ax13.set_xticks([])
-        ax13.plot(plt_date_salt_qua, plt_salt_qua_y, "b--", linewidth=1)
-        ax13.set_title('SALT_QUA_Y')
-
-        ax14 = plot.add_subplot(4,4,16)
-        ax14.set_xticks([])
-        ax14.plot(plt_date_salt_qua, plt_salt_qua_z, "b--", linewidth=1)
-        ax14.set_title('SALT_QUA_Z')
-        
-        # table has been defined here
-        ax15 = plot.add_subplot(4,4,13)
-        table = ax15.table(
-                cellText=table_content,
-                cellLoc = 'center',
-                colLabels = ['Date', 'Average anomaly score', 'Duration (seconds)'],
-                bbox=[0, -0.55, 3, 1.8]
-                )
-        table.scale(4, 4)
-        ax15.axis("off")  
-        
-        plot.show()
-        plt.pause(1e-17)
-        
-        time.sleep(1)
-        plot.clf()
+        episodes.update(times[i], average_anomalyScore, previous_result == 'D')
+        table_content = episodes.table()
+
+        if renderer is not None:
+            renderer.publish(i,
+                             {"pepa_acc_x": pre1_1,
+                              "pepa_acc_y": pre2_1,
+                              "pepa_acc_z": pre3_1,
+                              "salt_acc_x": pre1_2,
+                              "salt_acc_y": pre2_2,
+                              "salt_acc_z": pre3_2,
+                              "pepa_qua_w": pre1_3,
+                              "pepa_qua_x": pre2_3,
+                              "pepa_qua_y": pre3_3,
+                              "pepa_qua_z": pre4_3,
+                              "salt_qua_w": pre1_4,
+                              "salt_qua_x": pre2_4,
+                              "salt_qua_y": pre3_4,
+                              "salt_qua_z": pre4_4},
+                             {"anomalies": (table_content, None)})
 
 
 if __name__ == "__main__":
@@ -468,6 +278,7 @@ if __name__ == "__main__":
     # Global parameters
     _VERBOSITY = 0
     _NUM_RECORDS = 153501
+    _HEADLESS = False  # True: only score, no live figure
     
     # -------------------------------------------------------------------------
     #
@@ -788,6 +599,37 @@ if __name__ == "__main__":
       "dateEncoderArgs": dateEncoderArgs,
     }
     
+    #--------------------------------------------------------------------------
+    #
+    #
+    # Live figure drawn by the renderer process
+    _PLOT_LAYOUT = {
+        "name": "Outotec Motion Anomaly Detection",
+        "figsize": (28, 6),
+        "grid": (4, 4),
+        "panels": [
+            {"position": 1, "title": "PEPA_ACC_X", "lines": [("pepa_acc_x", "b--", 1)]},
+            {"position": 5, "title": "PEPA_ACC_Y", "lines": [("pepa_acc_y", "b--", 1)]},
+            {"position": 9, "title": "PEPA_ACC_Z", "lines": [("pepa_acc_z", "b--", 1)]},
+            {"position": 2, "title": "SALT_ACC_X", "lines": [("salt_acc_x", "b--", 1)]},
+            {"position": 6, "title": "SALT_ACC_Y", "lines": [("salt_acc_y", "b--", 1)]},
+            {"position": 10, "title": "SALT_ACC_Z", "lines": [("salt_acc_z", "b--", 1)]},
+            {"position": 3, "title": "PEPA_QUA_W", "lines": [("pepa_qua_w", "b--", 1)]},
+            {"position": 7, "title": "PEPA_QUA_X", "lines": [("pepa_qua_x", "b--", 1)]},
+            {"position": 11, "title": "PEPA_QUA_Y", "lines": [("pepa_qua_y", "b--", 1)]},
+            {"position": 15, "title": "PEPA_QUA_Z", "lines": [("pepa_qua_z", "b--", 1)]},
+            {"position": 4, "title": "SALT_QUA_W", "lines": [("salt_qua_w", "b--", 1)]},
+            {"position": 8, "title": "SALT_QUA_X", "lines": [("salt_qua_x", "b--", 1)]},
+            {"position": 12, "title": "SALT_QUA_Y", "lines": [("salt_qua_y", "b--", 1)]},
+            {"position": 16, "title": "SALT_QUA_Z", "lines": [("salt_qua_z", "b--", 1)]},
+        ],
+        "tables": [
+            {"name": "anomalies", "position": 13, "rows": 4,
+             "colLabels": ['Date', 'Average anomaly score', 'Duration (seconds)'],
+             "bbox": [0, -0.55, 3, 1.8], "scale": 4},
+        ],
+    }
+    
     #--------------------------------------------------------------------------
     #
     #
@@ -802,4 +644,10 @@ if __name__ == "__main__":
     pepa_qua_date = getDate(pepa_qua_recordParams, _NUM_RECORDS)
     salt_qua_date = getDate(salt_qua_recordParams, _NUM_RECORDS)
     
-    runNetwork(pepa_acc_network, salt_acc_network, pepa_qua_network, salt_qua_network, pepa_acc_date, salt_acc_date, pepa_qua_date, salt_qua_date)
+    renderer = None if _HEADLESS else ResultRenderer(_PLOT_LAYOUT, buffer_size=100).start()
+    
+    try:
+        runNetwork(pepa_acc_network, salt_acc_network, pepa_qua_network, salt_qua_network, pepa_acc_date, salt_acc_date, pepa_qua_date, salt_qua_date, renderer)
+    finally:
+        if renderer is not None:
+            renderer.close()